@@ -0,0 +1,225 @@
+import json, operator, os, re, threading, time
+from prometheus_client import Gauge
+from .config import ALERT_RULES_FILE, ALERT_TICK_SECONDS
+from .database import create_alert, resolve_alert, get_unresolved_alerts
+from . import log_stats
+from .sinks import Sink
+
+g_alert_firing = Gauge("opshub_alert_firing", "Alert rule firing (1) or not (0)", ["rule", "target"])
+
+# Each rule watches one metric of one sample source. An alert fires once the
+# metric has breached `threshold` for `for_seconds`, and resolves only when it
+# falls back past `clear` (hysteresis). Targets: gpu_<idx>, host, container name.
+DEFAULT_RULES = [
+    {"name": "gpu_high_utilization", "source": "gpu", "metric": "utilization",
+     "op": ">", "threshold": 95, "clear": 90, "for_seconds": 300, "severity": "warning",
+     "message": "{target} utilization is {value:.0f}%"},
+    {"name": "gpu_high_memory", "source": "gpu", "metric": "memory_percent",
+     "op": ">", "threshold": 90, "clear": 85, "for_seconds": 60, "severity": "warning",
+     "message": "{target} memory usage is {value:.1f}%"},
+    {"name": "gpu_high_temperature", "source": "gpu", "metric": "temperature",
+     "op": ">", "threshold": 80, "clear": 75, "for_seconds": 60, "severity": "warning",
+     "message": "{target} temperature is {value:.0f}°C"},
+    {"name": "gpu_critical_temperature", "source": "gpu", "metric": "temperature",
+     "op": ">", "threshold": 90, "clear": 85, "for_seconds": 0, "severity": "critical",
+     "message": "{target} temperature is {value:.0f}°C"},
+    {"name": "host_high_cpu", "source": "host", "metric": "cpu_percent",
+     "op": ">", "threshold": 90, "clear": 80, "for_seconds": 300, "severity": "warning",
+     "message": "Host CPU usage is {value:.1f}%"},
+    {"name": "host_high_memory", "source": "host", "metric": "memory_percent",
+     "op": ">", "threshold": 90, "clear": 85, "for_seconds": 120, "severity": "warning",
+     "message": "Host memory usage is {value:.1f}%"},
+    {"name": "host_disk_full", "source": "host", "metric": "disk_percent",
+     "op": ">", "threshold": 90, "clear": 88, "for_seconds": 0, "severity": "critical",
+     "message": "Host disk usage is {value:.1f}%"},
+    {"name": "container_down", "source": "container", "metric": "running",
+     "op": "<", "threshold": 1, "clear": 1, "for_seconds": 60, "severity": "critical",
+     "message": "Container {target} is not running"},
+    {"name": "container_restarting", "source": "container", "metric": "restarts_per_tick",
+     "op": ">", "threshold": 0, "clear": 0, "for_seconds": 0, "severity": "warning",
+     "message": "Container {target} restarted"},
+    {"name": "log_error_rate", "source": "log_rate", "metric": "errors_per_minute",
+     "op": ">", "threshold": 100, "clear": 50, "for_seconds": 120, "severity": "warning",
+     "message": "{target} logged {value:.0f} errors in the last minute"},
+]
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+def load_rules() -> list:
+    """Built-in rules, or the JSON list in OPS_ALERT_RULES when set"""
+    if not ALERT_RULES_FILE:
+        return DEFAULT_RULES
+    with open(ALERT_RULES_FILE) as fh:
+        rules = json.load(fh)
+    for rule in rules:
+        if rule.get("op", ">") not in _OPS:
+            raise ValueError(f"Alert rule {rule.get('name')}: unknown op {rule.get('op')}")
+    return rules
+
+class AlertEngine:
+    """Evaluates threshold rules on sample streams, writing only on transitions.
+
+    Transitions are decided under the engine lock and written by the writer
+    sink in the order they were decided, so observers never wait on the
+    database.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self._by_source = {}
+        for rule in rules:
+            self._by_source.setdefault(rule["source"], []).append(rule)
+        # (rule name, target) -> {"pending_since": ts or None, "firing": bool}
+        self._state = {}
+        self._lock = threading.Lock()
+        # (rule name, target) -> id of its unresolved alert; only the writer uses it once started
+        self._alert_ids = {}
+        self.writer = Sink("alerts", self._write, batch_size=100, flush_seconds=0, queue_size=10000, block=True)
+
+    def adopt(self, alerts: list):
+        """Take over unresolved alerts from a previous run so they are not re-fired"""
+        names = {rule["name"] for rule in self.rules}
+        with self._lock:
+            for alert in alerts:
+                if alert["alert_type"] in names:
+                    key = (alert["alert_type"], alert["container_name"])
+                    self._state[key] = {"pending_since": None, "firing": True}
+                    self._alert_ids[key] = alert["id"]
+                    g_alert_firing.labels(rule=key[0], target=key[1]).set(1)
+
+    def firing_targets(self, source: str) -> set:
+        rule_names = {rule["name"] for rule in self._by_source.get(source, ())}
+        with self._lock:
+            return {target for (name, target), state in self._state.items()
+                    if name in rule_names and state["firing"]}
+
+    def observe(self, source: str, target: str, sample: dict, ts: float = None):
+        """Feed one sample for a target into every rule watching this source"""
+        now = ts if ts is not None else time.time()
+        for rule in self._by_source.get(source, ()):
+            value = sample.get(rule["metric"])
+            if value is None:
+                continue
+            with self._lock:
+                self._evaluate(rule, target, float(value), now)
+
+    def resolve(self, source: str, target: str):
+        """Resolve every firing alert of a source's rules for a target that is gone"""
+        with self._lock:
+            for rule in self._by_source.get(source, ()):
+                state = self._state.pop((rule["name"], target), None)
+                if state and state["firing"]:
+                    self._transition("resolve", rule, target, None)
+
+    def _evaluate(self, rule: dict, target: str, value: float, now: float):
+        key = (rule["name"], target)
+        state = self._state.setdefault(key, {"pending_since": None, "firing": False})
+        compare = _OPS[rule.get("op", ">")]
+
+        if not state["firing"]:
+            if not compare(value, rule["threshold"]):
+                state["pending_since"] = None
+                return
+            if state["pending_since"] is None:
+                state["pending_since"] = now
+            if now - state["pending_since"] >= rule.get("for_seconds", 0):
+                state["pending_since"] = None
+                state["firing"] = True
+                self._transition("fire", rule, target, value)
+        elif not compare(value, rule.get("clear", rule["threshold"])):
+            state["firing"] = False
+            self._transition("resolve", rule, target, value)
+
+    def _transition(self, action: str, rule: dict, target: str, value):
+        """Queue a transition for the writer; called under the lock, which keeps them in order"""
+        g_alert_firing.labels(rule=rule["name"], target=target).set(1 if action == "fire" else 0)
+        self.writer.put((action, rule, target, value))
+
+    def _write(self, batch: list):
+        """Writer sink: create and resolve alerts"""
+        for action, rule, target, value in batch:
+            key = (rule["name"], target)
+            try:
+                if action == "fire":
+                    self._alert_ids[key] = create_alert(
+                        alert_type=rule["name"],
+                        severity=rule.get("severity", "warning"),
+                        message=rule.get("message", "{target} {metric} is {value}").format(
+                            target=target, metric=rule["metric"], value=value),
+                        container_name=target,
+                        metric_value=value,
+                        threshold_value=rule["threshold"]
+                    )
+                elif key in self._alert_ids:
+                    resolve_alert(self._alert_ids.pop(key), value)
+            except Exception as e:
+                print(f"Error writing alert {rule['name']} for {target}: {e}")
+
+_engine = None
+
+def observe(source: str, target: str, sample: dict, ts: float = None):
+    """Feed a sample to the alert engine, if it is running"""
+    if _engine is not None:
+        try:
+            _engine.observe(source, target, sample, ts)
+        except Exception as e:
+            print(f"Error evaluating alerts: {e}")
+
+def _container_filter():
+    include_pat = re.compile(os.getenv("OPS_INCLUDE_REGEX", ".*"))
+    exclude_pat = re.compile(os.getenv("OPS_EXCLUDE_REGEX", "^$"))
+    return lambda name: include_pat.search(name) and not exclude_pat.search(name)
+
+def tick_worker():
+    """Sample container state and log rates for container and log_rate rules"""
+    import docker
+    client = None
+    selected = _container_filter()
+    restart_counts = {}
+
+    while True:
+        try:
+            # Created here so a briefly unavailable Docker socket is retried next tick
+            if client is None:
+                client = docker.from_env()
+            containers = client.containers.list(all=True)
+            # Alerts on containers that were removed would otherwise never resolve
+            listed = {c.name for c in containers}
+            for name in _engine.firing_targets("container") - listed:
+                _engine.resolve("container", name)
+            for name in set(restart_counts) - listed:
+                del restart_counts[name]
+            for c in containers:
+                if not selected(c.name):
+                    continue
+                restarts = c.attrs.get("RestartCount", 0)
+                previous = restart_counts.get(c.name)
+                restart_counts[c.name] = restarts
+                # Only watch containers seen running, so stopped-on-purpose ones stay quiet
+                if previous is None and c.status != "running":
+                    continue
+                observe("container", c.name, {
+                    "running": 1 if c.status == "running" else 0,
+                    "restarts_per_tick": restarts - previous if previous is not None else 0
+                })
+        except Exception as e:
+            print(f"Error sampling containers for alerts: {e}")
+
+        rates = log_stats.last_minute_rates()
+        idle = {"lines_per_minute": 0, "errors_per_minute": 0}
+        for target in set(rates) | _engine.firing_targets("log_rate"):
+            observe("log_rate", target, rates.get(target, idle))
+
+        time.sleep(ALERT_TICK_SECONDS)
+
+def start():
+    """Start the alert engine"""
+    global _engine
+    engine = AlertEngine(load_rules())
+    try:
+        engine.adopt(get_unresolved_alerts())
+    except Exception as e:
+        print(f"Error loading unresolved alerts: {e}")
+    engine.writer.start()
+    _engine = engine
+    threading.Thread(target=tick_worker, daemon=True).start()
@@ -0,0 +1,1314 @@
+import json, os, random, socket, sqlite3, subprocess, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+OPENWEBUI_LINES = {
+    "INFO": [
+        "INFO:     {ip}:{port} - \"GET /api/v1/chats/?page=1 HTTP/1.1\" 200 OK",
+        "INFO:     {ip}:{port} - \"POST /api/chat/completions HTTP/1.1\" 200 OK",
+        "user {user} logged in",
+        "model: {model} selected by {user}",
+    ],
+    "WARNING": [
+        "WARNING: Rate limit approaching for user {user}",
+        "WARNING: Slow response from ollama ({secs}s) for model {model}",
+    ],
+    "ERROR": [
+        "ERROR: Failed to fetch models from ollama: connection refused",
+        "ERROR: Exception in ASGI application while handling chat for {user}",
+    ],
+}
+
+OLLAMA_LINES = {
+    "INFO": [
+        "[GIN] 2024/01/15 - 10:25:30 | 200 | {secs}s | {ip} | POST \"/api/chat\"",
+        "loaded model: {model} in {secs}s",
+        "generating for model: {model}",
+        "GPU {gpu} utilization {pct}%",
+        "llama_print_timings: eval time = {ms} ms / {tokens} runs",
+    ],
+    "WARNING": [
+        "WARN: gpu VRAM usage didn't recover within timeout, {mb} MiB still in use on GPU {gpu}",
+    ],
+    "ERROR": [
+        "ERROR: out of memory allocating {mb} MiB on GPU {gpu}",
+    ],
+}
+
+MODELS = ["llama3", "mistral", "qwen2", "phi3", "gemma2"]
+
+def synthetic_lines(count: int, seed: int = 0, error_ratio: float = 0.05,
+                    warning_ratio: float = 0.10):
+    """Yield OpenWebUI/Ollama-shaped log lines with the given level mix"""
+    rng = random.Random(seed)
+    for i in range(count):
+        templates = OPENWEBUI_LINES if i % 2 else OLLAMA_LINES
+        roll = rng.random()
+        level = "ERROR" if roll < error_ratio else "WARNING" if roll < error_ratio + warning_ratio else "INFO"
+        yield rng.choice(templates[level]).format(
+            ip=f"172.17.0.{rng.randint(2, 254)}", port=rng.randint(30000, 60000),
+            user=f"user{rng.randint(1, 500)}", model=rng.choice(MODELS),
+            secs=f"{rng.uniform(0.05, 30):.3f}", ms=f"{rng.uniform(5, 9000):.2f}",
+            tokens=rng.randint(1, 2048), gpu=rng.randint(0, 3), pct=rng.randint(0, 100),
+            mb=rng.randint(100, 24000))
+
+def format_docker_timestamp(ts_ns: int) -> str:
+    seconds, nanos = divmod(ts_ns, 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{nanos:09d}Z"
+
+def make_fixture(containers: int, lines_per_container: int, seed: int = 0,
+                 error_ratio: float = 0.05, warning_ratio: float = 0.10) -> dict:
+    """Build {container_id: (name, [(ts_ns, line), ...])} of synthetic logs"""
+    start_ns = time.time_ns() - lines_per_container * 1_000_000
+    fixture = {}
+    for n in range(containers):
+        container_id = f"{n:064x}"
+        name = ("openwebui-bench", "ollama-bench")[n % 2] + f"-{n}"
+        lines = synthetic_lines(lines_per_container, seed + n, error_ratio, warning_ratio)
+        fixture[container_id] = (name, [(start_ns + i * 1_000_000, line) for i, line in enumerate(lines)])
+    return fixture
+
+def write_json_log_dir(root: str, fixture: dict):
+    """Lay the fixture out as Docker's json-file logging driver would"""
+    for container_id, (name, lines) in fixture.items():
+        cdir = Path(root) / "containers" / container_id
+        cdir.mkdir(parents=True, exist_ok=True)
+        (cdir / "config.v2.json").write_text(json.dumps({"ID": container_id, "Name": f"/{name}",
+                                                         "State": {"Running": True}}))
+        with open(cdir / f"{container_id}-json.log", "w") as fh:
+            for ts_ns, line in lines:
+                fh.write(json.dumps({"log": line + "\n", "stream": "stdout",
+                                     "time": format_docker_timestamp(ts_ns)}) + "\n")
+
+class FakeImage:
+    tags = ["bench:latest"]
+
+class FakeContainer:
+    """Stand-in for a docker-py container that replays fixture lines.
+
+    With `rate` set, lines are paced to that many per second and stamped with
+    the time they are emitted, so end-to-end lag can be measured.
+    """
+
+    def __init__(self, container_id: str, name: str, lines: list, rate: float = None,
+                 stats_latency: float = 0.0):
+        self.id = container_id
+        self.name = name
+        self.status = "running"
+        self.image = FakeImage()
+        self.attrs = {"Created": "2024-01-15T08:00:00Z", "RestartCount": 0,
+                      "State": {"StartedAt": "2024-01-15T08:00:00Z"}}
+        self._lines = lines
+        self._rate = rate
+        self._stats_latency = stats_latency
+
+    def logs(self, stream=False, follow=False, timestamps=False, since=None, tail=None, **kwargs):
+        # tail is ignored so the whole fixture is replayed
+        since_ns = int(since * 1_000_000_000) if since else 0
+        def frames():
+            started = time.monotonic()
+            for i, (ts_ns, line) in enumerate(self._lines):
+                if ts_ns < since_ns:
+                    continue
+                if self._rate:
+                    delay = started + i / self._rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    ts_ns = time.time_ns()
+                prefix = format_docker_timestamp(ts_ns) + " " if timestamps else ""
+                yield (prefix + line + "\n").encode()
+        return frames() if stream else b"".join(frames())
+
+    def stats(self, stream=False, **kwargs):
+        time.sleep(self._stats_latency)
+        cpu = {"cpu_usage": {"total_usage": 2_000_000}, "system_cpu_usage": 100_000_000, "online_cpus": 8}
+        precpu = {"cpu_usage": {"total_usage": 1_000_000}, "system_cpu_usage": 90_000_000}
+        return {"cpu_stats": cpu, "precpu_stats": precpu,
+                "memory_stats": {"usage": 512 * 1024**2, "limit": 8 * 1024**3},
+                "networks": {"eth0": {"rx_bytes": 10 * 1024**2, "tx_bytes": 2 * 1024**2}}}
+
+class FakeDockerClient:
+    """Stand-in for docker.DockerClient exposing the fixture as containers"""
+
+    def __init__(self, fixture: dict, rate: float = None, stats_latency: float = 0.0):
+        self._containers = {name: FakeContainer(cid, name, lines, rate, stats_latency)
+                            for cid, (name, lines) in fixture.items()}
+        self.containers = self
+
+    def get(self, name):
+        return self._containers[name]
+
+    def list(self, all=False, **kwargs):
+        return list(self._containers.values())
+
+def use_temp_data_dir() -> str:
+    """Point the database and log files at a throwaway directory"""
+    from . import database, logging_pipeline
+    data_dir = tempfile.mkdtemp(prefix="opshub-bench-")
+    database.DB_PATH = os.path.join(data_dir, "opshub.db")
+    logging_pipeline.LOG_BASE = os.path.join(data_dir, "logs")
+    database.init_db()
+    return data_dir
+
+def _run_source(target, jobs: list, total_bytes: int) -> dict:
+    counted = [0]
+    lock = threading.Lock()
+    def handler(*args, **kwargs):
+        with lock:
+            counted[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=target, args=job, kwargs={"handler": handler}) for job in jobs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "lines": counted[0],
+        "seconds": round(elapsed, 3),
+        "lines_per_second": round(counted[0] / elapsed),
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 2),
+    }
+
+def bench_sources(containers: int = 4, lines_per_container: int = 100000) -> dict:
+    """Compare the json-file reader against the API tailer on the same fixture.
+
+    The API side uses FakeDockerClient, so it measures OpsHub's framing and
+    decoding cost only; the daemon's own cost comes on top in production.
+    """
+    from .logging_pipeline import tail_container
+    from .log_files import tail_log_file
+
+    data_dir = use_temp_data_dir()
+    fixture = make_fixture(containers, lines_per_container)
+    write_json_log_dir(data_dir, fixture)
+    total_bytes = sum(len(line) + 1 for _, lines in fixture.values() for _, line in lines)
+
+    client = FakeDockerClient(fixture)
+    files = _run_source(
+        lambda cid, name, handler: tail_log_file(cid, name, root=data_dir, handler=handler,
+                                                 follow=False, tail=None),
+        [(cid, name) for cid, (name, _) in fixture.items()], total_bytes)
+    api = _run_source(
+        lambda name, handler: tail_container(name, client=client, handler=handler),
+        [(name,) for name, _ in fixture.values()], total_bytes)
+
+    return {"containers": containers, "lines_per_container": lines_per_container,
+            "json_file": files, "docker_api": api}
+
+def percentiles(values: list, points=(50, 95, 99)) -> dict:
+    """Nearest-rank percentiles in milliseconds from values in seconds"""
+    if not values:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(values)
+    return {f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 3)
+            for p in points}
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _db_size(data_dir: str) -> int:
+    """Main database plus log shards, WAL files included"""
+    shards = os.path.join(data_dir, "log-shards")
+    return (sum(os.path.getsize(os.path.join(data_dir, f)) for f in os.listdir(data_dir)
+                if f.startswith("opshub.db")) +
+            sum(os.path.getsize(os.path.join(shards, f)) for f in os.listdir(shards)))
+
+API_TARGETS = [
+    ("/logs/all", {"tail": 100}),
+    ("/search/logs", {"query": "ERROR", "limit": 100}),
+    ("/containers/status", {}),
+    ("/metrics/performance", {}),
+]
+
+def run_benchmark(containers: int = 4, rate: float = 500.0, duration: float = 30.0,
+                  error_ratio: float = 0.05, warning_ratio: float = 0.10,
+                  http_concurrency: int = 8, stats_latency: float = 0.0,
+                  console_output: bool = False) -> dict:
+    """End-to-end benchmark: synthetic containers through logging_pipeline plus HTTP load.
+
+    Each of `containers` stand-in containers emits `rate` lines/s for
+    `duration` seconds (rate=0 replays as fast as possible) while
+    `http_concurrency` clients hit the read endpoints of a local server.
+    """
+    import docker, requests, uvicorn
+    from . import logging_pipeline, metrics_host
+
+    data_dir = use_temp_data_dir()
+    lines_per_container = max(1, int(rate * duration)) if rate else 100000
+    fixture = make_fixture(containers, lines_per_container, 0, error_ratio, warning_ratio)
+    client = FakeDockerClient(fixture, rate=rate or None, stats_latency=stats_latency)
+    docker.from_env = lambda *args, **kwargs: client
+    logging_pipeline.console.quiet = not console_output
+
+    # The stand-in client is installed before anything calls docker.from_env
+    from .server import app
+
+    expected = containers * lines_per_container
+    written, lags = [0], []
+    done = threading.Event()
+    def on_batch(batch):
+        now = time.time_ns()
+        lags.extend((now - mark[1]) / 1e9 for _, mark, _ in batch if mark)
+        written[0] += len(batch)
+        if written[0] >= expected:
+            done.set()
+    logging_pipeline.on_write(on_batch)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port,
+                                           lifespan="off", log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f"http://127.0.0.1:{port}"
+    while not server.started:
+        time.sleep(0.05)
+    metrics_host.start()
+
+    started = time.perf_counter()
+    logging_pipeline.start()
+
+    latencies = {path: [] for path, _ in API_TARGETS}
+    errors = {path: 0 for path, _ in API_TARGETS}
+    def http_worker(offset: int):
+        session = requests.Session()
+        i = offset
+        while not done.is_set():
+            path, params = API_TARGETS[i % len(API_TARGETS)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                ok = session.get(base + path, params=params, timeout=30).ok
+            except requests.RequestException:
+                ok = False
+            latencies[path].append(time.perf_counter() - t0)
+            if not ok:
+                errors[path] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, http_concurrency)) as pool:
+        for n in range(http_concurrency):
+            pool.submit(http_worker, n)
+        done.wait(timeout=duration * 3 + 60 if rate else 600)
+        elapsed = time.perf_counter() - started
+        done.set()
+
+    server.should_exit = True
+    db_bytes = _db_size(data_dir)
+    return {
+        "config": {"containers": containers, "rate_per_container": rate, "duration": duration,
+                   "error_ratio": error_ratio, "warning_ratio": warning_ratio,
+                   "http_concurrency": http_concurrency},
+        "ingest": {
+            "lines": written[0],
+            "expected": expected,
+            "seconds": round(elapsed, 3),
+            "lines_per_second": round(written[0] / elapsed, 1),
+        },
+        "lag_ms": percentiles(lags),
+        "api_latency_ms": {
+            path: {**percentiles(values), "requests": len(values), "errors": errors[path]}
+            for path, values in latencies.items()
+        },
+        "db": {
+            "bytes": db_bytes,
+            "bytes_per_million_lines": round(db_bytes / written[0] * 1e6) if written[0] else None,
+        },
+    }
+
+# Child process for bench_startup: serve from a throwaway database
+_STARTUP_SERVER = """
+import sys, uvicorn
+from opshub.bench import use_temp_data_dir
+use_temp_data_dir()
+uvicorn.run("opshub.server:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+def _wait_for_health(port: int, proc, started: float, timeout: float, until_running: bool = True):
+    """Seconds since `started` until /health answers, and until it reports the workers running"""
+    import requests
+    healthy = None
+    while time.perf_counter() - started < timeout and proc.poll() is None:
+        try:
+            body = requests.get(f"http://127.0.0.1:{port}/health", timeout=1).json()
+        except requests.RequestException:
+            time.sleep(0.01)
+            continue
+        healthy = healthy or time.perf_counter() - started
+        if not until_running:
+            return healthy, None
+        if body.get("workers") == "running":
+            return healthy, time.perf_counter() - started
+        time.sleep(0.01)
+    return healthy, None
+
+def bench_startup(runs: int = 5, help_target: float = 0.5, health_target: float = 2.0) -> dict:
+    """Cold-start wall times for `opshub --help` and for the server's first /health.
+
+    The server runs against a throwaway database with DOCKER_HOST pointing at
+    a missing socket, so it also checks that startup does not wait on Docker.
+    """
+    help_times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "opshub.cli", "--help"], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        help_times.append(time.perf_counter() - started)
+
+    health_times, ready_times = [], []
+    env = {**os.environ, "DOCKER_HOST": "unix:///nonexistent/docker.sock"}
+    for _ in range(runs):
+        port = _free_port()
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-c", _STARTUP_SERVER, str(port)], env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            healthy, ready = _wait_for_health(port, proc, started, timeout=60)
+        finally:
+            proc.terminate()
+            proc.wait()
+        if healthy is not None:
+            health_times.append(healthy)
+        if ready is not None:
+            ready_times.append(ready)
+
+    def summary(values: list, target: float = None) -> dict:
+        result = {"runs": len(values), **percentiles(values, (50, 100))}
+        if target is not None:
+            result["target_ms"] = round(target * 1000)
+            result["ok"] = bool(values) and len(values) == runs and max(values) <= target
+        return result
+
+    return {
+        "cli_help": summary(help_times, help_target),
+        "server_health": summary(health_times, health_target),
+        "server_workers_running": summary(ready_times),
+    }
+
+def seed_logs(fixture: dict):
+    """Store the fixture's lines in the database as the pipeline would"""
+    from datetime import datetime
+    from .database import store_log_entries
+    from .logging_pipeline import classify
+    from .records import LogRecord
+    entries = [LogRecord(datetime.fromtimestamp(ts_ns / 1e9).isoformat(), name, container_id, classify(line),
+                         line, None, "docker_logs")
+               for container_id, (name, lines) in fixture.items() for ts_ns, line in lines]
+    store_log_entries(entries)
+
+# Child process for bench_federation: one node with its own seeded database
+_FEDERATION_NODE = """
+import sys, docker, uvicorn
+from opshub import bench
+bench.use_temp_data_dir()
+fixture = bench.make_fixture(int(sys.argv[2]), int(sys.argv[3]), seed=int(sys.argv[4]))
+client = bench.FakeDockerClient(fixture)
+docker.from_env = lambda *args, **kwargs: client
+bench.seed_logs(fixture)
+uvicorn.run("opshub.server:app", host="127.0.0.1", port=int(sys.argv[1]),
+            lifespan="off", log_level="warning")
+"""
+
+def bench_federation(peers: int = 3, containers: int = 2, lines_per_container: int = 20000,
+                     tail: int = 1000, rounds: int = 20) -> dict:
+    """Federated queries across local OpsHub instances, checked for correct merging.
+
+    Starts `peers` + 1 nodes on localhost, each with its own seeded database,
+    and points the first at the others plus one unreachable peer. Reports
+    latency of federated queries against a single-node query, and checks the
+    merged logs are newest-first, labelled, and cover every live host.
+    """
+    import requests
+    names = [f"node{n}" for n in range(peers + 1)]
+    ports = [_free_port() for _ in names]
+    dead_port = _free_port()
+    procs = []
+    try:
+        for n, (name, port) in enumerate(zip(names, ports)):
+            env = {**os.environ, "OPS_NODE_NAME": name, "OPS_PEERS": ""}
+            if n == 0:
+                env["OPS_PEERS"] = ",".join([f"{peer}=http://127.0.0.1:{peer_port}"
+                                             for peer, peer_port in zip(names[1:], ports[1:])]
+                                            + [f"dead=http://127.0.0.1:{dead_port}"])
+            procs.append(subprocess.Popen(
+                [sys.executable, "-c", _FEDERATION_NODE, str(port), str(containers),
+                 str(lines_per_container), str(n * containers)],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        for port, proc in zip(ports, procs):
+            if _wait_for_health(port, proc, time.perf_counter(), timeout=120, until_running=False)[0] is None:
+                raise RuntimeError(f"Federation node on port {port} did not start")
+
+        base = f"http://127.0.0.1:{ports[0]}"
+        session = requests.Session()
+        single, first_line, federated, status = [], [], [], []
+        checks = {"ordered": True, "count": True, "hosts": set(), "errors": set()}
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            session.get(f"{base}/logs/all", params={"tail": tail, "format": "ndjson"}).content
+            single.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            previous, count, first = None, 0, None
+            with session.get(f"{base}/federation/logs/all", params={"tail": tail}, stream=True) as r:
+                for line in r.iter_lines():
+                    if first is None:
+                        first = time.perf_counter() - t0
+                    record = json.loads(line)
+                    if "error" in record:
+                        checks["errors"].add(record["host"])
+                        continue
+                    count += 1
+                    checks["hosts"].add(record["host"])
+                    if previous is not None and record["ts"] > previous:
+                        checks["ordered"] = False
+                    previous = record["ts"]
+            federated.append(time.perf_counter() - t0)
+            first_line.append(first)
+            checks["count"] = checks["count"] and count == tail
+
+            t0 = time.perf_counter()
+            session.get(f"{base}/federation/containers/status").json()
+            status.append(time.perf_counter() - t0)
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+
+    return {
+        "config": {"nodes": len(names), "containers_per_node": containers,
+                   "lines_per_container": lines_per_container, "tail": tail, "rounds": rounds},
+        "single_node_logs_ms": percentiles(single),
+        "federated_logs_ms": percentiles(federated),
+        "federated_logs_first_line_ms": percentiles(first_line),
+        "federated_status_ms": percentiles(status),
+        "checks": {"ordered": checks["ordered"], "complete": checks["count"],
+                   "hosts": sorted(checks["hosts"]), "unreachable_reported": sorted(checks["errors"])},
+    }
+
+def bench_export(rows: int = 200000, batch_size: int = 5000) -> dict:
+    """Export throughput per format and compression from a seeded database.
+
+    mb_per_second is uncompressed NDJSON megabytes per second, so codecs are
+    compared on the same work; peak_traced_mb checks memory stays at a batch.
+    """
+    import tracemalloc
+    from . import export
+
+    use_temp_data_dir()
+    containers = 4
+    seed_logs(make_fixture(containers, max(1, rows // containers)))
+
+    variants = [("ndjson", "none"), ("ndjson", "gzip")]
+    if export.zstandard is not None:
+        variants.append(("ndjson", "zstd"))
+    if export._pyarrow() is not None:
+        variants.append(("parquet", "zstd"))
+
+    results, raw_bytes = {}, None
+    for fmt, compression in variants:
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in export.export_stream(
+            "logs", fmt, compression, batch_size=batch_size))
+        elapsed = time.perf_counter() - started
+        raw_bytes = raw_bytes or size
+        results[f"{fmt}+{compression}"] = {
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed),
+            "mb_per_second": round(raw_bytes / elapsed / 1e6, 1),
+            "output_mb": round(size / 1e6, 2),
+            "ratio": round(raw_bytes / size, 2),
+        }
+
+    tracemalloc.start()
+    for _ in export.export_stream("logs", "ndjson", "gzip", batch_size=batch_size):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"rows": rows, "batch_size": batch_size, "ndjson_mb": round(raw_bytes / 1e6, 1),
+            "exports": results, "peak_traced_mb": round(peak / 1e6, 1)}
+
+
+def _loki_stub(state: dict):
+    """HTTP server accepting Loki pushes into state, answering 503 while state["outage"]"""
+    import gzip
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if state["outage"]:
+                state["refused"] += 1
+                self.send_response(503)
+                self.end_headers()
+                return
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            with state["lock"]:
+                state["pushes"].append(len(body))
+                for stream in json.loads(body)["streams"]:
+                    key = tuple(sorted(stream["stream"].items()))
+                    state["streams"].setdefault(key, []).extend(int(v[0]) for v in stream["values"])
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def bench_loki(lines: int = 200000, containers: int = 4, batch_size: int = 2000,
+               outage_seconds: float = 3.0, timeout: float = 120.0) -> dict:
+    """Loki forwarding against a local stub, with an outage in the middle of the run.
+
+    Checks every line arrives exactly once and in timestamp order per stream,
+    after the forwarder spooled through the outage and replayed the backlog.
+    """
+    from . import loki_sink
+    from .logging_pipeline import classify, extract_metadata
+
+    state = {"outage": False, "refused": 0, "pushes": [], "streams": {}, "lock": threading.Lock()}
+    server = _loki_stub(state)
+    spool_dir = tempfile.mkdtemp(prefix="opshub-loki-spool-")
+    forwarder = loki_sink.LokiForwarder(f"http://127.0.0.1:{server.server_port}", spool_dir,
+                                        batch_size=batch_size, batch_wait=0.2, queue_size=lines)
+    threading.Thread(target=forwarder.run, daemon=True).start()
+
+    fixture = make_fixture(containers, max(1, lines // containers))
+    entries = []
+    for name, rows in fixture.values():
+        for ts_ns, line in rows:
+            lvl = classify(line)
+            entries.append((loki_sink.label_set(name, lvl, extract_metadata(name, line)), ts_ns, line))
+    entries.sort(key=lambda e: e[1])
+    total = len(entries)
+
+    def delivered():
+        with state["lock"]:
+            return sum(len(v) for v in state["streams"].values())
+
+    started = time.perf_counter()
+    third = total // 3
+    for labels, ts_ns, line in entries[:third]:
+        forwarder.submit(labels, ts_ns, line)
+    state["outage"] = True
+    for labels, ts_ns, line in entries[third:2 * third]:
+        forwarder.submit(labels, ts_ns, line)
+    time.sleep(outage_seconds)
+    spooled_peak = forwarder._spool_bytes
+    state["outage"] = False
+    for labels, ts_ns, line in entries[2 * third:]:
+        forwarder.submit(labels, ts_ns, line)
+
+    while delivered() < total and time.perf_counter() - started < timeout:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    received = delivered()
+    ordered = all(v == sorted(v) for v in state["streams"].values())
+    pushes = state["pushes"]
+    return {
+        "lines": total,
+        "streams": len(state["streams"]),
+        "seconds": round(elapsed, 2),
+        "lines_per_second": round(received / max(elapsed - outage_seconds, 1e-9)),
+        "pushes": len(pushes),
+        "mean_batch_entries": round(received / max(len(pushes), 1)),
+        "uncompressed_kb_per_push": round(sum(pushes) / max(len(pushes), 1) / 1024, 1),
+        "refused_during_outage": state["refused"],
+        "spooled_kb_peak": round(spooled_peak / 1024, 1),
+        "checks": {"complete": received == total, "no_duplicates": received <= total, "ordered": ordered,
+                   "spool_empty": not list(Path(spool_dir).glob("*.json.gz"))},
+    }
+
+def _synthetic_rules(extra: int, prefilter: bool = True) -> dict:
+    """The built-in rule file plus `extra` rules spread over its services, none of
+    which match the synthetic lines (the common case for most rules on most lines)"""
+    from .extract_rules import DEFAULT_RULES_FILE
+    spec = json.loads(Path(DEFAULT_RULES_FILE).read_text())
+    services = spec["services"]
+    for k in range(extra):
+        services[k % len(services)]["rules"].append(
+            {"name": f"synthetic_{k}", "pattern": rf"svc{k} request (?P<request_{k}>\w+) took (?P<ms_{k}>\d+)ms",
+             "flags": "i"})
+    if not prefilter:
+        for service in services:
+            for rule in service["rules"]:
+                rule["prefilter"] = False
+    return spec
+
+def bench_rules(rule_counts=(8, 32, 128, 512), lines_per_container: int = 20000) -> dict:
+    """Metadata extraction lines/s as the rule count grows, with and without prefilters"""
+    from .extract_rules import compile_rules
+
+    fixture = make_fixture(4, lines_per_container)
+    lines = [(name, line) for name, rows in fixture.values() for _, line in rows]
+
+    def rate(rule_set) -> float:
+        started = time.perf_counter()
+        for name, line in lines:
+            rule_set.extract(name, line)
+        return len(lines) / (time.perf_counter() - started)
+
+    results = {}
+    for extra in rule_counts:
+        prefiltered = compile_rules(_synthetic_rules(extra))
+        unfiltered = compile_rules(_synthetic_rules(extra, prefilter=False))
+        with_prefilter, without_prefilter = rate(prefiltered), rate(unfiltered)
+        results[str(prefiltered.summary()["rules"])] = {
+            "rules_per_container": len(prefiltered.rules_for(lines[0][0])),
+            "lines_per_second": round(with_prefilter),
+            "lines_per_second_without_prefilter": round(without_prefilter),
+            "speedup": round(with_prefilter / without_prefilter, 2),
+        }
+    return {"lines": len(lines), "rules": results}
+
+def _traced_bytes_per_item(build, count: int) -> float:
+    """Bytes still allocated per item while build() returns a list of count items"""
+    import gc, tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    return round(size / count, 1)
+
+def bench_records(lines: int = 1000000, memory_sample: int = 100000) -> dict:
+    """Per-record memory and records/s of LogRecord against the dict rows it replaced.
+
+    "dict" is the old read path (SELECT * as sqlite3.Row, then dict(row), then
+    json.dumps); "record" is LogRecord from the row factory, then to_json.
+    Memory is measured on memory_sample rows held at once.
+    """
+    import sqlite3
+    from datetime import datetime
+    from . import database
+    from .logging_pipeline import classify
+    from .records import LogRecord, COLUMNS
+
+    use_temp_data_dir()
+    containers = 4
+    fixture = make_fixture(containers, max(1, lines // containers))
+    raw = [(datetime.fromtimestamp(ts_ns / 1e9).isoformat(), name, container_id, classify(line), line)
+           for container_id, (name, rows) in fixture.items() for ts_ns, line in rows]
+    lines = len(raw)
+
+    def build_tuples():
+        return [(ts, name, cid, lvl, line, None, "docker_logs", None, None, None, None, None, None, None)
+                for ts, name, cid, lvl, line in raw]
+
+    def build_records():
+        return [LogRecord(ts, name, cid, lvl, line, None, "docker_logs") for ts, name, cid, lvl, line in raw]
+
+    results = {"lines": lines, "memory_sample": min(memory_sample, lines), "build": {}, "write": {},
+               "read_serialize": {}, "bytes_per_record": {}}
+    for label, build in (("tuple", build_tuples), ("record", build_records)):
+        started = time.perf_counter()
+        build()
+        results["build"][label] = round(lines / (time.perf_counter() - started))
+
+    records = build_records()
+    started = time.perf_counter()
+    for i in range(0, lines, 5000):
+        database.store_log_entries(records[i:i + 5000])
+    results["write"]["record"] = round(lines / (time.perf_counter() - started))
+    del records
+
+    def read(label: str, limit: int = None):
+        suffix = f" LIMIT {int(limit)}" if limit else ""
+        rows = []
+        for shard in database._log_shards():
+            conn = database._open_log_shard(shard)
+            try:
+                if label == "dict":
+                    conn.row_factory = sqlite3.Row
+                    rows.extend(dict(row) for row in conn.execute("SELECT * FROM logs" + suffix))
+                else:
+                    conn.row_factory = LogRecord.from_row
+                    rows.extend(conn.execute(f"SELECT {COLUMNS} FROM logs" + suffix))
+            finally:
+                conn.close()
+        return rows[:limit] if limit else rows
+
+    sample = results["memory_sample"]
+    for label, encode in (("dict", json.dumps), ("record", LogRecord.to_json)):
+        started = time.perf_counter()
+        size = sum(len(encode(row)) for row in read(label))
+        elapsed = time.perf_counter() - started
+        results["read_serialize"][label] = {"records_per_second": round(lines / elapsed),
+                                            "json_bytes_per_record": round(size / lines, 1)}
+        results["bytes_per_record"][label] = _traced_bytes_per_item(lambda: read(label, sample), sample)
+
+    results["memory_saving"] = round(1 - results["bytes_per_record"]["record"] / results["bytes_per_record"]["dict"], 3)
+    results["read_serialize_speedup"] = round(results["read_serialize"]["record"]["records_per_second"] /
+                                              results["read_serialize"]["dict"]["records_per_second"], 2)
+    return results
+
+# Scaled fixture for bench_queries: a few chatty containers and a long tail (Zipf-like), and the level mix
+# of a healthy fleet, so rare-level and small-container queries are as selective as in production
+QUERY_FIXTURE_CONTAINERS = ["ollama", "open-webui", "litellm", "nginx", "postgres", "redis", "prometheus",
+                            "grafana", "loki", "promtail", "cadvisor", "watchtower"]
+QUERY_FIXTURE_LEVELS = [("INFO", 0.80), ("SUCCESS", 0.04), ("WARNING", 0.10), ("ERROR", 0.055),
+                        ("CRITICAL", 0.005)]
+QUERY_FIXTURE_PATHS = ["/api/chat", "/api/generate", "/api/chat/completions", "/api/v1/chats/", "/api/models",
+                       "/api/embeddings", "/health"]
+
+def _line_pool(rng: random.Random, level: str, size: int) -> list:
+    # SUCCESS and CRITICAL lines are INFO and ERROR lines with a marker in front
+    base = {"SUCCESS": "INFO", "CRITICAL": "ERROR"}.get(level, level)
+    templates = OPENWEBUI_LINES[base] + OLLAMA_LINES[base]
+    prefix = {"SUCCESS": "completed: ", "CRITICAL": "CRITICAL: "}.get(level, "")
+    return [prefix + rng.choice(templates).format(
+                ip=f"172.17.0.{rng.randint(2, 254)}", port=rng.randint(30000, 60000),
+                user=f"user{rng.randint(1, 5000)}", model=rng.choice(MODELS),
+                secs=f"{rng.uniform(0.05, 30):.3f}", ms=f"{rng.uniform(5, 9000):.2f}",
+                tokens=rng.randint(1, 2048), gpu=rng.randint(0, 3), pct=rng.randint(0, 100),
+                mb=rng.randint(100, 24000))
+            for _ in range(size)]
+
+def _sql_time(ts: float) -> str:
+    """UTC in SQLite's CURRENT_TIMESTAMP / datetime('now') format"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+
+# Series the host and GPU collectors record, with the decimal digits they keep: one busy and one idle
+# interface, and two GPUs that alternate between idle and busy
+TSDB_FIXTURE_SERIES = {
+    "host.cpu_percent": 1, "host.memory_percent": 1, "host.memory_available_gb": 3, "host.disk_percent": 2,
+    "host.load_1m": 2, "host.load_5m": 2, "host.load_15m": 2,
+    "net.eth0.rx_bytes": None, "net.eth0.tx_bytes": None, "net.lo.rx_bytes": None, "net.lo.tx_bytes": None,
+    **{f"gpu.{idx}.{name}": digits for idx in range(2) for name, digits in (
+        ("utilization", None), ("memory_percent", 2), ("memory_used_mb", 1), ("temperature", None),
+        ("power_watts", 1), ("graphics_clock_mhz", None))},
+}
+
+def _signal(series: str, rng: random.Random):
+    """A function returning the next 1-second sample of a series, shaped like the real metric"""
+    name = series.rsplit(".", 1)[1]
+    state = {"x": rng.uniform(20, 40), "target": 25.0, "busy": False, "total": 0}
+
+    def counter(mean: float, active: float):
+        def step():
+            if rng.random() < active:
+                state["total"] += int(rng.lognormvariate(mean, 1.5))
+            return state["total"]
+        return step
+
+    def walk(low: float, high: float, sigma: float, pull: float = 0.0):
+        def step():
+            if pull and rng.random() < 0.002:
+                state["target"] = rng.uniform(low, high)
+            state["x"] += pull * (state["target"] - state["x"]) + rng.gauss(0, sigma)
+            state["x"] = min(high, max(low, state["x"]))
+            return state["x"]
+        return step
+
+    def gpu(idle: float, busy: float, sigma: float):
+        whole = TSDB_FIXTURE_SERIES.get(series, 0) is None  # NVML reports these as integers
+        def step():
+            if rng.random() < 0.001:
+                state["busy"] = not state["busy"]
+            level = busy if state["busy"] else idle
+            if sigma and state["busy"]:
+                level = min(100, level + rng.gauss(0, sigma)) if name == "utilization" else level + rng.gauss(0, sigma)
+            return round(level) if whole else level
+        return step
+
+    kind = series.split(".", 1)[0]
+    if kind == "net":
+        return counter(9.0, 0.9) if ".lo." not in series else counter(6.0, 0.05)
+    if kind == "gpu":
+        return {
+            "utilization": gpu(0, 97, 2.0), "memory_percent": gpu(4.5, 71.2, 0.3),
+            "memory_used_mb": gpu(1100, 17400, 60), "temperature": gpu(34, 78, 0),
+            "power_watts": gpu(58, 290, 6), "graphics_clock_mhz": gpu(210, 1980, 0),
+        }[name]
+    return {
+        "cpu_percent": walk(0, 100, 3.0, 0.1), "memory_percent": walk(30, 90, 0.05),
+        "memory_available_gb": walk(4, 48, 0.02), "disk_percent": walk(40, 41, 0.0005),
+        "load_1m": walk(0, 16, 0.1, 0.05), "load_5m": walk(0, 16, 0.03, 0.01), "load_15m": walk(0, 16, 0.01, 0.005),
+    }[name]
+
+def _synthetic_block(series: str, first_ts: int, samples: int, rng: random.Random):
+    """A tsdb Block of `samples` 1-second samples of a synthetic series"""
+    from . import tsdb
+    signal = _signal(series, rng)
+    digits = TSDB_FIXTURE_SERIES.get(series)
+    block = tsdb.Block(series, first_ts, signal(), digits)
+    for ts in range(first_ts + 1, first_ts + samples):
+        block.append(ts, signal())
+    return block
+
+def make_query_fixture(data_dir: str, rows: int, days: int = 7, seed: int = 0) -> dict:
+    """Point the database at data_dir and fill it with `rows` log lines over the last `days` days,
+    plus sessions, alerts and aggregate tables in proportion.
+
+    An existing fixture of the same size and seed in data_dir is reused as
+    is, so large sizes are only generated once; its times then lag the clock.
+    """
+    from datetime import datetime
+    from . import database
+    from .records import COLUMNS
+    from .config import TSDB_BLOCK_SECONDS
+    from .sketches import DDSketch, HyperLogLog
+
+    os.makedirs(data_dir, exist_ok=True)
+    database.DB_PATH = os.path.join(data_dir, "opshub.db")
+    marker = os.path.join(data_dir, "fixture.json")
+    if os.path.exists(marker):
+        with open(marker) as fh:
+            info = json.load(fh)
+        if (info["rows"], info["days"], info["seed"]) == (rows, days, seed):
+            database.init_db()
+            return info
+        raise ValueError(f"{data_dir} holds a different fixture ({info['rows']} rows); use an empty directory")
+    database.init_db()
+
+    rng = random.Random(seed)
+    names = QUERY_FIXTURE_CONTAINERS
+    ids = [f"{n:064x}" for n in range(len(names))]
+    container_weights = [1 / (n + 1) ** 1.2 for n in range(len(names))]
+    levels = [level for level, _ in QUERY_FIXTURE_LEVELS]
+    level_weights = [share for _, share in QUERY_FIXTURE_LEVELS]
+    pools = {level: _line_pool(rng, level, 2000) for level in levels}
+    end = time.time()
+    start = end - days * 86400
+    step = (end - start) / rows
+
+    volume = {}
+    started = time.perf_counter()
+    batch_size = 200000
+    conn, day = None, None
+    for offset in range(0, rows, batch_size):
+        count = min(batch_size, rows - offset)
+        containers = rng.choices(range(len(names)), container_weights, k=count)
+        picked = rng.choices(levels, level_weights, k=count)
+        batch = []
+        for i in range(count):
+            ts = start + (offset + i) * step
+            n, level = containers[i], picked[i]
+            line = rng.choice(pools[level])
+            structured = n < 3 and rng.random() < 0.2
+            batch.append((datetime.fromtimestamp(ts).isoformat(), names[n], ids[n], level, line, None,
+                          "docker_logs", rng.randrange(500), None,
+                          rng.choice((200, 200, 200, 200, 201, 404, 500, 502)) if structured else None,
+                          round(rng.lognormvariate(5, 1.2), 2) if structured else None,
+                          rng.choice(QUERY_FIXTURE_PATHS) if structured else None,
+                          f"user{rng.randint(1, 5000)}" if structured else None,
+                          rng.choice(MODELS) if structured else None, None))
+            key = (int(ts) // 60 * 60, names[n], level)
+            volume[key] = volume.get(key, 0) + 1
+        # Timestamps ascend, so each batch spans at most a day boundary or two
+        for row in batch:
+            if row[0][:10] != day:
+                if conn is not None:
+                    conn.commit()
+                    conn.close()
+                day = row[0][:10]
+                conn = database._open_shard_for_write(day)
+                conn.execute("PRAGMA synchronous=OFF")
+                conn.execute("PRAGMA cache_size=-262144")  # index pages of a day stay cached while loading
+                pending = []
+            pending.append(row)
+            if len(pending) >= 50000:
+                conn.executemany(f"INSERT INTO logs ({COLUMNS}) VALUES ({', '.join('?' * 15)})", pending)
+                pending = []
+        conn.executemany(f"INSERT INTO logs ({COLUMNS}) VALUES ({', '.join('?' * 15)})", pending)
+        pending = []
+    conn.commit()
+    conn.close()
+    log_seconds = time.perf_counter() - started
+
+    hours = int(days * 24)
+    sessions = max(1000, rows // 50)
+    latency = DDSketch()
+    for _ in range(50):
+        latency.add(rng.lognormvariate(6, 1))
+    users = HyperLogLog()
+    for n in range(200):
+        users.add(f"user{n}")
+    latency_blob, users_blob = latency.to_bytes(), users.to_bytes()
+    # One synthetic hour per block window, shared by every series
+    series_blocks = [_synthetic_block("host.cpu_percent", first_ts, TSDB_BLOCK_SECONDS, rng)
+                     for first_ts in range(int(start) // TSDB_BLOCK_SECONDS * TSDB_BLOCK_SECONDS, int(end),
+                                           TSDB_BLOCK_SECONDS)]
+    conn = database.get_connection()
+    try:
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executemany("INSERT INTO log_volume_counts (bucket, container_name, level, count) VALUES (?, ?, ?, ?)",
+                         [(*key, n) for key, n in volume.items()])
+        conn.executemany("INSERT INTO log_templates (id, template) VALUES (?, ?)",
+                         [(n, f"template <*> number {n}") for n in range(500)])
+        conn.executemany("""
+            INSERT OR IGNORE INTO log_template_counts (bucket, template_id, container_name, level, count)
+            VALUES (?, ?, ?, ?, ?)
+        """, ((bucket, rng.randrange(500), name, level, n) for (bucket, name, level), n in volume.items()
+              for _ in range(min(4, n))))
+        conn.executemany("INSERT INTO model_sketches (bucket, model, metric, count, sketch) VALUES (?, ?, ?, ?, ?)",
+                         [(int(start) // 300 * 300 + b * 300, model, metric, latency.count, latency_blob)
+                          for b in range(int(days * 288)) for model in MODELS
+                          for metric in ("latency_ms", "tokens", "tokens_per_s")])
+        conn.executemany("INSERT INTO user_sketches (bucket, model, sketch) VALUES (?, ?, ?)",
+                         [(int(start) // 3600 * 3600 + h * 3600, model, users_blob)
+                          for h in range(hours) for model in MODELS + [""]])
+        conn.executemany("""
+            INSERT INTO series_blocks (series, first_ts, last_ts, count, min, max, sum, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(name, *block.row()[1:]) for block in series_blocks for name in TSDB_FIXTURE_SERIES])
+        conn.executemany("""
+            INSERT INTO user_sessions (username, model, action, session_id, ip_address, user_agent, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ((f"user{rng.randint(1, 5000)}", rng.choice(MODELS), rng.choice(("login", "chat", "chat", "logout")),
+               f"s{rng.randrange(sessions // 4)}", f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+               "Mozilla/5.0", _sql_time(start + (end - start) * i / sessions)) for i in range(sessions)))
+        active = max(100, rows // 500)
+        conn.executemany("""
+            INSERT OR IGNORE INTO active_sessions (username, session_id, model, ip_address, started_at,
+                                                   last_activity, request_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, ((f"user{n % 5000}", f"s{n}", rng.choice(MODELS), "10.0.0.1", _sql_time(seen - 600), _sql_time(seen),
+               rng.randint(1, 50))
+              for n in range(active)
+              for seen in [end - rng.uniform(0, 300) if rng.random() < 0.01 else rng.uniform(start, end)]))
+        alerts = max(200, rows // 2000)
+        conn.executemany("""
+            INSERT INTO alerts (alert_type, severity, message, container_name, metric_value, threshold_value,
+                                resolved, timestamp, resolved_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ((kind, "critical" if rng.random() < 0.2 else "warning", f"{kind} above threshold",
+               rng.choice(names), 95.0, 90.0, resolved, _sql_time(at), _sql_time(at + 300) if resolved else None)
+              for i in range(alerts)
+              for kind, at, resolved in [(rng.choice(("cpu", "memory", "gpu_memory", "disk")),
+                                          start + (end - start) * i / alerts, rng.random() < 0.97)]))
+        conn.executemany("""
+            INSERT INTO performance_metrics (timestamp, metric_type, metric_name, value, unit)
+            VALUES (?, 'host', ?, ?, '%')
+        """, ((_sql_time(start + (end - start) * i / sessions), rng.choice(("cpu", "memory", "disk")),
+               rng.uniform(0, 100)) for i in range(sessions)))
+        conn.executemany("""
+            INSERT INTO container_status (container_name, container_id, status, cpu_percent, timestamp)
+            VALUES (?, ?, 'running', ?, ?)
+        """, ((names[i % len(names)], ids[i % len(ids)], rng.uniform(0, 100),
+               _sql_time(start + (end - start) * i / sessions)) for i in range(sessions)))
+        conn.executemany("""
+            INSERT INTO log_checkpoints (container_id, container_name, ts_ns, line_hash) VALUES (?, ?, ?, ?)
+        """, [(cid, name, int(end * 1e9), "0" * 16) for cid, name in zip(ids, names)])
+        conn.commit()
+    finally:
+        conn.close()
+
+    info = {"rows": rows, "days": days, "seed": seed, "end": datetime.fromtimestamp(end).isoformat(),
+            "containers": names, "generate_seconds": round(time.perf_counter() - started, 1),
+            "log_rows_per_second": round(rows / log_seconds)}
+    with open(marker, "w") as fh:
+        json.dump(info, fh, indent=2)
+    return info
+
+NEWEST_LOGS = "logs USING INDEX idx_logs_timestamp"
+
+def _query_shapes(fixture: dict) -> list:
+    """(name, call, expected scans) for each public database read, the aggregate
+    readers behind the API, and the API's own parameter shapes, against a fixture"""
+    from datetime import datetime, timedelta
+    from . import database, log_patterns, log_stats, model_stats, tsdb, user_stats
+    from .records import FIELDS
+
+    big, small = fixture["containers"][0], fixture["containers"][-1]
+    end = datetime.fromisoformat(fixture["end"])
+    hour_ago, day_ago = end - timedelta(hours=1), end - timedelta(days=1)
+    export_columns = [name for name in FIELDS if name != "id"]
+    return [
+        # /logs/{container}, federation and the CLI
+        # No filter: the newest rows in timestamp order, stopped by the LIMIT
+        ("get_logs all", lambda: database.get_logs("all", "all", 100), (NEWEST_LOGS,)),
+        ("get_logs container", lambda: database.get_logs(big, "all", 100), ()),
+        ("get_logs small container", lambda: database.get_logs(small, "all", 1000), ()),
+        ("get_logs level", lambda: database.get_logs("all", "critical", 100), ()),
+        ("get_logs container level", lambda: database.get_logs(small, "error", 100), ()),
+        ("get_logs level since", lambda: database.get_logs("all", "error", 100, since=day_ago), ()),
+        ("get_logs container level since", lambda: database.get_logs(big, "warning", 100, since=hour_ago), ()),
+        # follow=true polls the last second
+        ("get_logs stream poll", lambda: database.get_logs(big, "all", 10, since=end - timedelta(seconds=1)), ()),
+        # /search/logs: a substring match can't use an index, so it walks logs newest first until
+        # the limit; rare terms read the whole shard, bounded by the query budget
+        ("search_logs", lambda: database.search_logs("out of memory", limit=1000), (NEWEST_LOGS,)),
+        ("search_logs container level", lambda: database.search_logs("GPU", small, "critical", limit=100), ()),
+        ("search_logs time range", lambda: database.search_logs("user42", start_time=hour_ago.isoformat(),
+                                                                end_time=end.isoformat()), ()),
+        # /logs/latency
+        ("get_latency_by_path", lambda: database.get_latency_by_path(hour_ago.isoformat()), ()),
+        ("get_latency_by_path container", lambda: database.get_latency_by_path(day_ago.isoformat(), big), ()),
+        # /export/logs
+        ("iter_export_rows range level", lambda: [len(rows) for rows in database.iter_export_rows(
+            "logs", export_columns, (end - timedelta(minutes=10)).isoformat(), end.isoformat(),
+            filters={"level": "ERROR"})], ()),
+        ("iter_export_rows after_id", lambda: next(database.iter_export_rows(
+            "logs", export_columns, after_id=0, batch_size=1000), []), ()),
+        ("get_log_checkpoint", lambda: database.get_log_checkpoint(f"{0:064x}"), ()),
+        # The whole catalog by design
+        ("get_log_templates", database.get_log_templates, ("log_templates",)),
+        # /logs/patterns, /logs/stats, /models/latency, /users/stats
+        ("top_patterns", lambda: log_patterns.top_patterns(None, "all", 3600000), ()),
+        ("top_patterns container level", lambda: log_patterns.top_patterns(small, "error", 86400000), ()),
+        ("log_stats", lambda: log_stats.get_stats(None, "all", 3600000, 60000), ()),
+        ("log_stats container day", lambda: log_stats.get_stats(big, "error", 86400000, 3600000), ()),
+        ("model_latency", lambda: model_stats.get_latency(None, 3600000), ()),
+        ("model_latency model day", lambda: model_stats.get_latency(MODELS[0], 86400000, 3600000), ()),
+        ("unique_users", lambda: user_stats.get_unique_users(), ()),
+        ("unique_users model", lambda: user_stats.get_unique_users(MODELS[0], 7 * 86400000, 86400000), ()),
+        # /users/sessions
+        ("get_user_sessions", lambda: database.get_user_sessions(hours=24), ()),
+        ("get_user_sessions active_only", lambda: database.get_user_sessions(active_only=True), ()),
+        # /alerts and the alert engine
+        ("get_alerts", lambda: database.get_alerts(hours=24), ()),
+        ("get_alerts severity", lambda: database.get_alerts("critical", hours=168), ()),
+        ("get_alerts severity resolved", lambda: database.get_alerts("warning", False, 168), ()),
+        ("get_unresolved_alerts", database.get_unresolved_alerts, ()),
+        # /metrics/performance/history: a day decodes its blocks, a week folds block summaries
+        ("get_series_blocks", lambda: database.get_series_blocks(
+            "host.cpu_percent", int(end.timestamp()) - 86400, int(end.timestamp())), ()),
+        ("get_series_names", database.get_series_names, ()),
+        ("tsdb_history day", lambda: tsdb.history(["host.cpu_percent"], 86400000), ()),
+        ("tsdb_history week", lambda: tsdb.history(["host.*", "gpu.*"], 7 * 86400000), ()),
+        # Row counts by design: COUNT(*) walks the smallest index of each table
+        ("get_database_stats", database.get_database_stats,
+         ("logs", "user_sessions", "performance_metrics", "container_status", "alerts", "series_blocks")),
+        # Retention: deletes nothing from a fresh fixture, but its statements are planned as in production
+        ("cleanup_old_data", database.cleanup_old_data, ()),
+    ]
+
+def plan_problems(details: list, allowed: tuple = ()) -> list:
+    """What is wrong with an EXPLAIN QUERY PLAN: scans of a whole table or index, and sorting every
+    match for ORDER BY. allowed names a table (any scan of it) or one index walk as it appears after
+    SCAN, e.g. "logs USING INDEX idx_logs_timestamp" for a walk that a LIMIT stops early"""
+    ctes = {detail.split()[1] for detail in details if detail.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+    problems = []
+    for detail in details:
+        words = detail.split()
+        if (words[0] == "SCAN" and "VIRTUAL TABLE" not in detail and words[1] != "CONSTANT"
+                and words[1] not in ctes and words[1] not in allowed and detail[5:] not in allowed):
+            problems.append(f"full index walk of {detail[5:]}" if " USING " in detail else f"full scan of {words[1]}")
+        if "TEMP B-TREE FOR ORDER BY" in detail and not any("GROUP BY" in d for d in details):
+            problems.append("sorts every matching row for ORDER BY")
+    return problems
+
+def _explain(statements: list, allowed: tuple) -> list:
+    """EXPLAIN QUERY PLAN each distinct traced query; identical plans across shards are reported once"""
+    plans = {}
+    for path, sql in statements:
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH", "DELETE", "UPDATE")):
+            continue
+        conn = sqlite3.connect(Path(path).as_uri() + "?mode=ro", uri=True)
+        try:
+            details = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        finally:
+            conn.close()
+        key = (" ".join(sql.split()), tuple(details))
+        plans[key] = plans.get(key, 0) + 1
+    return [{"sql": sql if len(sql) <= 300 else sql[:297] + "...", "databases": n, "plan": list(details),
+             "problems": plan_problems(details, allowed)}
+            for (sql, details), n in plans.items()]
+
+def bench_queries(sizes=(1000000,), runs: int = 20, days: int = 7, seed: int = 0, fixture_dir: str = None,
+                  baseline: str = None, update_baseline: bool = False, tolerance: float = 1.5) -> dict:
+    """Query-plan and latency regression suite over scaled fixtures.
+
+    For each size, every query shape's statements (all shards included) must
+    be planned without full table scans or sorting every match. Latency is
+    the warm-cache p50/p95/p99 of `runs` calls. With `baseline`, results are
+    compared to the stored run of the same size: a median more than
+    `tolerance` times the stored one, and over 5 ms slower, is a regression
+    (the floor keeps jitter on millisecond queries from failing it). The run
+    is stored when the baseline has none for the size or `update_baseline`.
+    """
+    from . import database
+
+    stored = {}
+    if baseline and os.path.exists(baseline):
+        with open(baseline) as fh:
+            stored = json.load(fh)
+
+    results = {"runs": runs, "days": days, "sizes": {}, "ok": True}
+    for rows in sizes:
+        data_dir = (os.path.join(fixture_dir, f"rows-{rows}") if fixture_dir
+                    else tempfile.mkdtemp(prefix="opshub-bench-queries-"))
+        fixture = make_query_fixture(data_dir, rows, days, seed)
+        previous = stored.get(str(rows), {}).get("queries", {})
+        queries, failures = {}, []
+        for name, call, allowed in _query_shapes(fixture):
+            statements = []
+            with database.traced_statements(statements):
+                result = call()
+            times = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                call()
+                times.append(time.perf_counter() - t0)
+            plans = _explain(statements, allowed)
+            entry = {"latency_ms": percentiles(times), "returned": len(result) if hasattr(result, "__len__") else None,
+                     "statements": plans}
+            problems = sorted({problem for plan in plans for problem in plan["problems"]})
+            if problems:
+                failures.append(f"{name}: {', '.join(problems)}")
+            old = previous.get(name, {}).get("latency_ms", {}).get("p50")
+            if old is not None:
+                new = entry["latency_ms"]["p50"]
+                entry["baseline_p50_ms"] = old
+                entry["regressed"] = new > old * tolerance and new - old > 5.0
+                if entry["regressed"]:
+                    failures.append(f"{name}: median {new} ms against {old} ms in the baseline")
+            queries[name] = entry
+        results["sizes"][str(rows)] = {"fixture": fixture, "queries": queries, "failures": failures}
+        results["ok"] = results["ok"] and not failures
+        if baseline and (update_baseline or not previous):
+            stored[str(rows)] = {"fixture": fixture, "queries": {
+                name: {"latency_ms": entry["latency_ms"]} for name, entry in queries.items()}}
+
+    if baseline and stored:
+        with open(baseline, "w") as fh:
+            json.dump(stored, fh, indent=2)
+            fh.write("\n")
+    return results
+
+def bench_tsdb(days: float = 3, runs: int = 5, seed: int = 0) -> dict:
+    """Bytes per sample, record and decode rates, and history latency of the time-series store.
+
+    Every TSDB_FIXTURE_SERIES series gets a synthetic 1-second sample for
+    `days` days up to now, recorded as the collectors do and flushed per block;
+    storage is projected to OPS_TSDB_RETENTION_DAYS from the measured bytes
+    per sample, next to what the same samples cost as performance_metrics rows.
+    History is timed over every series, cold (first_ms) and then warm.
+    """
+    from . import database, tsdb
+    from .config import TSDB_BLOCK_SECONDS, TSDB_RETENTION_DAYS
+
+    use_temp_data_dir()
+    database.init_db()
+    rng = random.Random(seed)
+    series = TSDB_FIXTURE_SERIES
+    signals = {name: _signal(name, rng) for name in series}
+    end = int(time.time())
+    start = end - int(days * 86400)
+
+    kept, recording = [], 0.0
+    # One block window at a time, flushed at its end as the flush worker would be
+    for window in range(start - start % TSDB_BLOCK_SECONDS, end + 1, TSDB_BLOCK_SECONDS):
+        span = range(max(window, start), min(window + TSDB_BLOCK_SECONDS, end + 1))
+        values = {name: [signal() for _ in span] for name, signal in signals.items()}
+        kept += values["host.cpu_percent"]
+        t0 = time.perf_counter()
+        for i, ts in enumerate(span):
+            for name, digits in series.items():
+                tsdb.record(name, values[name][i], ts, digits)
+        recording += time.perf_counter() - t0
+        tsdb.flush()
+    samples = (end - start + 1) * len(series)
+
+    conn = database.get_connection()
+    try:
+        stored = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT series, SUM(LENGTH(data)), SUM(count) FROM series_blocks GROUP BY series")}
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        rows = 100000
+        conn.executemany("INSERT INTO performance_metrics (metric_type, metric_name, value, unit) VALUES (?, ?, ?, ?)",
+                         (("system", "cpu_percent", rng.uniform(0, 100), "percent") for _ in range(rows)))
+        conn.commit()
+        row_bytes = (conn.execute("PRAGMA page_count").fetchone()[0] - pages) * page_size / rows
+    finally:
+        conn.close()
+    total_bytes = sum(size for size, _ in stored.values())
+    bytes_per_sample = total_bytes / samples
+
+    t0 = time.perf_counter()
+    timestamps, values = tsdb.query("host.cpu_percent", start, end)
+    decode_seconds = time.perf_counter() - t0
+    exact = timestamps == list(range(start, end + 1)) and values == [round(v, 1) for v in kept]
+
+    history = {}
+    for label, window_ms in (("1h", 3600000), ("24h", 86400000), (f"{days:g}d", int(days * 86400000))):
+        times = []
+        for _ in range(runs + 1):
+            t0 = time.perf_counter()
+            result = tsdb.history(["host.*", "net.*", "gpu.*"], window_ms)
+            times.append(time.perf_counter() - t0)
+        # The first call decodes and caches per-minute rollups; the rest are warm
+        history[label] = {"first_ms": round(times[0] * 1000, 1), "latency_ms": percentiles(times[1:]),
+                          "step_ms": result["step_ms"],
+                          "points": sum(len(points) for points in result["series"].values())}
+
+    return {
+        "days": days, "series": len(series), "samples": samples,
+        "record_samples_per_second": round(samples / recording),
+        "stored_mb": round(total_bytes / 1e6, 2),
+        "bytes_per_sample": round(bytes_per_sample, 3),
+        "bytes_per_sample_by_series": {name: round(size / count, 3) for name, (size, count) in sorted(stored.items())},
+        "performance_metrics_row_bytes": round(row_bytes, 1),
+        "compression_ratio": round(row_bytes / bytes_per_sample, 1),
+        "retention_days": TSDB_RETENTION_DAYS,
+        "projected_retention_mb": round(bytes_per_sample * len(series) * TSDB_RETENTION_DAYS * 86400 / 1e6, 1),
+        "decode_samples_per_second": round(len(values) / decode_seconds),
+        "roundtrip_exact": exact,
+        "history": history,
+    }
+
+def bench_processes(idle: int = 1000, ticks: int = 5, interval: float = 1.0) -> dict:
+    """Process sampler cost and accuracy against the old fresh process_iter scan.
+
+    Starts `idle` sleeping children and one that spins, so the table is large
+    and one process's CPU is known (about 100%). The old scan builds new
+    Process objects each call, so its cpu_percent is 0 on every process; the
+    sampler's is measured between ticks `interval` seconds apart.
+    """
+    import psutil
+    from . import processes
+
+    children = [subprocess.Popen(["sleep", "3600"]) for _ in range(idle)]
+    busy = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    try:
+        time.sleep(interval)
+        started = time.perf_counter()
+        old = {p.info["pid"]: p.info for p in psutil.process_iter(
+            ["pid", "name", "cpu_percent", "memory_percent", "memory_info"])}
+        old_ms = (time.perf_counter() - started) * 1000
+
+        samples, last = [], time.monotonic()
+        processes._snapshot = processes.sample(interval)
+        for _ in range(ticks):
+            time.sleep(interval)
+            now = time.monotonic()
+            cpu_started = time.thread_time()
+            processes._snapshot = processes.sample(now - last)
+            samples.append((processes._snapshot["sample_ms"] / 1000, time.thread_time() - cpu_started))
+            last = now
+        host = processes._snapshot["containers"].get(processes.HOST, {})
+        busy_row = next((row for summary in processes._snapshot["containers"].values()
+                         for row in summary["top_cpu"] if row["pid"] == busy.pid), None)
+
+        started = time.perf_counter()
+        for _ in range(1000):
+            processes.get_processes(limit=10)
+        endpoint_us = (time.perf_counter() - started) * 1000
+
+        return {
+            "processes": processes._snapshot["processes"],
+            "containers": len(processes._snapshot["containers"]),
+            "host_processes": host.get("process_count"),
+            "old_scan_ms": round(old_ms, 1),
+            "old_busy_cpu_percent": old.get(busy.pid, {}).get("cpu_percent"),
+            "old_rows_over_1_percent_cpu": sum(1 for info in old.values() if (info["cpu_percent"] or 0) > 1.0),
+            "sample_ms": percentiles([wall for wall, _ in samples]),
+            "sample_cpu_ms": percentiles([cpu for _, cpu in samples]),
+            "busy_cpu_percent": busy_row and busy_row["cpu_percent"],
+            "get_processes_us": round(endpoint_us, 1),
+        }
+    finally:
+        for child in children + [busy]:
+            child.kill()
+        for child in children + [busy]:
+            child.wait()
@@ -1,12 +1,19 @@
-import typer, requests, os, json
+import typer, os, json, time
 from datetime import datetime
-from rich.console import Console
-from rich.table import Table
-from rich.live import Live
-from rich.text import Text
+from typing import List
 
 app = typer.Typer(help="Docker Logger - Monitor all your containers")
-console = Console()
+bench_app = typer.Typer(help="Run OpsHub benchmarks locally and print JSON results")
+app.add_typer(bench_app, name="bench")
+# requests and rich are imported inside commands so `opshub --help` stays fast
+_console = None
+
+def get_console():
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
 
 def get_base_url():
     return f"http://{os.getenv('OPSHUB_HOST','localhost')}:8089"
@@ -16,24 +23,40 @@ def logs(
     container: str = typer.Argument(help="Container name or 'all' for all containers"),
     level: str = typer.Option("all", help="Log level: info, warning, error, success, all"),
     follow: bool = typer.Option(False, "-f", "--follow", help="Follow log output"),
-    tail: int = typer.Option(100, help="Number of lines to show from the end")
+    tail: int = typer.Option(100, help="Number of lines to show from the end"),
+    federated: bool = typer.Option(False, "--federated", help="Merge logs from all federated hosts")
 ):
     """Stream logs from containers with filtering"""
-    url = f"{get_base_url()}/logs/{container}"
-    params = {"level": level, "tail": tail, "follow": follow}
+    import requests
+    console = get_console()
+    if federated and follow:
+        console.print("[red]--follow is not supported with --federated[/red]")
+        raise typer.Exit(1)
+    
+    if federated:
+        url = f"{get_base_url()}/federation/logs/{container}"
+        params = {"level": level, "tail": tail}
+    else:
+        url = f"{get_base_url()}/logs/{container}"
+        params = {"level": level, "tail": tail, "follow": follow, "format": "ndjson"}
     
     try:
-        r = requests.get(url, params=params, stream=follow)
+        r = requests.get(url, params=params, stream=True)
         r.raise_for_status()
         
         for line in r.iter_lines():
             if line:
                 try:
                     log_entry = json.loads(line.decode())
+                    if 'error' in log_entry:
+                        console.print(f"[red]{log_entry.get('host')}: {log_entry['error']}[/red]")
+                        continue
                     timestamp = log_entry.get('timestamp', '')
                     level = log_entry.get('level', 'INFO')
                     message = log_entry.get('message', '')
-                    container_name = log_entry.get('container', '')
+                    container_name = log_entry.get('container_name', log_entry.get('container', ''))
+                    if 'host' in log_entry:
+                        container_name = f"{log_entry['host']}/{container_name}"
                     
                     # Color code by level
                     color = {
@@ -51,15 +74,35 @@ def logs(
     except requests.exceptions.RequestException as e:
         console.print(f"[red]Error connecting to OpsHub: {e}[/red]")
 
+def print_host_errors(console, hosts: list):
+    """Report federated hosts that did not answer"""
+    for host in hosts:
+        if not host.get("ok"):
+            console.print(f"[red]{host['host']}: {host.get('error')}[/red]")
+
 @app.command()
-def status():
+def status(
+    federated: bool = typer.Option(False, "--federated", help="Show containers on all federated hosts")
+):
     """Show status of all containers"""
+    import requests
+    from rich.table import Table
+    console = get_console()
     try:
-        r = requests.get(f"{get_base_url()}/containers/status")
-        r.raise_for_status()
-        containers = r.json()
+        if federated:
+            r = requests.get(f"{get_base_url()}/federation/containers/status")
+            r.raise_for_status()
+            body = r.json()
+            print_host_errors(console, body["hosts"])
+            containers = body["containers"]
+        else:
+            r = requests.get(f"{get_base_url()}/containers/status")
+            r.raise_for_status()
+            containers = r.json()
         
         table = Table(title="Container Status")
+        if federated:
+            table.add_column("Host", style="white")
         table.add_column("Container", style="cyan")
         table.add_column("Status", style="green")
         table.add_column("CPU %", style="yellow")
@@ -70,6 +113,7 @@ def status():
         for container in containers:
             status_color = "green" if container['status'] == 'running' else "red"
             table.add_row(
+                *([container['host']] if federated else []),
                 container['name'],
                 f"[{status_color}]{container['status']}[/{status_color}]",
                 f"{container.get('cpu_percent', 'N/A')}%",
@@ -84,10 +128,19 @@ def status():
         console.print(f"[red]Error: {e}[/red]")
 
 @app.command()
-def users():
+def users(
+    summary: bool = typer.Option(False, "--summary", help="Show approximate unique users per model instead of sessions"),
+    days: int = typer.Option(30, help="Days covered by --summary"),
+    model: str = typer.Option(None, help="Only this model in --summary")
+):
     """Show OpenWebUI user sessions and activity"""
+    import requests
+    from rich.table import Table
+    console = get_console()
+    if summary:
+        return print_user_summary(console, days, model)
     try:
-        r = requests.get(f"{get_base_url()}/users/sessions")
+        r = requests.get(f"{get_base_url()}/users/sessions", params={"active_only": True})
         r.raise_for_status()
         sessions = r.json()
         
@@ -114,85 +167,430 @@ def users():
     except requests.exceptions.RequestException as e:
         console.print(f"[red]Error: {e}[/red]")
 
+def print_user_summary(console, days: int, model: str = None):
+    """Unique users per model over the last days, with the busiest hour and day"""
+    import requests
+    from rich.table import Table
+    try:
+        params = {"window_ms": days * 86400000, "step_ms": 3600000}
+        if model:
+            params["model"] = model
+        r = requests.get(f"{get_base_url()}/users/stats", params=params)
+        r.raise_for_status()
+        stats = r.json()
+    except requests.exceptions.RequestException as e:
+        console.print(f"[red]Error: {e}[/red]")
+        return
+    
+    table = Table(title=f"Unique Users, last {days} days (±{stats['standard_error'] * 100:.1f}%)")
+    table.add_column("Model", style="green")
+    table.add_column("Unique users", style="cyan", justify="right")
+    table.add_column("Peak hour", style="yellow", justify="right")
+    table.add_column("Avg active hour", style="white", justify="right")
+    table.add_column("Busiest hour", style="blue")
+    
+    def add_row(name, unique, points):
+        busiest = max(points, key=lambda point: point[1], default=None)
+        table.add_row(name, str(unique), str(busiest[1]) if busiest else "0",
+                      f"{sum(n for _, n in points) / len(points):.1f}" if points else "0",
+                      datetime.fromtimestamp(busiest[0]).strftime("%Y-%m-%d %H:00") if busiest else "N/A")
+    
+    for entry in stats["models"]:
+        add_row(entry["model"], entry["unique_users"], entry["points"])
+    if not model:
+        add_row("[bold]all models[/bold]", stats["unique_users"], stats["points"])
+    console.print(table)
+
 @app.command()
-def performance():
+def performance(
+    federated: bool = typer.Option(False, "--federated", help="Show metrics for all federated hosts"),
+    history: int = typer.Option(0, "--history", help="Show min/avg/max over the last N minutes instead"),
+    series: str = typer.Option("host.*,gpu.*", help="Series names or patterns for --history, comma-separated")
+):
     """Show system performance metrics"""
+    import requests
+    console = get_console()
+    try:
+        if history:
+            r = requests.get(f"{get_base_url()}/metrics/performance/history",
+                             params={"series": series, "window_ms": history * 60000})
+            r.raise_for_status()
+            print_performance_history(console, r.json(), history)
+        elif federated:
+            r = requests.get(f"{get_base_url()}/federation/metrics/performance")
+            r.raise_for_status()
+            body = r.json()
+            print_host_errors(console, body["hosts"])
+            for metrics in body["metrics"]:
+                print_performance(console, metrics, title=f"System Performance - {metrics['host']}")
+        else:
+            r = requests.get(f"{get_base_url()}/metrics/performance")
+            r.raise_for_status()
+            print_performance(console, r.json())
+        
+    except requests.exceptions.RequestException as e:
+        console.print(f"[red]Error: {e}[/red]")
+
+def print_performance(console, metrics: dict, title: str = "System Performance"):
+    """Print one host's performance metrics"""
+    from rich.table import Table
+    # System overview
+    console.print(f"\n[bold blue]{title}[/bold blue]")
+    console.print(f"CPU Usage: [yellow]{metrics.get('cpu_percent', 'N/A')}%[/yellow]")
+    console.print(f"Memory Usage: [yellow]{metrics.get('memory_percent', 'N/A')}%[/yellow]")
+    console.print(f"Disk Usage: [yellow]{metrics.get('disk_percent', 'N/A')}%[/yellow]")
+    
+    # GPU metrics
+    if 'gpus' in metrics:
+        console.print("\n[bold green]GPU Status[/bold green]")
+        gpu_table = Table()
+        gpu_table.add_column("GPU", style="cyan")
+        gpu_table.add_column("Utilization", style="green")
+        gpu_table.add_column("Memory", style="yellow")
+        gpu_table.add_column("Temperature", style="red")
+        gpu_table.add_column("Power", style="blue")
+        
+        for gpu in metrics['gpus']:
+            gpu_table.add_row(
+                f"GPU {gpu.get('index', 'N/A')}",
+                f"{gpu.get('utilization', 'N/A')}%",
+                f"{gpu.get('memory_used', 'N/A')}/{gpu.get('memory_total', 'N/A')} MB",
+                f"{gpu.get('temperature', 'N/A')}°C",
+                f"{gpu.get('power_draw', 'N/A')}W"
+            )
+        
+        console.print(gpu_table)
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values: list, width: int = 40) -> str:
+    """Unicode bar per value, scaled between the smallest and largest; averaged down to width bars"""
+    if len(values) > width:
+        size = len(values) / width
+        values = [sum(chunk) / len(chunk) for chunk in
+                  (values[int(i * size):int((i + 1) * size)] for i in range(width)) if chunk]
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return "".join(SPARK_CHARS[int((v - low) / span * (len(SPARK_CHARS) - 1))] for v in values)
+
+def print_performance_history(console, body: dict, minutes: int):
+    """Print min/avg/max, the latest value and a sparkline per series"""
+    from rich.table import Table
+    table = Table(title=f"Performance - last {minutes} min ({body['step_ms'] // 1000}s steps)")
+    table.add_column("Series", style="cyan")
+    table.add_column("Min", justify="right")
+    table.add_column("Avg", justify="right", style="yellow")
+    table.add_column("Max", justify="right", style="red")
+    table.add_column("Last", justify="right")
+    table.add_column("Trend", style="green")
+    for name, points in body["series"].items():
+        if not points:
+            continue
+        count = len(points)
+        table.add_row(
+            name,
+            f"{min(p[2] for p in points):g}",
+            f"{sum(p[1] for p in points) / count:.2f}",
+            f"{max(p[3] for p in points):g}",
+            f"{points[-1][1]:g}",
+            sparkline([p[1] for p in points])
+        )
+    console.print(table)
+
+@app.command()
+def processes(
+    container: str = typer.Option(None, help="Only this container (name or id); 'host' for processes outside containers"),
+    limit: int = typer.Option(5, help="Processes per container"),
+    sort: str = typer.Option("cpu", help="Sort by cpu or memory")
+):
+    """Show the top processes in each container"""
+    import requests
+    from rich.table import Table
+    console = get_console()
     try:
-        r = requests.get(f"{get_base_url()}/metrics/performance")
+        r = requests.get(f"{get_base_url()}/processes",
+                         params={"container": container, "limit": limit, "sort": sort})
         r.raise_for_status()
-        metrics = r.json()
-        
-        # System overview
-        console.print("\n[bold blue]System Performance[/bold blue]")
-        console.print(f"CPU Usage: [yellow]{metrics.get('cpu_percent', 'N/A')}%[/yellow]")
-        console.print(f"Memory Usage: [yellow]{metrics.get('memory_percent', 'N/A')}%[/yellow]")
-        console.print(f"Disk Usage: [yellow]{metrics.get('disk_percent', 'N/A')}%[/yellow]")
-        
-        # GPU metrics
-        if 'gpus' in metrics:
-            console.print("\n[bold green]GPU Status[/bold green]")
-            gpu_table = Table()
-            gpu_table.add_column("GPU", style="cyan")
-            gpu_table.add_column("Utilization", style="green")
-            gpu_table.add_column("Memory", style="yellow")
-            gpu_table.add_column("Temperature", style="red")
-            gpu_table.add_column("Power", style="blue")
-            
-            for gpu in metrics['gpus']:
-                gpu_table.add_row(
-                    f"GPU {gpu.get('index', 'N/A')}",
-                    f"{gpu.get('utilization', 'N/A')}%",
-                    f"{gpu.get('memory_used', 'N/A')}/{gpu.get('memory_total', 'N/A')} MB",
-                    f"{gpu.get('temperature', 'N/A')}°C",
-                    f"{gpu.get('power_draw', 'N/A')}W"
-                )
-            
-            console.print(gpu_table)
+        body = r.json()
+        if body["timestamp"] is None:
+            console.print("[yellow]No process sample yet[/yellow]")
+            return
+        
+        table = Table(title=f"Top Processes ({body['processes']} processes, sampled in {body['sample_ms']} ms)")
+        table.add_column("Container", style="cyan")
+        table.add_column("PID", justify="right")
+        table.add_column("Name", style="white")
+        table.add_column("CPU %", justify="right", style="yellow")
+        table.add_column("Memory MB", justify="right", style="blue")
+        table.add_column("Command", style="white", overflow="ellipsis", no_wrap=True, max_width=60)
+        
+        ordered = sorted(body["containers"].items(), key=lambda item: item[1]["cpu_percent"], reverse=True)
+        for name, summary in ordered:
+            table.add_row(f"[bold]{name}[/bold] ({summary['process_count']})", "", "[dim]total[/dim]",
+                          f"{summary['cpu_percent']}", f"{summary['memory_mb']}", "")
+            for proc in summary["processes"]:
+                table.add_row("", str(proc["pid"]), proc["name"], f"{proc['cpu_percent']}",
+                              f"{proc['memory_mb']}", proc.get("cmdline", ""))
+        
+        console.print(table)
         
     except requests.exceptions.RequestException as e:
         console.print(f"[red]Error: {e}[/red]")
 
+@app.command()
+def export(
+    kind: str = typer.Argument(help="What to export: logs or metrics"),
+    output: str = typer.Argument(None, help="Output file (default: opshub-<kind> plus suffix)"),
+    start: str = typer.Option(None, help="Start time, ISO format, UTC unless an offset is given (inclusive)"),
+    end: str = typer.Option(None, help="End time, ISO format, UTC unless an offset is given (exclusive)"),
+    container: str = typer.Option(None, help="Only this container"),
+    level: str = typer.Option(None, help="Logs only: info, warning, error, success, critical"),
+    metric_type: str = typer.Option(None, help="Metrics only: host, gpu, ..."),
+    format: str = typer.Option("ndjson", help="ndjson or parquet"),
+    compression: str = typer.Option("gzip", help="gzip, zstd or none"),
+    resume: bool = typer.Option(False, help="Continue an interrupted NDJSON export into the same file")
+):
+    """Download logs or metrics for a time range as a compressed file"""
+    import requests
+    from .export import file_suffix, resume_point
+    console = get_console()
+    if kind not in ("logs", "metrics"):
+        console.print("[red]kind must be logs or metrics[/red]")
+        raise typer.Exit(1)
+    output = output or f"opshub-{kind}{file_suffix(format, compression)}"
+    
+    params = {"start": start, "end": end, "container": container, "format": format,
+              "compression": compression}
+    params.update({"level": level} if kind == "logs" else {"metric_type": metric_type})
+    mode = "wb"
+    if resume and os.path.exists(output):
+        if format != "ndjson":
+            console.print("[red]--resume only works with ndjson exports[/red]")
+            raise typer.Exit(1)
+        keep, last_id = resume_point(output, compression)
+        with open(output, "r+b") as fh:
+            fh.truncate(keep)
+        params["after_id"] = last_id
+        mode = "ab"
+        console.print(f"Resuming {output} after id {last_id} ({keep} bytes kept)")
+    
+    try:
+        started = time.perf_counter()
+        written = 0
+        with requests.get(f"{get_base_url()}/export/{kind}",
+                          params={k: v for k, v in params.items() if v is not None},
+                          stream=True, timeout=(5, 300)) as r:
+            r.raise_for_status()
+            with open(output, mode) as fh:
+                for chunk in r.iter_content(chunk_size=1 << 20):
+                    fh.write(chunk)
+                    written += len(chunk)
+        elapsed = time.perf_counter() - started
+        console.print(f"[green]Wrote {written / 1e6:.1f} MB to {output} in {elapsed:.1f}s "
+                      f"({written / 1e6 / max(elapsed, 1e-9):.1f} MB/s)[/green]")
+    except requests.exceptions.RequestException as e:
+        console.print(f"[red]Export interrupted: {e} (rerun with --resume)[/red]")
+        raise typer.Exit(1)
+
+def render_monitor(state: dict):
+    """Render a live monitor snapshot"""
+    from rich.table import Table
+    table = Table(title=f"Live Monitor - {datetime.now().strftime('%H:%M:%S')}")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green")
+    
+    containers = state.get('containers', {})
+    table.add_row("System CPU", f"{state.get('cpu_percent', 'N/A')}%")
+    table.add_row("System Memory", f"{state.get('memory_percent', 'N/A')}%")
+    table.add_row("Running Containers", str(containers.get('running', 'N/A')))
+    table.add_row("Total Containers", str(containers.get('total', 'N/A')))
+    
+    for gpu in state.get('gpus', []):
+        i = gpu.get('index')
+        table.add_row(f"GPU {i} Util", f"{gpu.get('utilization', 'N/A')}%")
+        table.add_row(f"GPU {i} Temp", f"{gpu.get('temperature', 'N/A')}°C")
+    
+    return table
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a server-sent events response"""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+
 @app.command()
 def monitor(
     interval: int = typer.Option(5, help="Refresh interval in seconds")
 ):
     """Live monitoring dashboard"""
-    def generate_dashboard():
-        try:
-            # Get container status
-            r = requests.get(f"{get_base_url()}/containers/status")
-            containers = r.json() if r.status_code == 200 else []
-            
-            # Get performance metrics
-            r = requests.get(f"{get_base_url()}/metrics/performance")
-            metrics = r.json() if r.status_code == 200 else {}
-            
-            # Create layout
-            table = Table(title=f"Live Monitor - {datetime.now().strftime('%H:%M:%S')}")
-            table.add_column("Metric", style="cyan")
-            table.add_column("Value", style="green")
-            
-            table.add_row("System CPU", f"{metrics.get('cpu_percent', 'N/A')}%")
-            table.add_row("System Memory", f"{metrics.get('memory_percent', 'N/A')}%")
-            table.add_row("Running Containers", str(len([c for c in containers if c.get('status') == 'running'])))
-            table.add_row("Total Containers", str(len(containers)))
-            
-            if 'gpus' in metrics:
-                for i, gpu in enumerate(metrics['gpus']):
-                    table.add_row(f"GPU {i} Util", f"{gpu.get('utilization', 'N/A')}%")
-                    table.add_row(f"GPU {i} Temp", f"{gpu.get('temperature', 'N/A')}°C")
-            
-            return table
-            
-        except Exception as e:
-            return Text(f"Error: {e}", style="red")
+    import requests
+    from rich.live import Live
+    from rich.text import Text
+    from .live import apply_delta
+    console = get_console()
     
-    with Live(generate_dashboard(), refresh_per_second=1/interval) as live:
+    with Live(Text("Connecting..."), refresh_per_second=4) as live:
         try:
             while True:
-                live.update(generate_dashboard())
+                try:
+                    # One persistent connection; the server pushes deltas every interval
+                    with requests.get(f"{get_base_url()}/stream/monitor",
+                                      params={"interval": interval}, stream=True,
+                                      timeout=(5, interval * 3 + 30)) as r:
+                        r.raise_for_status()
+                        state = {}
+                        for event, data in iter_sse(r):
+                            state = data if event == "snapshot" else apply_delta(state, data)
+                            live.update(render_monitor(state))
+                except requests.exceptions.RequestException as e:
+                    live.update(Text(f"Error: {e} (reconnecting)", style="red"))
+                time.sleep(interval)
         except KeyboardInterrupt:
             console.print("\n[yellow]Monitoring stopped[/yellow]")
 
+@bench_app.command("sources")
+def bench_sources(
+    containers: int = typer.Option(4, help="Number of synthetic containers"),
+    lines: int = typer.Option(100000, help="Lines per container")
+):
+    """Compare json-file reading against Docker API tailing"""
+    from .bench import bench_sources as run
+    print(json.dumps(run(containers, lines), indent=2))
+
+@bench_app.command("run")
+def bench_run(
+    containers: int = typer.Option(4, help="Number of synthetic containers"),
+    rate: float = typer.Option(500.0, help="Lines per second per container (0 = unpaced)"),
+    duration: float = typer.Option(30.0, help="Seconds of log traffic to generate"),
+    error_ratio: float = typer.Option(0.05, help="Share of ERROR lines"),
+    warning_ratio: float = typer.Option(0.10, help="Share of WARNING lines"),
+    http_concurrency: int = typer.Option(8, help="Concurrent API clients"),
+    stats_latency: float = typer.Option(0.0, help="Simulated Docker stats latency in seconds"),
+    output: str = typer.Option(None, "--output", "-o", help="Write JSON results to this file")
+):
+    """End-to-end ingest and API benchmark against a throwaway database"""
+    from .bench import run_benchmark
+    results = run_benchmark(containers, rate, duration, error_ratio, warning_ratio,
+                            http_concurrency, stats_latency)
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as fh:
+            fh.write(text + "\n")
+    print(text)
+
+@bench_app.command("federation")
+def bench_federation(
+    peers: int = typer.Option(3, help="Peer instances besides the federating node"),
+    containers: int = typer.Option(2, help="Synthetic containers per node"),
+    lines: int = typer.Option(20000, help="Stored lines per container"),
+    tail: int = typer.Option(1000, help="Lines requested per federated query"),
+    rounds: int = typer.Option(20, help="Queries of each kind")
+):
+    """Federated log and status queries across local OpsHub instances"""
+    from .bench import bench_federation as run
+    print(json.dumps(run(peers, containers, lines, tail, rounds), indent=2))
+
+@bench_app.command("export")
+def bench_export(
+    rows: int = typer.Option(200000, help="Log rows to seed and export"),
+    batch_size: int = typer.Option(5000, help="Rows per read batch / compressed member")
+):
+    """Export throughput (MB/s) for each format and compression"""
+    from .bench import bench_export as run
+    print(json.dumps(run(rows, batch_size), indent=2))
+
+@bench_app.command("records")
+def bench_records(
+    lines: int = typer.Option(1000000, help="Synthetic log lines to build, store and read back"),
+    memory_sample: int = typer.Option(100000, help="Rows held at once to measure memory per record")
+):
+    """Memory per record and records/s of LogRecord against plain dict rows"""
+    from .bench import bench_records as run
+    print(json.dumps(run(lines, memory_sample), indent=2))
+
+@bench_app.command("queries")
+def bench_queries(
+    rows: List[int] = typer.Option([1000000], "--rows", help="Log rows per fixture; repeat for several sizes"),
+    runs: int = typer.Option(20, help="Timed calls per query shape"),
+    days: int = typer.Option(7, help="Days the fixture's log rows span"),
+    fixture_dir: str = typer.Option(None, help="Keep fixtures here (one subdirectory per size) and reuse them"),
+    baseline: str = typer.Option(None, help="Baseline JSON to compare against; written when it has no run of a size"),
+    update_baseline: bool = typer.Option(False, help="Overwrite the baseline with this run"),
+    tolerance: float = typer.Option(1.5, help="Median latency ratio over the baseline that counts as a regression")
+):
+    """Query plans (no full scans) and latency percentiles over scaled fixtures, e.g. --rows 1000000 --rows 10000000"""
+    from .bench import bench_queries as run
+    results = run(rows, runs, days, fixture_dir=fixture_dir, baseline=baseline,
+                  update_baseline=update_baseline, tolerance=tolerance)
+    print(json.dumps(results, indent=2))
+    if not results["ok"]:
+        raise typer.Exit(1)
+
+@bench_app.command("tsdb")
+def bench_tsdb(
+    days: float = typer.Option(3, help="Days of 1-second samples to record for every series"),
+    runs: int = typer.Option(5, help="Timed history calls per window")
+):
+    """Time-series store bytes per sample, decode rate and history latency"""
+    from .bench import bench_tsdb as run
+    results = run(days, runs)
+    print(json.dumps(results, indent=2))
+    if not results["roundtrip_exact"]:
+        raise typer.Exit(1)
+
+@bench_app.command("processes")
+def bench_processes(
+    idle: int = typer.Option(1000, help="Sleeping child processes to add to the process table"),
+    ticks: int = typer.Option(5, help="Sampler ticks to time"),
+    interval: float = typer.Option(1.0, help="Seconds between ticks")
+):
+    """Process sampler cost per tick and CPU accuracy against a fresh process_iter scan"""
+    from .bench import bench_processes as run
+    print(json.dumps(run(idle, ticks, interval), indent=2))
+
+@bench_app.command("loki")
+def bench_loki(
+    lines: int = typer.Option(200000, help="Synthetic lines to forward"),
+    containers: int = typer.Option(4, help="Number of synthetic containers"),
+    batch_size: int = typer.Option(2000, help="Entries per push"),
+    outage: float = typer.Option(3.0, help="Seconds the stub Loki answers 503 mid-run")
+):
+    """Loki forwarding throughput and spool replay against a local stub"""
+    from .bench import bench_loki as run
+    results = run(lines, containers, batch_size, outage)
+    print(json.dumps(results, indent=2))
+    if not all(results["checks"].values()):
+        raise typer.Exit(1)
+
+@bench_app.command("rules")
+def bench_rules(
+    lines: int = typer.Option(20000, help="Lines per container (4 synthetic containers)")
+):
+    """Metadata extraction throughput (lines/s) as the rule count grows"""
+    from .bench import bench_rules as run
+    print(json.dumps(run(lines_per_container=lines), indent=2))
+
+@bench_app.command("startup")
+def bench_startup(
+    runs: int = typer.Option(5, help="Cold starts to time for each target"),
+    help_target: float = typer.Option(0.5, help="Target seconds for `opshub --help`"),
+    health_target: float = typer.Option(2.0, help="Target seconds until the server answers /health")
+):
+    """Time cold starts of the CLI and the server against their targets"""
+    from .bench import bench_startup as run
+    results = run(runs, help_target, health_target)
+    print(json.dumps(results, indent=2))
+    if not (results["cli_help"]["ok"] and results["server_health"]["ok"]):
+        raise typer.Exit(1)
+
 if __name__ == "__main__":
     app()
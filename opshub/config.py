@@ -8,3 +8,133 @@ RETENTION_ACTIVE_DAYS = int(os.getenv("OPS_RETENTION_ACTIVE_DAYS", 7))
 RETENTION_ARCHIVE_DAYS = int(os.getenv("OPS_RETENTION_ARCHIVE_DAYS", 30))
 RETENTION_PURGE_DAYS   = int(os.getenv("OPS_RETENTION_PURGE_DAYS", 90))
 LOG_BASE = "/data/logs"
+
+# Log template mining (log_patterns)
+PATTERN_BUCKET_SECONDS = int(os.getenv("OPS_PATTERN_BUCKET_SECONDS", 60))
+PATTERN_FLUSH_SECONDS = float(os.getenv("OPS_PATTERN_FLUSH_SECONDS", 5))
+PATTERN_DEPTH = int(os.getenv("OPS_PATTERN_DEPTH", 4))
+PATTERN_SIMILARITY = float(os.getenv("OPS_PATTERN_SIMILARITY", 0.4))
+PATTERN_MAX_CHILDREN = int(os.getenv("OPS_PATTERN_MAX_CHILDREN", 100))
+
+# Log volume counters (log_stats)
+STATS_BUCKET_SECONDS = 60
+STATS_FLUSH_SECONDS = float(os.getenv("OPS_STATS_FLUSH_SECONDS", 5))
+
+# Sessions without activity for this long are no longer active
+SESSION_IDLE_MINUTES = int(os.getenv("OPS_SESSION_IDLE_MINUTES", 30))
+
+# Alert engine: optional JSON rule file replacing the built-in rules
+ALERT_RULES_FILE = os.getenv("OPS_ALERT_RULES", "")
+ALERT_TICK_SECONDS = float(os.getenv("OPS_ALERT_TICK_SECONDS", 15))
+
+# Batched log writer
+WRITE_BATCH_SIZE = int(os.getenv("OPS_WRITE_BATCH_SIZE", 500))
+WRITE_FLUSH_SECONDS = float(os.getenv("OPS_WRITE_FLUSH_SECONDS", 1))
+WRITE_QUEUE_SIZE = int(os.getenv("OPS_WRITE_QUEUE_SIZE", 10000))
+
+# Output sinks: each runs on its own worker with its own queue; the database sink uses OPS_WRITE_*
+SINK_CONSOLE = os.getenv("OPS_SINK_CONSOLE", "true").lower() in ("1", "true", "yes")
+SINK_CONSOLE_BATCH = int(os.getenv("OPS_SINK_CONSOLE_BATCH", 200))
+SINK_CONSOLE_QUEUE = int(os.getenv("OPS_SINK_CONSOLE_QUEUE", 10000))
+SINK_FILES = os.getenv("OPS_SINK_FILES", "true").lower() in ("1", "true", "yes")
+SINK_FILES_BATCH = int(os.getenv("OPS_SINK_FILES_BATCH", 1000))
+SINK_FILES_FLUSH_SECONDS = float(os.getenv("OPS_SINK_FILES_FLUSH_SECONDS", 0.5))
+SINK_FILES_QUEUE = int(os.getenv("OPS_SINK_FILES_QUEUE", 20000))
+SINK_SQLITE = os.getenv("OPS_SINK_SQLITE", "true").lower() in ("1", "true", "yes")
+SINK_SESSIONS = os.getenv("OPS_SINK_SESSIONS", "true").lower() in ("1", "true", "yes")
+SINK_SESSIONS_BATCH = int(os.getenv("OPS_SINK_SESSIONS_BATCH", 200))
+SINK_SESSIONS_FLUSH_SECONDS = float(os.getenv("OPS_SINK_SESSIONS_FLUSH_SECONDS", 1))
+SINK_SESSIONS_QUEUE = int(os.getenv("OPS_SINK_SESSIONS_QUEUE", 10000))
+
+# Log source: "api" tails through the Docker daemon, "files" reads json-file logs directly
+LOG_SOURCE = os.getenv("OPS_LOG_SOURCE", "api")
+DOCKER_ROOT = os.getenv("OPS_DOCKER_ROOT", "/var/lib/docker")
+FILE_POLL_SECONDS = float(os.getenv("OPS_FILE_POLL_SECONDS", 0.25))
+
+# Live monitor feed: snapshot computation rate shared by all subscribers
+MONITOR_TICK_SECONDS = float(os.getenv("OPS_MONITOR_TICK_SECONDS", 1))
+
+# /debug endpoints (profiling, allocation tracing) are disabled unless a token is set
+DEBUG_TOKEN = os.getenv("OPS_DEBUG_TOKEN", "")
+
+# Federation: peers as comma-separated "name=http://host:8089" (or bare URLs)
+def federation_peers() -> list[tuple[str, str]]:
+    peers = []
+    for entry in os.getenv("OPS_PEERS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, url = entry.partition("=") if "=" in entry.split("://", 1)[0] else ("", "", entry)
+        url = url.rstrip("/")
+        peers.append((name or url.split("://", 1)[-1], url))
+    return peers
+
+NODE_NAME = os.getenv("OPS_NODE_NAME", os.uname().nodename)
+FEDERATION_CONNECT_TIMEOUT = float(os.getenv("OPS_FEDERATION_CONNECT_TIMEOUT", 2))
+FEDERATION_TIMEOUT = float(os.getenv("OPS_FEDERATION_TIMEOUT", 10))
+
+# Batched HTTP ingest (/ingest/logs, /ingest/sessions)
+INGEST_MAX_BYTES = int(os.getenv("OPS_INGEST_MAX_BYTES", 64 * 1024 * 1024))
+INGEST_MAX_RECORDS = int(os.getenv("OPS_INGEST_MAX_RECORDS", 50000))
+INGEST_CONCURRENCY = int(os.getenv("OPS_INGEST_CONCURRENCY", 4))
+INGEST_ACK_TIMEOUT = float(os.getenv("OPS_INGEST_ACK_TIMEOUT", 30))
+
+# Forwarding enriched lines to Loki; disabled unless OPS_LOKI_URL is set (e.g. http://loki:3100)
+LOKI_URL = os.getenv("OPS_LOKI_URL", "").rstrip("/")
+LOKI_TENANT = os.getenv("OPS_LOKI_TENANT", "")
+# Labels must stay low-cardinality; unbounded fields such as user go in the line instead (as key=value),
+# or into structured metadata when that is enabled
+LOKI_LABEL_FIELDS = [f.strip() for f in os.getenv("OPS_LOKI_LABEL_FIELDS", "model,gpu_id").split(",") if f.strip()]
+LOKI_LINE_FIELDS = [f.strip() for f in os.getenv("OPS_LOKI_LINE_FIELDS", "user").split(",") if f.strip()]
+LOKI_STRUCTURED_METADATA = os.getenv("OPS_LOKI_STRUCTURED_METADATA", "false").lower() in ("1", "true", "yes")
+LOKI_BATCH_SIZE = int(os.getenv("OPS_LOKI_BATCH_SIZE", 2000))
+LOKI_BATCH_BYTES = int(os.getenv("OPS_LOKI_BATCH_BYTES", 1024 * 1024))
+LOKI_BATCH_WAIT = float(os.getenv("OPS_LOKI_BATCH_WAIT", 1))
+LOKI_QUEUE_SIZE = int(os.getenv("OPS_LOKI_QUEUE_SIZE", 20000))
+LOKI_TIMEOUT = float(os.getenv("OPS_LOKI_TIMEOUT", 10))
+LOKI_SPOOL_DIR = os.getenv("OPS_LOKI_SPOOL_DIR", "/data/loki-spool")
+LOKI_SPOOL_MAX_BYTES = int(os.getenv("OPS_LOKI_SPOOL_MAX_BYTES", 256 * 1024 * 1024))
+
+# Day-sharded log storage: threads scanning shards concurrently, mmap size for settled shards
+LOG_SHARD_WORKERS = int(os.getenv("OPS_LOG_SHARD_WORKERS", 4))
+LOG_SHARD_MMAP_BYTES = int(os.getenv("OPS_LOG_SHARD_MMAP_BYTES", 256 * 1024 * 1024))
+
+# Metadata extraction rules (JSON); empty means the built-in opshub/extract_rules.json
+EXTRACT_RULES_FILE = os.getenv("OPS_EXTRACT_RULES", "")
+EXTRACT_RULES_POLL_SECONDS = float(os.getenv("OPS_EXTRACT_RULES_POLL_SECONDS", 5))
+
+# Per-model latency and token sketches (model_stats): bucket size, flush interval, quantile accuracy,
+# and the trailing window the Prometheus summaries' quantiles cover
+MODEL_STATS_BUCKET_SECONDS = int(os.getenv("OPS_MODEL_STATS_BUCKET_SECONDS", 300))
+MODEL_STATS_FLUSH_SECONDS = float(os.getenv("OPS_MODEL_STATS_FLUSH_SECONDS", 10))
+MODEL_STATS_ACCURACY = float(os.getenv("OPS_MODEL_STATS_ACCURACY", 0.01))
+MODEL_STATS_SUMMARY_SECONDS = int(os.getenv("OPS_MODEL_STATS_SUMMARY_SECONDS", 600))
+
+# Distinct users per (model, hour) as HyperLogLog sketches (user_stats); error is 1.04 / sqrt(2**precision)
+USER_STATS_BUCKET_SECONDS = 3600
+USER_STATS_PRECISION = int(os.getenv("OPS_USER_STATS_PRECISION", 14))
+USER_STATS_FLUSH_SECONDS = float(os.getenv("OPS_USER_STATS_FLUSH_SECONDS", 10))
+
+# API reads run on their own bounded thread pool (db_executor), not the HTTP threadpool: worker threads,
+# calls allowed to wait for one before requests get 503, and the time a call's queries get before 504
+DB_EXECUTOR_WORKERS = int(os.getenv("OPS_DB_EXECUTOR_WORKERS", 4))
+DB_EXECUTOR_QUEUE = int(os.getenv("OPS_DB_EXECUTOR_QUEUE", 32))
+DB_QUERY_TIMEOUT = float(os.getenv("OPS_DB_QUERY_TIMEOUT", 10))
+# Exports pull one batch at a time through the same pool; all of an export's queries share this budget
+EXPORT_TIMEOUT = float(os.getenv("OPS_EXPORT_TIMEOUT", 3600))
+
+# Host and GPU samples (tsdb): collector sample interval, compressed block span, how often blocks are
+# stored, how long they are kept, and how often a sample is also written as a performance_metrics row
+# (0 turns those rows off)
+METRICS_SAMPLE_SECONDS = float(os.getenv("OPS_METRICS_SAMPLE_SECONDS", 1))
+TSDB_BLOCK_SECONDS = int(os.getenv("OPS_TSDB_BLOCK_SECONDS", 3600))
+TSDB_FLUSH_SECONDS = float(os.getenv("OPS_TSDB_FLUSH_SECONDS", 60))
+TSDB_RETENTION_DAYS = int(os.getenv("OPS_TSDB_RETENTION_DAYS", 30))
+PERFORMANCE_ROW_SECONDS = float(os.getenv("OPS_PERFORMANCE_ROW_SECONDS", 60))
+
+# Per-process CPU and memory attributed to containers (processes): seconds between samples, the share of
+# one core sampling may use (ticks are spaced further apart on hosts with many processes), and the
+# processes kept per container for /processes
+PROCESS_SAMPLE_SECONDS = float(os.getenv("OPS_PROCESS_SAMPLE_SECONDS", 5))
+PROCESS_SAMPLE_BUDGET = float(os.getenv("OPS_PROCESS_SAMPLE_BUDGET", 0.02))
+PROCESS_TOP_N = int(os.getenv("OPS_PROCESS_TOP_N", 20))
@@ -0,0 +1,44 @@
+import threading, time
+from collections import defaultdict
+
+class BucketCounter:
+    """Thread-safe in-memory counters keyed by (bucket, *key), drained in batches"""
+
+    def __init__(self, bucket_seconds: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def bucket_for(self, ts: float = None) -> int:
+        """Start of the bucket containing ts (epoch seconds)"""
+        if ts is None:
+            ts = time.time()
+        return int(ts // self.bucket_seconds) * self.bucket_seconds
+
+    def add(self, key: tuple, n: int = 1, ts: float = None):
+        bucket = self.bucket_for(ts)
+        with self._lock:
+            self._counts[(bucket, *key)] += n
+
+    def drain(self) -> dict:
+        """Return and reset all pending counts"""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(int)
+        return dict(counts)
+
+    def restore(self, counts: dict):
+        """Merge drained counts back, e.g. after a failed flush"""
+        with self._lock:
+            for key, n in counts.items():
+                self._counts[key] += n
+
+    def prune(self, before_bucket: int):
+        """Drop counts for buckets older than before_bucket"""
+        with self._lock:
+            for key in [k for k in self._counts if k[0] < before_bucket]:
+                del self._counts[key]
+
+    def pending(self) -> dict:
+        """Copy of pending counts that have not been drained yet"""
+        with self._lock:
+            return dict(self._counts)
@@ -1,18 +1,256 @@
 import sqlite3
 import json
 import os
-from datetime import datetime, timedelta
+import heapq
+import itertools
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
 from typing import List, Dict, Optional
 import threading
+import time
+from contextlib import contextmanager
+from .config import SESSION_IDLE_MINUTES, LOG_SHARD_WORKERS, LOG_SHARD_MMAP_BYTES, TSDB_RETENTION_DAYS
+from .records import LogRecord, COLUMNS as LOG_COLUMNS
 
 DB_PATH = "/data/opshub.db"
 _db_lock = threading.Lock()
 
+# Log rows live in one SQLite file per day (log-shards/YYYY-MM-DD.db next to the
+# main database), by the day of their timestamp. Each shard's ids start at its
+# day number * LOG_SHARD_ID_SPAN, so ids stay unique and increasing across
+# shards. Rows written before sharding stay in the main database's logs table,
+# which is queried as one more (oldest) shard while it has rows.
+LOG_SHARD_ID_SPAN = 10_000_000_000
+LEGACY_SHARD = None
+
+_legacy_logs = False
+_ready_shards = set()
+_shard_executor = None
+_shard_lock = threading.Lock()
+
+# Reads on behalf of an API request carry a QueryBudget (see db_executor); SQLite's
+# progress handler checks it every QUERY_CHECK_STEPS VM instructions and aborts the
+# statement with "interrupted" once it is spent or cancelled
+QUERY_CHECK_STEPS = 10000
+_local = threading.local()
+
+class QueryBudget:
+    """Deadline and cancel flag shared by the queries of one call"""
+    __slots__ = ("deadline", "cancelled")
+
+    def __init__(self, timeout: float):
+        self.deadline = time.monotonic() + timeout
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def exhausted(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.deadline
+
+@contextmanager
+def query_budget(budget: Optional[QueryBudget]):
+    """Apply budget to connections opened by this thread inside the block"""
+    previous = getattr(_local, "budget", None)
+    _local.budget = budget
+    try:
+        yield budget
+    finally:
+        _local.budget = previous
+
+@contextmanager
+def traced_statements(statements: Optional[list]):
+    """Append (database path, SQL with values bound) for each statement this thread
+    runs inside the block, log shard queries included; used by bench queries"""
+    previous = getattr(_local, "trace", None)
+    _local.trace = statements
+    try:
+        yield statements
+    finally:
+        _local.trace = previous
+
+def _watch(conn):
+    budget = getattr(_local, "budget", None)
+    if budget is not None:
+        conn.set_progress_handler(budget.exhausted, QUERY_CHECK_STEPS)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        path = conn.execute("PRAGMA database_list").fetchone()[2]
+        conn.set_trace_callback(lambda sql: trace.append((path, sql)))
+    return conn
+
 def get_connection():
     """Get database connection with proper configuration"""
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    return conn
+    return _watch(conn)
+
+def _add_missing_columns(conn, table: str, columns: Dict[str, str]):
+    """Add columns introduced after a table was first created"""
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def _create_logs_table(conn):
+    """Create the logs table and its indexes (main database or a day shard)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            container_name TEXT NOT NULL,
+            container_id TEXT NOT NULL,
+            level TEXT NOT NULL,
+            message TEXT NOT NULL,
+            raw_log TEXT,
+            source TEXT,
+            template_id INTEGER,
+            template_vars TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON logs(timestamp)")
+    # Filters end in timestamp so ORDER BY timestamp DESC LIMIT n reads n rows instead of sorting every
+    # match; they replace the single-column container_name and level indexes (see bench queries)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_container_time ON logs(container_name, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_level_time ON logs(level, timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_container_level_time ON logs(container_name, level, timestamp)")
+    conn.execute("DROP INDEX IF EXISTS idx_logs_container_name")
+    conn.execute("DROP INDEX IF EXISTS idx_logs_level")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_created_at ON logs(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_template_id ON logs(template_id)")
+    
+    # Fields of structured (JSON) lines; partial indexes only cover lines that have them
+    _add_missing_columns(conn, "logs", {"http_status": "INTEGER", "latency_ms": "REAL", "path": "TEXT",
+                                        "username": "TEXT", "model": "TEXT"})
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_logs_latency
+        ON logs(timestamp, container_name, path, latency_ms, http_status) WHERE latency_ms IS NOT NULL
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_http_status ON logs(http_status, timestamp) WHERE http_status IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_username ON logs(username, timestamp) WHERE username IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_model ON logs(model, timestamp) WHERE model IS NOT NULL")
+
+def _create_checkpoints_table(conn):
+    """Per-container tailing high-water mark (Docker timestamp + line hash). The main database
+    has one, and so does each day shard for the rows committed to it (see store_log_day)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS log_checkpoints (
+            container_id TEXT PRIMARY KEY,
+            container_name TEXT NOT NULL,
+            ts_ns INTEGER NOT NULL,
+            line_hash TEXT NOT NULL,
+            file_inode INTEGER,
+            file_offset INTEGER,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    _add_missing_columns(conn, "log_checkpoints", {"file_inode": "INTEGER", "file_offset": "INTEGER"})
+
+def shard_dir() -> str:
+    return os.path.join(os.path.dirname(DB_PATH), "log-shards")
+
+def _shard_path(day: str) -> str:
+    return os.path.join(shard_dir(), f"{day}.db")
+
+def _shard_days() -> List[str]:
+    """Days (YYYY-MM-DD) that have a shard file, oldest first"""
+    try:
+        names = os.listdir(shard_dir())
+    except FileNotFoundError:
+        return []
+    return sorted(name[:-3] for name in names if name.endswith(".db") and len(name) == 13)
+
+def _log_shards(start: str = None, end: str = None) -> list:
+    """Shards that may hold rows with start <= timestamp <= end, oldest first"""
+    days = [day for day in _shard_days()
+            if (not start or day >= start[:10]) and (not end or day <= end[:10])]
+    return ([LEGACY_SHARD] if _legacy_logs else []) + days
+
+def _open_shard_for_write(day: str):
+    path = _shard_path(day)
+    if path not in _ready_shards:
+        os.makedirs(shard_dir(), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _create_logs_table(conn)
+            _create_checkpoints_table(conn)
+            base = (date.fromisoformat(day) - date(1970, 1, 1)).days * LOG_SHARD_ID_SPAN
+            conn.execute("""
+                INSERT INTO sqlite_sequence (name, seq) SELECT 'logs', ?
+                WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'logs')
+            """, (base,))
+            conn.commit()
+        finally:
+            conn.close()
+        _ready_shards.add(path)
+    return sqlite3.connect(path, check_same_thread=False)
+
+def _open_log_shard(shard):
+    """Read connection to a shard; settled past days are opened read-only with mmap"""
+    if shard is LEGACY_SHARD:
+        return get_connection()
+    path = _shard_path(shard)
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    if shard < yesterday and not os.path.exists(path + "-wal"):
+        conn = sqlite3.connect(Path(path).as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size={LOG_SHARD_MMAP_BYTES}")
+    else:
+        # mode=rw so a shard removed by retention is not recreated empty
+        conn = sqlite3.connect(Path(path).as_uri() + "?mode=rw", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return _watch(conn)
+
+def _shard_pool() -> ThreadPoolExecutor:
+    global _shard_executor
+    with _shard_lock:
+        if _shard_executor is None:
+            _shard_executor = ThreadPoolExecutor(max_workers=LOG_SHARD_WORKERS,
+                                                 thread_name_prefix="opshub-shards")
+        return _shard_executor
+
+def _query_shards(sql: str, params: list, shards: list, limit: int = None,
+                  row_factory=None) -> List[list]:
+    """Run a query on each shard concurrently; one row list per shard.
+
+    Rows are dicts unless row_factory is given. With limit, shards are taken
+    newest first, a pool's worth at a time, and older ones are skipped once
+    limit rows are in hand (days do not overlap). The caller's query budget
+    and statement trace apply to every shard.
+    """
+    budget, trace = getattr(_local, "budget", None), getattr(_local, "trace", None)
+
+    def run(shard):
+        with query_budget(budget), traced_statements(trace):
+            try:
+                conn = _open_log_shard(shard)
+            except sqlite3.OperationalError:
+                return []  # removed by retention since it was listed
+        try:
+            if row_factory is not None:
+                conn.row_factory = row_factory
+                return conn.execute(sql, params).fetchall()
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+    
+    shards = shards[::-1]
+    step = LOG_SHARD_WORKERS if limit else max(1, len(shards))
+    results = []
+    for i in range(0, len(shards), step):
+        results.extend(_shard_pool().map(run, shards[i:i + step]))
+        if limit and sum(map(len, results)) >= limit:
+            break
+    return results
+
+def _newest_first(results: List[List[LogRecord]], limit: int) -> List[LogRecord]:
+    """Merge per-shard records (each newest first) by timestamp"""
+    merged = heapq.merge(*results, key=itemgetter(0), reverse=True)
+    return list(itertools.islice(merged, limit))
 
 def init_db():
     """Initialize database with required tables"""
@@ -21,25 +259,88 @@ def init_db():
     with _db_lock:
         conn = get_connection()
         try:
-            # Logs table
+            # WAL lets long exports read a snapshot without blocking writers
+            conn.execute("PRAGMA journal_mode=WAL")
+            
+            # Logs table; only read while it still has rows from before sharding
+            _create_logs_table(conn)
+            global _legacy_logs
+            _legacy_logs = conn.execute("SELECT 1 FROM logs LIMIT 1").fetchone() is not None
+            
+            _create_checkpoints_table(conn)
+            
+            # Log template catalog mined by log_patterns
             conn.execute("""
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
+                CREATE TABLE IF NOT EXISTS log_templates (
+                    id INTEGER PRIMARY KEY,
+                    template TEXT NOT NULL,
+                    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Per-template line counts per time bucket (bucket = epoch seconds)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS log_template_counts (
+                    bucket INTEGER NOT NULL,
+                    template_id INTEGER NOT NULL,
                     container_name TEXT NOT NULL,
-                    container_id TEXT NOT NULL,
                     level TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    raw_log TEXT,
-                    source TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    INDEX(timestamp),
-                    INDEX(container_name),
-                    INDEX(level),
-                    INDEX(created_at)
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket, template_id, container_name, level)
+                )
+            """)
+            
+            # Per-minute log line counts by container and level (bucket = epoch seconds)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS log_volume_counts (
+                    bucket INTEGER NOT NULL,
+                    container_name TEXT NOT NULL,
+                    level TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (bucket, container_name, level)
                 )
             """)
             
+            # Per-model latency/token quantile sketches per time bucket, merged on read (model_stats)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS model_sketches (
+                    bucket INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    sketch BLOB NOT NULL,
+                    PRIMARY KEY (bucket, model, metric)
+                )
+            """)
+            
+            # Distinct users per model and hour as HyperLogLog sketches, merged on read (user_stats);
+            # model '' holds users seen without a model
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_sketches (
+                    bucket INTEGER NOT NULL,
+                    model TEXT NOT NULL,
+                    sketch BLOB NOT NULL,
+                    PRIMARY KEY (bucket, model)
+                )
+            """)
+            
+            # Host/GPU samples as compressed blocks per series (tsdb); open blocks are rewritten in place
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS series_blocks (
+                    series TEXT NOT NULL,
+                    first_ts INTEGER NOT NULL,
+                    last_ts INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    min REAL NOT NULL,
+                    max REAL NOT NULL,
+                    sum REAL NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (series, first_ts)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_series_blocks_last_ts ON series_blocks(last_ts)")
+            
             # User sessions table for OpenWebUI tracking
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS user_sessions (
@@ -51,12 +352,31 @@ def init_db():
                     ip_address TEXT,
                     user_agent TEXT,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    metadata TEXT,
-                    INDEX(username),
-                    INDEX(model),
-                    INDEX(timestamp)
+                    metadata TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_username ON user_sessions(username)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_model ON user_sessions(model)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_sessions_timestamp ON user_sessions(timestamp)")
+            
+            # Current sessions, maintained as session events arrive
+            seed_sessions = not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'active_sessions'").fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS active_sessions (
+                    username TEXT NOT NULL,
+                    session_id TEXT NOT NULL DEFAULT '',
+                    model TEXT,
+                    ip_address TEXT,
+                    started_at DATETIME NOT NULL,
+                    last_activity DATETIME NOT NULL,
+                    request_count INTEGER NOT NULL DEFAULT 1,
+                    PRIMARY KEY (username, session_id)
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_active_sessions_last_activity ON active_sessions(last_activity)")
+            if seed_sessions:
+                _seed_active_sessions(conn)
             
             # Performance metrics table
             conn.execute("""
@@ -68,12 +388,12 @@ def init_db():
                     value REAL NOT NULL,
                     unit TEXT,
                     container_name TEXT,
-                    metadata TEXT,
-                    INDEX(timestamp),
-                    INDEX(metric_type),
-                    INDEX(container_name)
+                    metadata TEXT
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_performance_metrics_timestamp ON performance_metrics(timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_performance_metrics_metric_type ON performance_metrics(metric_type)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_performance_metrics_container_name ON performance_metrics(container_name)")
             
             # Container status history
             conn.execute("""
@@ -87,11 +407,11 @@ def init_db():
                     memory_percent REAL,
                     network_rx_mb REAL,
                     network_tx_mb REAL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    INDEX(container_name),
-                    INDEX(timestamp)
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_container_status_container_name ON container_status(container_name)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_container_status_timestamp ON container_status(timestamp)")
             
             # Alert history
             conn.execute("""
@@ -105,13 +425,16 @@ def init_db():
                     threshold_value REAL,
                     resolved BOOLEAN DEFAULT FALSE,
                     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    resolved_at DATETIME,
-                    INDEX(alert_type),
-                    INDEX(severity),
-                    INDEX(timestamp),
-                    INDEX(resolved)
+                    resolved_at DATETIME
                 )
             """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_alert_type ON alerts(alert_type)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts(timestamp)")
+            # Time-ordered within a severity or resolved state, so filtered history needs no sort
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_severity_time ON alerts(severity, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_resolved_time ON alerts(resolved, timestamp)")
+            conn.execute("DROP INDEX IF EXISTS idx_alerts_severity")
+            conn.execute("DROP INDEX IF EXISTS idx_alerts_resolved")
             
             conn.commit()
             
@@ -120,58 +443,480 @@ def init_db():
 
 def store_log_entry(container_name: str, container_id: str, level: str, 
                    message: str, raw_log: str = None, source: str = None,
-                   timestamp: str = None):
+                   timestamp: str = None, template_id: int = None,
+                   template_vars: List[str] = None):
     """Store log entry in database"""
     if not timestamp:
         timestamp = datetime.now().isoformat()
     
+    store_log_entries([LogRecord(timestamp, container_name, container_id, level, message, raw_log, source,
+                                 template_id, json.dumps(template_vars) if template_vars else None)])
+
+_UPSERT_CHECKPOINT = """
+    INSERT INTO log_checkpoints (container_id, container_name, ts_ns, line_hash, file_inode, file_offset)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(container_id) DO UPDATE SET
+        container_name = excluded.container_name, ts_ns = excluded.ts_ns,
+        line_hash = excluded.line_hash, file_inode = excluded.file_inode,
+        file_offset = excluded.file_offset, updated_at = CURRENT_TIMESTAMP
+"""
+
+def log_entry_days(entries: List[LogRecord], marks: list = None) -> list:
+    """Split a batch into (day, records, checkpoints) for store_log_day, oldest day first.
+
+    marks, when given, runs parallel to entries: the (container_name, ts_ns,
+    line_hash, file_inode, file_offset) tailing checkpoint just past each
+    entry, or None. A day's checkpoints are the last mark per container id
+    among its entries.
+    """
+    days = {}
+    for entry, mark in zip(entries, marks or itertools.repeat(None)):
+        rows, checkpoints = days.setdefault(entry[0][:10], ([], {}))
+        rows.append(entry)
+        if mark is not None:
+            checkpoints[entry[2]] = mark
+    return [(day, rows, checkpoints) for day, (rows, checkpoints) in sorted(days.items())]
+
+def store_log_day(day: str, entries: List[LogRecord], checkpoints: Dict[str, tuple] = None):
+    """Store one day's log records and their tailing checkpoints in that day's shard, in one transaction.
+
+    The rows and the checkpoint past them commit together, so a crash or a
+    failed write can neither replay committed rows nor skip lost ones. The
+    main database's copy of the checkpoints is updated afterwards as a
+    lookup that outlives the shard; get_log_checkpoint takes the newest.
+    """
     with _db_lock:
-        conn = get_connection()
+        conn = _open_shard_for_write(day)
         try:
-            conn.execute("""
-                INSERT INTO logs (timestamp, container_name, container_id, level, message, raw_log, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (timestamp, container_name, container_id, level, message, raw_log, source))
+            # A record's id is None, so the shard assigns it
+            conn.executemany(f"""
+                INSERT INTO logs ({LOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, entries)
+            if checkpoints:
+                conn.executemany(_UPSERT_CHECKPOINT, [(cid, *mark) for cid, mark in checkpoints.items()])
             conn.commit()
         finally:
             conn.close()
+        
+        if checkpoints:
+            # Already durable in the shard, so a failure here must not fail (and replay) the batch
+            try:
+                conn = get_connection()
+                try:
+                    conn.executemany(_UPSERT_CHECKPOINT, [(cid, *mark) for cid, mark in checkpoints.items()])
+                    conn.commit()
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Error copying log checkpoints to the main database: {e}")
+
+def store_log_entries(entries: List[LogRecord], marks: list = None):
+    """Store a batch of log records in their day shards, each day with its checkpoints (see log_entry_days)"""
+    for day, rows, checkpoints in log_entry_days(entries, marks):
+        store_log_day(day, rows, checkpoints)
+
+def get_log_checkpoint(container_id: str) -> Optional[Dict]:
+    """Get the tailing checkpoint (ts_ns, line_hash, file_inode, file_offset) for a container.
+
+    The newest of the main database's copy and the ones committed in each day shard.
+    """
+    query = """
+        SELECT ts_ns, line_hash, file_inode, file_offset
+        FROM log_checkpoints WHERE container_id = ?
+    """
+    found = []
+    with _db_lock:
+        conn = get_connection()
+        try:
+            found.extend(conn.execute(query, (container_id,)).fetchall())
+        finally:
+            conn.close()
+    for day in _shard_days():
+        try:
+            conn = _open_log_shard(day)
+        except sqlite3.OperationalError:
+            continue  # removed by retention since it was listed
+        try:
+            found.extend(conn.execute(query, (container_id,)).fetchall())
+        except sqlite3.OperationalError:
+            pass  # a shard written before checkpoints were kept per shard
+        finally:
+            conn.close()
+    return dict(max(found, key=itemgetter("ts_ns"))) if found else None
 
 def get_logs(container: str = None, level: str = "all", limit: int = 100, 
-            since: datetime = None) -> List[Dict]:
+            since: datetime = None) -> List[LogRecord]:
     """Get logs with filtering"""
+    query = f"SELECT {LOG_COLUMNS} FROM logs WHERE 1=1"
+    params = []
+    
+    if container and container != "all":
+        query += " AND container_name = ?"
+        params.append(container)
+    
+    if level != "all":
+        query += " AND level = ?"
+        params.append(level.upper())
+    
+    start = since.isoformat() if since else None
+    if start:
+        query += " AND timestamp >= ?"
+        params.append(start)
+    
+    query += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
+    
+    return _newest_first(_query_shards(query, params, _log_shards(start), limit, LogRecord.from_row), limit)
+
+def search_logs(query: str, container: str = None, level: str = None,
+                start_time: str = None, end_time: str = None, limit: int = 1000) -> List[LogRecord]:
+    """Search log messages for a substring with optional filters"""
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    sql = f"SELECT {LOG_COLUMNS} FROM logs WHERE message LIKE ? ESCAPE '\\'"
+    params = [pattern]
+    
+    if container and container != "all":
+        sql += " AND container_name = ?"
+        params.append(container)
+    
+    if level and level != "all":
+        sql += " AND level = ?"
+        params.append(level.upper())
+    
+    if start_time:
+        sql += " AND timestamp >= ?"
+        params.append(start_time)
+    
+    if end_time:
+        sql += " AND timestamp <= ?"
+        params.append(end_time)
+    
+    sql += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
+    
+    shards = _log_shards(start_time, end_time)
+    return _newest_first(_query_shards(sql, params, shards, limit, LogRecord.from_row), limit)
+
+def get_latency_by_path(since: str, container: str = None, min_count: int = 1,
+                        limit: int = 50) -> List[Dict]:
+    """Nearest-rank latency percentiles per path of structured lines since a timestamp"""
+    # Served by the partial idx_logs_latency index alone
+    query = """
+        SELECT path, latency_ms, http_status FROM logs INDEXED BY idx_logs_latency
+        WHERE latency_ms IS NOT NULL AND timestamp >= ?
+    """
+    params = [since]
+    
+    if container and container != "all":
+        query += " AND container_name = ?"
+        params.append(container)
+    
+    latencies, server_errors = {}, {}
+    for row in itertools.chain.from_iterable(_query_shards(query, params, _log_shards(since))):
+        path, status = row["path"], row["http_status"]
+        latencies.setdefault(path, []).append(row["latency_ms"])
+        if status is not None and status >= 500:
+            server_errors[path] = server_errors.get(path, 0) + 1
+    
+    results = []
+    for path, values in latencies.items():
+        if len(values) < min_count:
+            continue
+        values.sort()
+        rank = lambda p: values[min(len(values) - 1, int(len(values) * p / 100))]
+        results.append({"path": path, "count": len(values), "p50_ms": rank(50), "p95_ms": rank(95),
+                        "p99_ms": rank(99), "max_ms": values[-1],
+                        "server_errors": server_errors.get(path, 0)})
+    results.sort(key=lambda r: r["p95_ms"], reverse=True)
+    return results[:limit]
+
+def iter_export_rows(table: str, columns: List[str], start: str = None, end: str = None,
+                     after_id: int = 0, filters: Dict[str, str] = None, batch_size: int = 5000):
+    """Yield batches of rows in id order, each shard (or table) from one read snapshot.
+
+    Uses its own connections outside _db_lock; under WAL the open read
+    transaction keeps a fixed view while the writer carries on. Log shards are
+    read oldest first, which is id order. Memory stays at one batch.
+    """
+    if table != "logs":
+        yield from _iter_rows(get_connection(), table, columns, start, end, after_id, filters, batch_size)
+        return
+    for shard in _log_shards(start, end):
+        try:
+            conn = _open_log_shard(shard)
+        except sqlite3.OperationalError:
+            continue  # removed by retention since it was listed
+        yield from _iter_rows(conn, table, columns, start, end, after_id, filters, batch_size)
+
+def _iter_rows(conn, table: str, columns: List[str], start: str, end: str, after_id: int,
+               filters: Dict[str, str], batch_size: int):
+    """Batches of one table's rows in id order; the time range is turned into an id
+    range through the timestamp index, then rows are read in rowid order"""
+    try:
+        conn.execute("BEGIN")
+        where, params = ["id > ?"], [after_id]
+        if start:
+            low = conn.execute(f"SELECT MIN(id) FROM {table} WHERE timestamp >= ?", (start,)).fetchone()[0]
+            if low is None:
+                return
+            where += ["id >= ?", "+timestamp >= ?"]
+            params += [low, start]
+        if end:
+            high = conn.execute(f"SELECT MAX(id) FROM {table} WHERE timestamp < ?", (end,)).fetchone()[0]
+            if high is None:
+                return
+            where += ["id <= ?", "+timestamp < ?"]
+            params += [high, end]
+        for column, value in (filters or {}).items():
+            where.append(f"+{column} = ?")
+            params.append(value)
+        
+        cursor = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {' AND '.join(where)} ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+def store_log_templates(templates: Dict[int, str]):
+    """Insert or update mined log templates"""
+    if not templates:
+        return
+    
     with _db_lock:
         conn = get_connection()
         try:
-            query = "SELECT * FROM logs WHERE 1=1"
-            params = []
-            
-            if container and container != "all":
-                query += " AND container_name = ?"
-                params.append(container)
-            
-            if level != "all":
-                query += " AND level = ?"
-                params.append(level.upper())
-            
-            if since:
-                query += " AND timestamp >= ?"
-                params.append(since.isoformat())
-            
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
-            
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-            
-            return [dict(row) for row in rows]
-            
+            conn.executemany("""
+                INSERT INTO log_templates (id, template) VALUES (?, ?)
+                ON CONFLICT(id) DO UPDATE SET template = excluded.template,
+                                              last_seen = CURRENT_TIMESTAMP
+            """, list(templates.items()))
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_log_templates() -> Dict[int, str]:
+    """Get the full log template catalog"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute("SELECT id, template FROM log_templates ORDER BY id")
+        return {row["id"]: row["template"] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+def increment_template_counts(counts: Dict[tuple, int]):
+    """Add (bucket, template_id, container_name, level) -> count deltas"""
+    if not counts:
+        return
+    
+    with _db_lock:
+        conn = get_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO log_template_counts (bucket, template_id, container_name, level, count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(bucket, template_id, container_name, level)
+                DO UPDATE SET count = count + excluded.count
+            """, [(*key, n) for key, n in counts.items()])
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_template_counts(since_bucket: int, container: str = None,
+                        level: str = "all") -> Dict[int, int]:
+    """Get line counts per template since a bucket"""
+    conn = get_connection()
+    try:
+        query = """
+            SELECT template_id, SUM(count) AS total
+            FROM log_template_counts
+            WHERE bucket >= ?
+        """
+        params = [since_bucket]
+        
+        if container and container != "all":
+            query += " AND container_name = ?"
+            params.append(container)
+        
+        if level != "all":
+            query += " AND level = ?"
+            params.append(level.upper())
+        
+        query += " GROUP BY template_id"
+        
+        cursor = conn.execute(query, params)
+        return {row["template_id"]: row["total"] for row in cursor.fetchall()}
+        
+    finally:
+        conn.close()
+
+def increment_log_volume(counts: Dict[tuple, int]):
+    """Add (bucket, container_name, level) -> count deltas"""
+    if not counts:
+        return
+    
+    with _db_lock:
+        conn = get_connection()
+        try:
+            conn.executemany("""
+                INSERT INTO log_volume_counts (bucket, container_name, level, count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(bucket, container_name, level)
+                DO UPDATE SET count = count + excluded.count
+            """, [(*key, n) for key, n in counts.items()])
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_log_volume(since_bucket: int, until_bucket: int, step: int,
+                   container: str = None, level: str = "all") -> List[Dict]:
+    """Get log line counts re-bucketed to step seconds"""
+    conn = get_connection()
+    try:
+        query = """
+            SELECT (bucket / ?) * ? AS bucket, container_name, level, SUM(count) AS count
+            FROM log_volume_counts
+            WHERE bucket >= ? AND bucket <= ?
+        """
+        params = [step, step, since_bucket, until_bucket]
+        
+        if container and container != "all":
+            query += " AND container_name = ?"
+            params.append(container)
+        
+        if level != "all":
+            query += " AND level = ?"
+            params.append(level.upper())
+        
+        query += " GROUP BY 1, container_name, level ORDER BY 1"
+        
+        cursor = conn.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+        
+    finally:
+        conn.close()
+
+def merge_model_sketches(sketches: Dict[tuple, tuple], merge):
+    """Fold (bucket, model, metric) -> (count, blob) into stored sketches; merge(old, new) combines two blobs"""
+    if not sketches:
+        return
+    
+    with _db_lock:
+        conn = get_connection()
+        try:
+            rows = []
+            for key, (count, blob) in sketches.items():
+                existing = conn.execute(
+                    "SELECT count, sketch FROM model_sketches WHERE bucket = ? AND model = ? AND metric = ?", key
+                ).fetchone()
+                if existing:
+                    count, blob = existing["count"] + count, merge(existing["sketch"], blob)
+                rows.append((*key, count, blob))
+            conn.executemany("""
+                INSERT OR REPLACE INTO model_sketches (bucket, model, metric, count, sketch)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_model_sketches(since_bucket: int, until_bucket: int, model: str = None) -> List[Dict]:
+    """Get stored sketches for buckets in [since_bucket, until_bucket]"""
+    conn = get_connection()
+    try:
+        query = "SELECT bucket, model, metric, sketch FROM model_sketches WHERE bucket >= ? AND bucket <= ?"
+        params = [since_bucket, until_bucket]
+        if model:
+            query += " AND model = ?"
+            params.append(model)
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+def merge_user_sketches(sketches: Dict[tuple, bytes], merge):
+    """Fold (bucket, model) -> blob into stored sketches; merge(old, new) combines two blobs"""
+    if not sketches:
+        return
+    
+    with _db_lock:
+        conn = get_connection()
+        try:
+            rows = []
+            for key, blob in sketches.items():
+                existing = conn.execute(
+                    "SELECT sketch FROM user_sketches WHERE bucket = ? AND model = ?", key
+                ).fetchone()
+                rows.append((*key, merge(existing["sketch"], blob) if existing else blob))
+            conn.executemany("INSERT OR REPLACE INTO user_sketches (bucket, model, sketch) VALUES (?, ?, ?)", rows)
+            conn.commit()
         finally:
             conn.close()
 
+def get_user_sketches(since_bucket: int, until_bucket: int, model: str = None) -> List[Dict]:
+    """Get stored distinct-user sketches for buckets in [since_bucket, until_bucket]"""
+    conn = get_connection()
+    try:
+        query = "SELECT bucket, model, sketch FROM user_sketches WHERE bucket >= ? AND bucket <= ?"
+        params = [since_bucket, until_bucket]
+        if model:
+            query += " AND model = ?"
+            params.append(model)
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+
+def store_series_blocks(rows: List[tuple]):
+    """Insert or replace (series, first_ts, last_ts, count, min, max, sum, data) block rows"""
+    if not rows:
+        return
+    
+    with _db_lock:
+        conn = get_connection()
+        try:
+            conn.executemany("""
+                INSERT OR REPLACE INTO series_blocks (series, first_ts, last_ts, count, min, max, sum, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_series_blocks(series: str, start: int, end: int) -> List[tuple]:
+    """Get stored block rows of a series overlapping [start, end], oldest first"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute("""
+            SELECT series, first_ts, last_ts, count, min, max, sum, data FROM series_blocks
+            WHERE series = ? AND first_ts <= ? AND last_ts >= ?
+            ORDER BY first_ts
+        """, (series, end, start))
+        return [tuple(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def get_series_names() -> List[str]:
+    """Get the names of stored series"""
+    conn = get_connection()
+    try:
+        # Skip from one series to the next on the primary key instead of reading every block
+        return [row[0] for row in conn.execute("""
+            WITH RECURSIVE names(series) AS (
+                SELECT MIN(series) FROM series_blocks
+                UNION ALL
+                SELECT (SELECT MIN(series) FROM series_blocks WHERE series > names.series)
+                FROM names WHERE names.series IS NOT NULL
+            )
+            SELECT series FROM names WHERE series IS NOT NULL""").fetchall()]
+    finally:
+        conn.close()
+
 def store_user_session(username: str, model: str = None, action: str = "login",
                       session_id: str = None, ip_address: str = None,
                       user_agent: str = None, metadata: Dict = None):
-    """Store user session activity"""
+    """Store user session activity and update the active session view"""
     with _db_lock:
         conn = get_connection()
         try:
@@ -180,62 +925,124 @@ def store_user_session(username: str, model: str = None, action: str = "login",
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (username, model, action, session_id, ip_address, user_agent, 
                   json.dumps(metadata) if metadata else None))
+            _apply_session_event(conn, username, session_id or "", action, model, ip_address)
             conn.commit()
         finally:
             conn.close()
 
-def get_user_sessions(active_only: bool = False, hours: int = 24) -> List[Dict]:
-    """Get user sessions"""
+def store_user_sessions(events: List[Dict]):
+    """Store a batch of session events in one transaction, in order"""
     with _db_lock:
         conn = get_connection()
         try:
-            if active_only:
-                # Get currently active sessions (login without logout in last X hours)
-                query = """
-                    SELECT DISTINCT username, model, session_id, ip_address,
-                           MAX(timestamp) as last_activity,
-                           MIN(timestamp) as started_at,
-                           COUNT(*) as request_count
-                    FROM user_sessions
-                    WHERE timestamp >= datetime('now', '-{} hours')
-                    GROUP BY username, session_id
-                    HAVING NOT EXISTS (
-                        SELECT 1 FROM user_sessions us2 
-                        WHERE us2.username = user_sessions.username 
-                        AND us2.session_id = user_sessions.session_id
-                        AND us2.action = 'logout'
-                        AND us2.timestamp > MAX(user_sessions.timestamp)
-                    )
-                    ORDER BY last_activity DESC
-                """.format(hours)
-            else:
-                # Get all sessions in time period
-                query = """
-                    SELECT username, model, action, session_id, ip_address, timestamp,
-                           metadata
-                    FROM user_sessions
-                    WHERE timestamp >= datetime('now', '-{} hours')
-                    ORDER BY timestamp DESC
-                """.format(hours)
-            
-            cursor = conn.execute(query)
-            rows = cursor.fetchall()
-            
-            sessions = []
-            for row in rows:
-                session = dict(row)
-                if session.get('metadata'):
-                    try:
-                        session['metadata'] = json.loads(session['metadata'])
-                    except:
-                        pass
-                sessions.append(session)
-            
-            return sessions
-            
+            conn.executemany("""
+                INSERT INTO user_sessions (username, model, action, session_id, ip_address, user_agent, metadata)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [(e["username"], e.get("model"), e["action"], e.get("session_id"), e.get("ip_address"),
+                   e.get("user_agent"), json.dumps(e["metadata"]) if e.get("metadata") else None)
+                  for e in events])
+            for e in events:
+                _apply_session_event(conn, e["username"], e.get("session_id") or "", e["action"],
+                                     e.get("model"), e.get("ip_address"))
+            conn.commit()
+        finally:
+            conn.close()
+
+def _seed_active_sessions(conn, idle_minutes: int = SESSION_IDLE_MINUTES):
+    """Fill a new active_sessions table by replaying the session events inside the idle window"""
+    rows = conn.execute("""
+        SELECT username, session_id, action, model, ip_address, timestamp FROM user_sessions
+        WHERE timestamp >= datetime('now', ?)
+        ORDER BY timestamp, id
+    """, (f"-{int(idle_minutes)} minutes",)).fetchall()
+    for row in rows:
+        _apply_session_event(conn, row["username"], row["session_id"] or "", row["action"],
+                             row["model"], row["ip_address"], at=row["timestamp"])
+
+def _apply_session_event(conn, username: str, session_id: str, action: str,
+                         model: str = None, ip_address: str = None, at: str = None):
+    """Fold one session event, at its time (default now), into active_sessions"""
+    if action == "logout":
+        conn.execute("DELETE FROM active_sessions WHERE username = ? AND session_id = ?",
+                     (username, session_id))
+    elif action == "login":
+        # A login always starts a fresh session
+        conn.execute("""
+            INSERT INTO active_sessions (username, session_id, model, ip_address, started_at, last_activity)
+            VALUES (?, ?, ?, ?, COALESCE(?, datetime('now')), COALESCE(?, datetime('now')))
+            ON CONFLICT(username, session_id) DO UPDATE SET
+                model = excluded.model, ip_address = excluded.ip_address,
+                started_at = excluded.started_at, last_activity = excluded.last_activity,
+                request_count = 1
+        """, (username, session_id, model, ip_address, at, at))
+    else:
+        conn.execute("""
+            INSERT INTO active_sessions (username, session_id, model, ip_address, started_at, last_activity)
+            VALUES (?, ?, ?, ?, COALESCE(?, datetime('now')), COALESCE(?, datetime('now')))
+            ON CONFLICT(username, session_id) DO UPDATE SET
+                model = COALESCE(excluded.model, model),
+                ip_address = COALESCE(excluded.ip_address, ip_address),
+                last_activity = excluded.last_activity,
+                request_count = request_count + 1
+        """, (username, session_id, model, ip_address, at, at))
+
+def expire_idle_sessions(idle_minutes: int = SESSION_IDLE_MINUTES) -> int:
+    """Drop active sessions idle for longer than idle_minutes"""
+    with _db_lock:
+        conn = get_connection()
+        try:
+            cursor = conn.execute("DELETE FROM active_sessions WHERE last_activity < datetime('now', ?)",
+                                  (f"-{int(idle_minutes)} minutes",))
+            conn.commit()
+            return cursor.rowcount
         finally:
             conn.close()
 
+def get_user_sessions(active_only: bool = False, hours: int = None) -> List[Dict]:
+    """Get user sessions: events of the last hours (default 24), or with active_only the
+    sessions active now, only those started in the last hours when given"""
+    conn = get_connection()
+    try:
+        if active_only:
+            # Sessions with activity inside the idle timeout
+            query = """
+                SELECT username, model, session_id, ip_address, started_at,
+                       last_activity, request_count, 'active' AS status
+                FROM active_sessions
+                WHERE last_activity >= datetime('now', ?)
+            """
+            params = [f"-{int(SESSION_IDLE_MINUTES)} minutes"]
+            if hours is not None:
+                query += " AND started_at >= datetime('now', ?)"
+                params.append(f"-{int(hours)} hours")
+            cursor = conn.execute(query + " ORDER BY last_activity DESC", params)
+            return [dict(row) for row in cursor.fetchall()]
+        
+        # Get all sessions in time period
+        cursor = conn.execute("""
+            SELECT username, model, action, session_id, ip_address, timestamp,
+                   metadata
+            FROM user_sessions
+            WHERE timestamp >= datetime('now', ?)
+            ORDER BY timestamp DESC
+        """, (f"-{int(hours or 24)} hours",))
+        rows = cursor.fetchall()
+        
+        sessions = []
+        for row in rows:
+            session = dict(row)
+            if session.get('metadata'):
+                try:
+                    session['metadata'] = json.loads(session['metadata'])
+                except:
+                    pass
+            sessions.append(session)
+        
+        return sessions
+        
+    finally:
+        conn.close()
+
 def store_performance_metric(metric_type: str, metric_name: str, value: float,
                            unit: str = None, container_name: str = None,
                            metadata: Dict = None):
@@ -273,44 +1080,100 @@ def store_container_status(container_name: str, container_id: str, status: str,
 
 def create_alert(alert_type: str, severity: str, message: str,
                 container_name: str = None, metric_value: float = None,
-                threshold_value: float = None):
+                threshold_value: float = None) -> int:
     """Create alert"""
     with _db_lock:
         conn = get_connection()
         try:
-            conn.execute("""
+            cursor = conn.execute("""
                 INSERT INTO alerts (alert_type, severity, message, container_name, metric_value, threshold_value)
                 VALUES (?, ?, ?, ?, ?, ?)
             """, (alert_type, severity, message, container_name, metric_value, threshold_value))
             conn.commit()
+            return cursor.lastrowid
         finally:
             conn.close()
 
-def get_alerts(severity: str = None, resolved: bool = None, hours: int = 24) -> List[Dict]:
-    """Get alerts"""
+def resolve_alert(alert_id: int, metric_value: float = None):
+    """Mark an alert as resolved"""
     with _db_lock:
         conn = get_connection()
         try:
-            query = "SELECT * FROM alerts WHERE timestamp >= datetime('now', '-{} hours')".format(hours)
-            params = []
-            
-            if severity:
-                query += " AND severity = ?"
-                params.append(severity)
-            
-            if resolved is not None:
-                query += " AND resolved = ?"
-                params.append(resolved)
-            
-            query += " ORDER BY timestamp DESC"
-            
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-            
-            return [dict(row) for row in rows]
-            
+            conn.execute("""
+                UPDATE alerts SET resolved = TRUE, resolved_at = CURRENT_TIMESTAMP,
+                                  metric_value = COALESCE(?, metric_value)
+                WHERE id = ?
+            """, (metric_value, alert_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+def get_unresolved_alerts() -> List[Dict]:
+    """Get all alerts that are still firing"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute("SELECT * FROM alerts WHERE resolved = FALSE")
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def get_alerts(severity: str = None, resolved: bool = None, hours: int = 24) -> List[Dict]:
+    """Get alerts"""
+    conn = get_connection()
+    try:
+        query = "SELECT * FROM alerts WHERE timestamp >= datetime('now', ?)"
+        params = [f"-{int(hours)} hours"]
+        
+        if severity:
+            query += " AND severity = ?"
+            params.append(severity)
+        
+        if resolved is not None:
+            query += " AND resolved = ?"
+            params.append(resolved)
+        
+        query += " ORDER BY timestamp DESC"
+        
+        cursor = conn.execute(query, params)
+        rows = cursor.fetchall()
+        
+        return [dict(row) for row in rows]
+        
+    finally:
+        conn.close()
+
+def remove_log_shards_before(day: str) -> int:
+    """Delete the shard files of days before day; returns how many were removed"""
+    removed = 0
+    for old_day in _shard_days():
+        if old_day >= day:
+            break
+        path = _shard_path(old_day)
+        for suffix in ("-wal", "-shm", ""):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+        _ready_shards.discard(path)
+        removed += 1
+    return removed
+
+def seal_log_shards():
+    """Switch settled past shards out of WAL so they can be opened read-only"""
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    for day in _shard_days():
+        if day >= yesterday:
+            break
+        path = _shard_path(day)
+        conn = sqlite3.connect(path)
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                conn.execute("PRAGMA journal_mode=DELETE")
+        except sqlite3.OperationalError as e:
+            print(f"Error sealing log shard {day}: {e}")  # busy; retried on the next cleanup
         finally:
             conn.close()
+        _ready_shards.discard(path)
 
 def cleanup_old_data(days: int = 30):
     """Clean up old data from database"""
@@ -319,13 +1182,32 @@ def cleanup_old_data(days: int = 30):
         try:
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            # Clean up old logs
-            conn.execute("DELETE FROM logs WHERE created_at < ?", (cutoff_date,))
+            # Clean up old logs: whole day shards are unlinked, pre-shard rows deleted
+            remove_log_shards_before(cutoff_date.date().isoformat())
+            if _legacy_logs:
+                conn.execute("DELETE FROM logs WHERE created_at < ?", (cutoff_date,))
             
             # Clean up old metrics (keep longer for trends)
             conn.execute("DELETE FROM performance_metrics WHERE timestamp < ?", 
                         (cutoff_date - timedelta(days=30),))
             
+            # Clean up old template counters
+            conn.execute("DELETE FROM log_template_counts WHERE bucket < ?",
+                        (int(cutoff_date.timestamp()),))
+            
+            # Clean up old volume counters
+            conn.execute("DELETE FROM log_volume_counts WHERE bucket < ?",
+                        (int(cutoff_date.timestamp()),))
+            
+            # Clean up old model and user sketches (small; keep longer for trends)
+            sketch_cutoff = int((cutoff_date - timedelta(days=30)).timestamp())
+            conn.execute("DELETE FROM model_sketches WHERE bucket < ?", (sketch_cutoff,))
+            conn.execute("DELETE FROM user_sketches WHERE bucket < ?", (sketch_cutoff,))
+            
+            # Clean up old time-series blocks
+            conn.execute("DELETE FROM series_blocks WHERE last_ts < ?",
+                        (int(time.time()) - TSDB_RETENTION_DAYS * 86400,))
+            
             # Clean up old container status
             conn.execute("DELETE FROM container_status WHERE timestamp < ?", (cutoff_date,))
             
@@ -334,28 +1216,33 @@ def cleanup_old_data(days: int = 30):
                         (cutoff_date,))
             
             conn.commit()
+            seal_log_shards()
             
         finally:
             conn.close()
 
 def get_database_stats() -> Dict:
     """Get database statistics"""
-    with _db_lock:
-        conn = get_connection()
-        try:
-            stats = {}
-            
-            # Count records in each table
-            tables = ['logs', 'user_sessions', 'performance_metrics', 'container_status', 'alerts']
-            for table in tables:
-                cursor = conn.execute(f"SELECT COUNT(*) FROM {table}")
-                stats[f"{table}_count"] = cursor.fetchone()[0]
-            
-            # Database size
-            cursor = conn.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
-            stats['database_size_bytes'] = cursor.fetchone()[0]
-            
-            return stats
-            
-        finally:
-            conn.close()
+    conn = get_connection()
+    try:
+        stats = {}
+        
+        # Count records in each table
+        tables = ['user_sessions', 'performance_metrics', 'container_status', 'alerts', 'series_blocks']
+        for table in tables:
+            cursor = conn.execute(f"SELECT COUNT(*) FROM {table}")
+            stats[f"{table}_count"] = cursor.fetchone()[0]
+        
+        # Database size
+        cursor = conn.execute("SELECT page_count * page_size as size FROM pragma_page_count(), pragma_page_size()")
+        stats['database_size_bytes'] = cursor.fetchone()[0]
+        
+    finally:
+        conn.close()
+    
+    shards = _log_shards()
+    counts = _query_shards("SELECT COUNT(*) AS count FROM logs", [], shards)
+    stats['logs_count'] = sum(rows[0]["count"] for rows in counts if rows)
+    stats['log_shards'] = len([shard for shard in shards if shard is not LEGACY_SHARD])
+    stats['log_shards_size_bytes'] = sum(os.path.getsize(_shard_path(day)) for day in _shard_days())
+    return stats
@@ -0,0 +1,72 @@
+import asyncio, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import Counter, Gauge
+from .config import DB_EXECUTOR_WORKERS, DB_EXECUTOR_QUEUE, DB_QUERY_TIMEOUT
+from .database import QueryBudget, query_budget
+
+c_calls = Counter("opshub_db_calls_total", "API database calls by outcome", ["result"])
+g_in_flight = Gauge("opshub_db_calls_in_flight", "API database calls running or waiting for a worker")
+
+class DatabaseBusy(Exception):
+    """Every DB worker is busy and the wait queue is full"""
+
+class QueryTimeout(Exception):
+    """A call's queries ran past their time budget and were interrupted"""
+
+_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="opshub-db")
+_slots = threading.BoundedSemaphore(DB_EXECUTOR_WORKERS + DB_EXECUTOR_QUEUE)
+
+def _call(budget: QueryBudget, fn, args, kwargs):
+    if budget.exhausted():
+        raise QueryTimeout()  # timed out or cancelled while waiting for a worker
+    with query_budget(budget):
+        return fn(*args, **kwargs)
+
+def _release(future):
+    _slots.release()
+    g_in_flight.dec()
+
+async def run(fn, *args, timeout: float = None, budget: QueryBudget = None, **kwargs):
+    """Run a blocking database call on the DB pool and await it.
+
+    SQLite statements the call runs (on any connection it opens, and on the
+    shard pool) are interrupted once timeout seconds (OPS_DB_QUERY_TIMEOUT by
+    default) pass or the awaiting request is cancelled, so the worker is
+    freed rather than left scanning. Several calls can share one budget, e.g.
+    the pulls of a stream whose connections outlive each call; cancelling
+    any of them cancels it. Raises DatabaseBusy without waiting when the pool
+    and its queue are full, and QueryTimeout when time runs out.
+    """
+    if not _slots.acquire(blocking=False):
+        c_calls.labels("rejected").inc()
+        raise DatabaseBusy()
+    g_in_flight.inc()
+    timeout = DB_QUERY_TIMEOUT if timeout is None else timeout
+    if budget is None:
+        budget = QueryBudget(timeout)
+    future = _executor.submit(_call, budget, fn, args, kwargs)
+    future.add_done_callback(_release)
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        budget.cancel()
+        c_calls.labels("timeout").inc()
+        raise QueryTimeout() from None
+    except asyncio.CancelledError:
+        budget.cancel()
+        c_calls.labels("cancelled").inc()
+        raise
+    except QueryTimeout:
+        c_calls.labels("timeout").inc()
+        raise
+    except sqlite3.OperationalError:
+        if budget.exhausted():
+            c_calls.labels("timeout").inc()
+            raise QueryTimeout() from None
+        c_calls.labels("error").inc()
+        raise
+    except Exception:
+        c_calls.labels("error").inc()
+        raise
+    c_calls.labels("ok").inc()
+    return result
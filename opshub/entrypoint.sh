@@ -3,9 +3,6 @@ set -e
 
 echo "Starting OpsHub Docker Logger & Monitor..."
 
-# Install the package in development mode
-pip install -e .
-
 # Create data directory
 mkdir -p /data
 
@@ -22,11 +19,7 @@ echo "  OPS_INCLUDE_STOPPED: ${OPS_INCLUDE_STOPPED:-false}"
 echo "  OPS_RETENTION_ACTIVE_DAYS: ${OPS_RETENTION_ACTIVE_DAYS:-7}"
 echo "  Data directory: /data"
 
-# Initialize database
-echo "Initializing database..."
-python -c "from opshub.database import init_db; init_db()"
-
-# Run FastAPI server with background workers
+# Run FastAPI server; it creates the database and starts background workers itself
 echo "Starting OpsHub server on port 8089..."
 echo "API endpoints:"
 echo "  http://localhost:8089/health - Health check"
@@ -0,0 +1,194 @@
+import gzip, json, zlib
+from datetime import datetime, timezone
+from .database import iter_export_rows
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def _pyarrow():
+    """pyarrow if installed; imported on first Parquet export since it is slow to load"""
+    try:
+        import pyarrow, pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+# Exportable tables: columns with their Parquet types, and how timestamps are stored (logs in
+# local time, metrics in UTC)
+EXPORTS = {
+    "logs": {
+        "table": "logs",
+        "columns": {"id": "int64", "timestamp": "string", "container_name": "string",
+                    "container_id": "string", "level": "string", "message": "string",
+                    "raw_log": "string", "source": "string", "template_id": "int64",
+                    "template_vars": "string", "http_status": "int64", "latency_ms": "float64",
+                    "path": "string", "username": "string", "model": "string"},
+        "time_format": "%Y-%m-%dT%H:%M:%S",
+        "local_time": True,
+        "filters": ("container_name", "level"),
+    },
+    "metrics": {
+        "table": "performance_metrics",
+        "columns": {"id": "int64", "timestamp": "string", "metric_type": "string",
+                    "metric_name": "string", "value": "float64", "unit": "string",
+                    "container_name": "string", "metadata": "string"},
+        "time_format": "%Y-%m-%d %H:%M:%S",
+        "local_time": False,
+        "filters": ("metric_type", "metric_name", "container_name"),
+    },
+}
+
+# json.dumps with non-default options builds a new encoder per call
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+
+COMPRESSIONS = ("gzip", "zstd", "none")
+FORMATS = ("ndjson", "parquet")
+
+def check_support(fmt: str, compression: str):
+    """Raise ValueError for a format or compression this install cannot produce"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression}")
+    if fmt == "parquet" and _pyarrow() is None:
+        raise ValueError("Parquet export needs pyarrow installed")
+    if fmt == "ndjson" and compression == "zstd" and zstandard is None:
+        raise ValueError("zstd compression needs zstandard installed")
+
+def _stored_time(value: str, spec: dict) -> str:
+    """An ISO timestamp, UTC unless it has an offset, as the table stores it, so text comparison works"""
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    moment = moment.astimezone() if spec["local_time"] else moment.astimezone(timezone.utc)
+    return moment.strftime(spec["time_format"])
+
+def _compressor(compression: str):
+    if compression == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress
+    return lambda data: data
+
+def export_rows(kind: str, start: str = None, end: str = None, after_id: int = 0,
+                filters: dict = None, batch_size: int = 5000):
+    """Batches of rows of an export kind ("logs" or "metrics") from one read snapshot; start and
+    end are ISO 8601, UTC unless they carry an offset, for both kinds"""
+    spec = EXPORTS[kind]
+    filters = {k: v for k, v in (filters or {}).items() if k in spec["filters"] and v is not None}
+    return iter_export_rows(spec["table"], list(spec["columns"]),
+                            _stored_time(start, spec), _stored_time(end, spec),
+                            after_id, filters, batch_size)
+
+def ndjson_chunks(batches, compression: str = "gzip"):
+    """One NDJSON chunk per batch, each a complete gzip member / zstd frame.
+
+    Concatenated members are still one valid file, and a partial download can
+    be cut back to the last complete member and resumed after its last id.
+    """
+    compress = _compressor(compression)
+    for batch in batches:
+        data = "\n".join(map(_encode, batch)) + "\n"
+        yield compress(data.encode())
+
+class _ChunkSink:
+    """Write-only file object collecting what a writer produced since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def parquet_chunks(batches, columns: dict, compression: str = "zstd"):
+    """A Parquet file written one row group per batch, streamed as it is produced"""
+    pyarrow = _pyarrow()
+    schema = pyarrow.schema([(name, getattr(pyarrow, kind)()) for name, kind in columns.items()])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema,
+                                           compression=compression)
+    try:
+        for batch in batches:
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_stream(kind: str, fmt: str = "ndjson", compression: str = "gzip", start: str = None,
+                  end: str = None, after_id: int = 0, filters: dict = None, batch_size: int = 5000):
+    """Encoded export of a time range as a stream of byte chunks"""
+    check_support(fmt, compression)
+    batches = export_rows(kind, start, end, after_id, filters, batch_size)
+    if fmt == "parquet":
+        return parquet_chunks(batches, EXPORTS[kind]["columns"], compression)
+    return ndjson_chunks(batches, compression)
+
+def file_suffix(fmt: str, compression: str) -> str:
+    if fmt == "parquet":
+        return ".parquet"
+    return ".ndjson" + {"gzip": ".gz", "zstd": ".zst", "none": ""}[compression]
+
+def _decompressor(compression: str):
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    return zstandard.ZstdDecompressor().decompressobj()
+
+def resume_point(path: str, compression: str) -> tuple:
+    """(bytes to keep, last exported id) for a partially written NDJSON export.
+
+    Everything after the last complete line (uncompressed) or the last
+    complete gzip member / zstd frame is dropped on resume.
+    """
+    keep, last_id, offset = 0, 0, 0
+    with open(path, "rb") as fh:
+        if compression == "none":
+            tail = b""
+            while chunk := fh.read(1 << 20):
+                tail += chunk
+                end = tail.rfind(b"\n")
+                if end >= 0:
+                    keep = offset + end + 1
+                    start = tail.rfind(b"\n", 0, end) + 1
+                    last_id = json.loads(tail[start:end])["id"]
+                    offset, tail = offset + end + 1, tail[end + 1:]
+            return keep, last_id
+
+        decompressor, lines = _decompressor(compression), b""
+        while chunk := fh.read(1 << 20):
+            while chunk:
+                lines += decompressor.decompress(chunk)
+                # Keep only the last complete line (and anything after it)
+                cut = lines.rfind(b"\n", 0, len(lines) - 1)
+                lines = lines[cut + 1:]
+                if not decompressor.eof:
+                    offset += len(chunk)
+                    break
+                consumed = len(chunk) - len(decompressor.unused_data)
+                offset += consumed
+                keep = offset
+                last_id = json.loads(lines)["id"] if lines.strip() else last_id
+                chunk, lines = decompressor.unused_data, b""
+                decompressor = _decompressor(compression)
+    return keep, last_id
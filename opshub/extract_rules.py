@@ -0,0 +1,181 @@
+import json, os, re, threading, time
+from pathlib import Path
+from .config import EXTRACT_RULES_FILE, EXTRACT_RULES_POLL_SECONDS
+
+try:
+    from re import _parser as _re_parser
+except ImportError:
+    import sre_parse as _re_parser
+
+DEFAULT_RULES_FILE = Path(__file__).with_name("extract_rules.json")
+FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL, "x": re.VERBOSE}
+MIN_PREFILTER_LENGTH = 2
+
+class Rule:
+    """One compiled pattern; literal, when set, must occur in the line for it to match"""
+    __slots__ = ("name", "regex", "literal", "fold", "constants")
+
+    def __init__(self, name: str, regex, literal: str, constants: dict):
+        self.name = name
+        self.regex = regex
+        self.fold = bool(regex.flags & re.IGNORECASE)
+        self.literal = literal.lower() if literal and self.fold else literal
+        self.constants = constants
+
+def _literal_runs(items, runs: list):
+    """Collect runs of literal characters every match of a parsed pattern contains"""
+    run = []
+    for op, arg in items:
+        if op is _re_parser.LITERAL:
+            run.append(chr(arg))
+            continue
+        runs.append("".join(run))
+        run = []
+        if op is _re_parser.SUBPATTERN and not arg[1] and not arg[2]:
+            # A plain group is required; one with inline flags may change case rules
+            _literal_runs(arg[3], runs)
+        elif op in (_re_parser.MAX_REPEAT, _re_parser.MIN_REPEAT) and arg[0] >= 1:
+            _literal_runs(arg[2], runs)
+    runs.append("".join(run))
+
+def required_literal(pattern: str, flags: int = 0):
+    """Longest literal substring any match of pattern must contain, or None"""
+    try:
+        runs = []
+        _literal_runs(_re_parser.parse(pattern, flags), runs)
+    except Exception:
+        return None
+    literal = max(runs, key=len, default="")
+    return literal if len(literal) >= MIN_PREFILTER_LENGTH else None
+
+def _compile_rule(service: str, spec: dict) -> Rule:
+    name = f"{service}.{spec.get('name', '?')}"
+    try:
+        flags = 0
+        for flag in spec.get("flags", ""):
+            flags |= FLAGS[flag]
+        regex = re.compile(spec["pattern"], flags)
+    except KeyError as e:
+        raise ValueError(f"rule {name}: unknown flag or missing {e}")
+    except re.error as e:
+        raise ValueError(f"rule {name}: {e}")
+    constants = spec.get("set") or {}
+    if not isinstance(constants, dict):
+        raise ValueError(f"rule {name}: 'set' must be an object")
+
+    # "prefilter": a literal to require instead of the derived one, or false for none
+    literal = spec.get("prefilter", True)
+    if literal is True:
+        literal = required_literal(spec["pattern"], flags)
+    return Rule(name, regex, literal or None, {k: str(v) for k, v in constants.items()})
+
+class RuleSet:
+    """Compiled rules with a per-container dispatch table"""
+
+    def __init__(self, services: list, source: str = None):
+        self.services = services
+        self.source = source
+        self.loaded_at = time.time()
+        self._dispatch = {}
+
+    def rules_for(self, container: str) -> tuple:
+        rules = self._dispatch.get(container)
+        if rules is None:
+            rules = tuple(rule for selector, service_rules in self.services
+                          if selector.search(container) for rule in service_rules)
+            self._dispatch[container] = rules
+        return rules
+
+    def extract(self, container: str, line: str) -> dict:
+        metadata = {}
+        lowered = None
+        for rule in self.rules_for(container):
+            if rule.literal is not None:
+                if rule.fold:
+                    if lowered is None:
+                        lowered = line.lower()
+                    if rule.literal not in lowered:
+                        continue
+                elif rule.literal not in line:
+                    continue
+            match = rule.regex.search(line)
+            if match:
+                for field, value in match.groupdict().items():
+                    if value is not None:
+                        metadata[field] = value
+                if rule.constants:
+                    metadata.update(rule.constants)
+        return metadata
+
+    def summary(self) -> dict:
+        return {"source": self.source, "loaded_at": self.loaded_at,
+                "services": len(self.services), "rules": sum(len(rules) for _, rules in self.services)}
+
+def compile_rules(spec: dict, source: str = None) -> RuleSet:
+    """Compile a rules document ({"services": [...]}), raising ValueError if it is invalid"""
+    if not isinstance(spec, dict) or not isinstance(spec.get("services"), list):
+        raise ValueError("expected an object with a 'services' list")
+    services = []
+    for service in spec["services"]:
+        name = service.get("name", "?")
+        try:
+            selector = re.compile(service.get("containers", ".*"), re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"service {name}: bad containers pattern: {e}")
+        services.append((selector, [_compile_rule(name, rule) for rule in service.get("rules", [])]))
+    return RuleSet(services, source)
+
+def load_rules(path: str) -> RuleSet:
+    with open(path) as fh:
+        return compile_rules(json.load(fh), str(path))
+
+_rules = None
+_lock = threading.Lock()
+
+def rules_path() -> str:
+    return EXTRACT_RULES_FILE or str(DEFAULT_RULES_FILE)
+
+def current() -> RuleSet:
+    """The active rule set, loaded on first use; the built-in rules if the configured file is unusable"""
+    global _rules
+    if _rules is None:
+        with _lock:
+            if _rules is None:
+                try:
+                    _rules = load_rules(rules_path())
+                except (OSError, ValueError) as e:
+                    print(f"Error loading extraction rules from {rules_path()}: {e}; using built-in rules")
+                    _rules = load_rules(DEFAULT_RULES_FILE)
+    return _rules
+
+def extract(container: str, line: str) -> dict:
+    return current().extract(container, line)
+
+def _mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def reload_worker():
+    """Swap in the rule file whenever it changes; a broken edit keeps the previous rules"""
+    global _rules
+    path = rules_path()
+    mtime = _mtime(path)
+    while True:
+        time.sleep(EXTRACT_RULES_POLL_SECONDS)
+        changed = _mtime(path)
+        if changed is None or changed == mtime:
+            continue
+        mtime = changed
+        try:
+            _rules = load_rules(path)
+            print(f"Reloaded extraction rules from {path}: {_rules.summary()['rules']} rules")
+        except (OSError, ValueError) as e:
+            print(f"Error reloading extraction rules from {path}: {e}; keeping previous rules")
+
+def start():
+    """Load the rules and, for a configured rule file, watch it for edits"""
+    current()
+    if EXTRACT_RULES_FILE:
+        threading.Thread(target=reload_worker, daemon=True).start()
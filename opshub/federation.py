@@ -0,0 +1,145 @@
+import heapq, itertools, json, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from .config import federation_peers, NODE_NAME, FEDERATION_CONNECT_TIMEOUT, FEDERATION_TIMEOUT
+from .records import to_jsonable, dumps
+
+# One keep-alive session per peer, shared by all requests fanned out to it
+POOL_SIZE = 16
+
+_sessions = {}
+_executor = None
+_lock = threading.Lock()
+
+def _session(url: str):
+    with _lock:
+        session = _sessions.get(url)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[url] = session
+        return session
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4 * POOL_SIZE, thread_name_prefix="opshub-federation")
+        return _executor
+
+def _timeout() -> tuple:
+    return (FEDERATION_CONNECT_TIMEOUT, FEDERATION_TIMEOUT)
+
+def _error(e: Exception) -> str:
+    return str(getattr(e, "detail", None) or e)
+
+def peers() -> list:
+    """This node and its configured peers"""
+    return [{"host": NODE_NAME, "url": None}] + [{"host": name, "url": url} for name, url in federation_peers()]
+
+def gather(path: str, params: dict = None, local=None) -> list:
+    """GET path from every peer concurrently, plus local() in-process.
+
+    Returns one {"host", "ok", "elapsed_ms", "data" | "error"} per host, this
+    node first. A slow or failed peer only costs its own timeout.
+    """
+    def timed(name, call):
+        started = time.perf_counter()
+        try:
+            result = {"host": name, "ok": True, "data": call()}
+        except Exception as e:
+            result = {"host": name, "ok": False, "error": _error(e)}
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    def fetch(url):
+        r = _session(url).get(url + path, params=params, timeout=_timeout())
+        r.raise_for_status()
+        return r.json()
+
+    futures = [_pool().submit(timed, name, lambda url=url: fetch(url)) for name, url in federation_peers()]
+    results = [timed(NODE_NAME, local)] if local is not None else []
+    return results + [future.result() for future in futures]
+
+def _peer_records(name: str, response):
+    """Records from a peer's NDJSON response, labelled with the peer"""
+    with response:
+        try:
+            for line in response.iter_lines(chunk_size=16384):
+                if line:
+                    record = json.loads(line)
+                    record["host"] = name
+                    yield record
+        except Exception as e:
+            print(f"Error streaming from peer {name}: {e}")
+
+def _epoch(row: dict) -> float:
+    """Merge key: the UTC epoch seconds each host adds (ts), as hosts' local times do not compare"""
+    ts = row.get("ts")
+    if ts is None:
+        # A peer too old to send ts: its local time is taken as ours
+        try:
+            ts = datetime.fromisoformat(row["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            ts = 0.0
+    return ts
+
+def open_log_streams(path: str, params: dict) -> list:
+    """Start the NDJSON request for path on every peer; returns (host, future) pairs for merge_logs"""
+    def open_stream(url):
+        r = _session(url).get(url + path, params={**params, "format": "ndjson"},
+                              stream=True, timeout=_timeout())
+        if not r.ok:
+            r.close()
+            r.raise_for_status()
+        return r
+
+    return [(name, _pool().submit(open_stream, url)) for name, url in federation_peers()]
+
+def close_log_streams(streams: list):
+    """Close peer streams that will not be merged, once each has opened"""
+    def close(future):
+        if future.exception() is None:
+            future.result().close()
+
+    for _, future in streams:
+        future.add_done_callback(close)
+
+def merge_logs(streams: list, local, limit: int):
+    """Newest-first log records from every host, k-way merged by UTC time.
+
+    streams come from open_log_streams; local is this node's rows, or the
+    exception raised getting them. Peer responses are read as streams, so at
+    most one pending record per host is held in memory. Hosts that failed are
+    reported as {"host", "error"} records ahead of the merged logs.
+    """
+    merged = []
+    if isinstance(local, Exception):
+        yield {"host": NODE_NAME, "error": _error(local)}
+    elif local is not None:
+        merged.append({**to_jsonable(row, epoch=True), "host": NODE_NAME} for row in local)
+    for name, future in streams:
+        try:
+            merged.append(_peer_records(name, future.result()))
+        except Exception as e:
+            yield {"host": name, "error": _error(e)}
+
+    yield from itertools.islice(heapq.merge(*merged, key=_epoch, reverse=True), limit)
+
+def ndjson(records, batch: int = 200):
+    """Encode records as NDJSON, a batch of lines per chunk to keep per-chunk overhead down.
+
+    Log records carry ts (UTC epoch seconds), which federated merges order by.
+    """
+    lines = []
+    for record in records:
+        lines.append(dumps(record, epoch=True))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
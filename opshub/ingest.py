@@ -0,0 +1,156 @@
+import json, threading, zlib
+from datetime import datetime
+from .config import INGEST_MAX_BYTES, INGEST_MAX_RECORDS, INGEST_CONCURRENCY, INGEST_ACK_TIMEOUT
+from .database import store_user_sessions
+from . import logging_pipeline, user_stats
+
+LEVELS = ("INFO", "WARNING", "ERROR", "SUCCESS", "CRITICAL")
+MAX_REJECTIONS_REPORTED = 100
+
+_slots = threading.BoundedSemaphore(INGEST_CONCURRENCY)
+
+class IngestError(Exception):
+    """A whole batch refused, with the HTTP status to answer"""
+
+    def __init__(self, status: int, detail: str, retry_after: int = None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+def decode_body(body: bytes, content_encoding: str = None) -> list:
+    """Non-empty NDJSON lines of a request body, gunzipped if needed, size-checked"""
+    if content_encoding == "gzip" or body[:2] == b"\x1f\x8b":
+        parts, size = [], 0
+        while body:
+            decompressor = zlib.decompressobj(wbits=31)
+            try:
+                part = decompressor.decompress(body, INGEST_MAX_BYTES + 1 - size)
+            except zlib.error as e:
+                raise IngestError(400, f"Invalid gzip body: {e}")
+            size += len(part)
+            if size > INGEST_MAX_BYTES or decompressor.unconsumed_tail:
+                raise IngestError(413, f"Batch exceeds {INGEST_MAX_BYTES} bytes uncompressed")
+            parts.append(part)
+            # Concatenated gzip members are one stream
+            body = decompressor.unused_data
+        body = b"".join(parts)
+    elif len(body) > INGEST_MAX_BYTES:
+        raise IngestError(413, f"Batch exceeds {INGEST_MAX_BYTES} bytes")
+
+    lines = [line for line in body.split(b"\n") if line.strip()]
+    if len(lines) > INGEST_MAX_RECORDS:
+        raise IngestError(413, f"Batch has {len(lines)} records, the limit is {INGEST_MAX_RECORDS}")
+    return lines
+
+def _text(record: dict, field: str, required: bool = False, max_length: int = 255):
+    value = record.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"missing {field}")
+        return None
+    if not isinstance(value, str) or not value or len(value) > max_length:
+        raise ValueError(f"{field} must be a non-empty string of at most {max_length} characters")
+    return value
+
+def _timestamp_ns(value) -> int:
+    """Epoch seconds or an ISO 8601 string (naive means local time) as epoch ns"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value * 1_000_000_000)
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000_000)
+    raise ValueError("timestamp must be epoch seconds or an ISO 8601 string")
+
+def _log_record(record) -> tuple:
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    container = _text(record, "container", required=True)
+    message = _text(record, "message", required=True, max_length=1_000_000)
+    level = _text(record, "level")
+    if level is not None:
+        level = level.upper()
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+    container_id = _text(record, "container_id") or f"ingest:{container}"
+    return container, container_id, message, _timestamp_ns(record.get("timestamp")), level
+
+def _session_record(record) -> dict:
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    metadata = record.get("metadata")
+    if metadata is not None and not isinstance(metadata, dict):
+        raise ValueError("metadata must be an object")
+    event = {"username": _text(record, "username", required=True),
+             "action": _text(record, "action", required=True, max_length=64),
+             "metadata": metadata}
+    for field in ("model", "session_id", "ip_address"):
+        event[field] = _text(record, field)
+    event["user_agent"] = _text(record, "user_agent", max_length=1024)
+    return event
+
+def _validate(lines: list, parse) -> tuple:
+    """(line number, parsed record) pairs for the valid lines, and rejections for the rest"""
+    records, rejected = [], []
+    for number, raw in enumerate(lines, 1):
+        try:
+            records.append((number, parse(json.loads(raw))))
+        except (ValueError, TypeError, OverflowError) as e:
+            rejected.append({"line": number, "error": str(e)})
+    return records, rejected
+
+def _result(accepted: int, rejected: list, written: bool) -> dict:
+    return {"accepted": accepted, "rejected_count": len(rejected),
+            "rejected": rejected[:MAX_REJECTIONS_REPORTED], "written": written}
+
+def _admit():
+    if not _slots.acquire(blocking=False):
+        raise IngestError(429, "Too many ingest batches in flight", retry_after=1)
+
+def ingest_logs(body: bytes, content_encoding: str = None, wait: bool = True) -> dict:
+    """Validate a log batch and feed it through the pipeline like tailed lines.
+
+    Invalid records are rejected individually; the rest are all queued or,
+    when the writer queue cannot take them, none are (429). Room for the
+    batch is reserved up front, so the answer never waits on a queue the
+    tailers filled. With wait, the answer comes once the batch is committed,
+    or with written False if that takes longer than INGEST_ACK_TIMEOUT.
+    """
+    _admit()
+    try:
+        records, rejected = _validate(decode_body(body, content_encoding), _log_record)
+        accepted, written = 0, False
+        # One more entry for the write acknowledgement
+        with logging_pipeline.reserve_queue(len(records) + 1) as room:
+            if not room:
+                raise IngestError(429, "Write queue is full", retry_after=1)
+            for number, (container, container_id, message, ts_ns, level) in records:
+                if logging_pipeline.process_log_line(container, container_id, message, ts_ns=ts_ns,
+                                                     source="ingest", level=level):
+                    accepted += 1
+                else:
+                    rejected.append({"line": number, "error": "could not be processed"})
+            if wait and accepted:
+                written = logging_pipeline.acknowledge(INGEST_ACK_TIMEOUT)
+                if written is False:
+                    raise IngestError(500, "Batch could not be written")
+                # Still queued after the timeout: it will be written, so retrying would duplicate it
+                written = bool(written)
+        rejected.sort(key=lambda rejection: rejection["line"])
+        return _result(accepted, rejected, written)
+    finally:
+        _slots.release()
+
+def ingest_sessions(body: bytes, content_encoding: str = None) -> dict:
+    """Validate a session event batch and store it in one transaction"""
+    _admit()
+    try:
+        records, rejected = _validate(decode_body(body, content_encoding), _session_record)
+        events = [event for _, event in records]
+        if events:
+            store_user_sessions(events)
+            user_stats.record_sessions(events)
+        return _result(len(events), rejected, bool(events))
+    finally:
+        _slots.release()
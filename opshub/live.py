@@ -0,0 +1,139 @@
+import asyncio, copy, json, time
+from datetime import datetime
+from prometheus_client import Gauge
+from .config import MONITOR_TICK_SECONDS
+
+g_subscribers = Gauge("opshub_monitor_subscribers", "Open live monitor feeds")
+
+_docker_client = None
+
+def compute_snapshot() -> dict:
+    """One compact view of host, GPU and container state for live monitors"""
+    global _docker_client
+    # Imported here so the CLI can use diff/apply_delta without the collectors
+    import docker
+    from .metrics_host import get_system_metrics
+    from .metrics_gpu import get_gpu_metrics
+    
+    system = get_system_metrics()
+    snapshot = {
+        "timestamp": datetime.now().isoformat(),
+        "cpu_percent": system.get("cpu_percent"),
+        "memory_percent": system.get("memory_percent"),
+        "disk_percent": system.get("disk_percent"),
+        "load_avg": system.get("load_avg"),
+        "gpus": [
+            {"index": gpu["index"], "utilization": gpu["utilization"],
+             "memory_percent": round(gpu["memory_percent"], 1), "temperature": gpu["temperature"]}
+            for gpu in get_gpu_metrics()
+        ],
+    }
+    try:
+        if _docker_client is None:
+            _docker_client = docker.from_env()
+        containers = _docker_client.containers.list(all=True)
+        snapshot["containers"] = {
+            "running": sum(1 for c in containers if c.status == "running"),
+            "total": len(containers),
+        }
+    except Exception as e:
+        snapshot["containers"] = {"error": str(e)}
+    return snapshot
+
+# Delta key listing the keys removed at that level
+DELETED = "__deleted__"
+
+def diff(old: dict, new: dict) -> dict:
+    """Keys of new whose values changed since old, and under DELETED the keys it no longer
+    has; nested dicts are diffed, lists replaced"""
+    delta = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = diff(previous, value)
+            if nested:
+                delta[key] = nested
+        elif value != previous or key not in old:
+            delta[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta[DELETED] = removed
+    return delta
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    """Inverse of diff: merge a delta into a snapshot in place"""
+    for key, value in delta.items():
+        if key == DELETED:
+            for removed in value:
+                state.pop(removed, None)
+        elif isinstance(value, dict) and isinstance(state.get(key), dict):
+            apply_delta(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+class SnapshotBroadcaster:
+    """Computes one snapshot per tick, shared by every subscriber.
+
+    The tick loop only runs while someone is subscribed. Each subscriber is
+    sent a full snapshot first and then deltas at its own interval (rounded
+    up to whole ticks), so N monitors cost one computation per tick.
+    """
+
+    def __init__(self, compute, tick_seconds: float = 1.0):
+        self.compute = compute
+        self.tick_seconds = tick_seconds
+        self._subscribers = 0
+        self._latest = None
+        self._version = 0
+        self._changed = None
+        self._task = None
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                self._latest = await asyncio.to_thread(self.compute)
+                self._version += 1
+                async with self._changed:
+                    self._changed.notify_all()
+            except Exception as e:
+                print(f"Error computing monitor snapshot: {e}")
+            await asyncio.sleep(self.tick_seconds)
+        self._task = None
+
+    async def subscribe(self, interval: float):
+        """Yield ("snapshot", full) once, then ("delta", changes) every interval"""
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        self._subscribers += 1
+        g_subscribers.inc()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            sent, seen, next_send = None, 0, 0.0
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self._version > seen)
+                seen = self._version
+                now = time.monotonic()
+                if now < next_send:
+                    continue
+                next_send = now + interval - self.tick_seconds / 2
+                if sent is None:
+                    yield "snapshot", copy.deepcopy(self._latest)
+                else:
+                    delta = diff(sent, self._latest)
+                    if delta:
+                        yield "delta", delta
+                sent = self._latest
+        finally:
+            self._subscribers -= 1
+            g_subscribers.dec()
+
+    async def sse(self, interval: float):
+        """Server-sent events for subscribe()"""
+        async for event, data in self.subscribe(interval):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+broadcaster = SnapshotBroadcaster(compute_snapshot, MONITOR_TICK_SECONDS)
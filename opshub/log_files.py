@@ -0,0 +1,172 @@
+import json, os, re, time
+from pathlib import Path
+from .config import DOCKER_ROOT, FILE_POLL_SECONDS
+from .database import get_log_checkpoint
+from .profiling import span
+from .logging_pipeline import (CheckpointFilter, parse_docker_timestamp, line_hash,
+                               process_log_line, console, c_skipped_lines)
+
+READ_CHUNK = 1 << 20
+
+def container_log_path(container_id: str, root: str = None) -> Path:
+    """Path of a container's json-file log under the Docker root"""
+    return Path(root or DOCKER_ROOT) / "containers" / container_id / f"{container_id}-json.log"
+
+def discover_log_files(root: str = None) -> dict:
+    """Map container id -> name for json-file logged containers, without the Docker API"""
+    include_pat = re.compile(os.getenv("OPS_INCLUDE_REGEX", ".*"))
+    exclude_pat = re.compile(os.getenv("OPS_EXCLUDE_REGEX", "^$"))
+    include_stopped = os.getenv("OPS_INCLUDE_STOPPED", "false").lower() in ("1","true","yes")
+
+    found = {}
+    containers_dir = Path(root or DOCKER_ROOT) / "containers"
+    for cdir in sorted(containers_dir.iterdir()):
+        try:
+            meta = json.loads((cdir / "config.v2.json").read_text())
+        except (OSError, ValueError):
+            continue
+        name = meta.get("Name", "").lstrip("/") or cdir.name[:12]
+        if not include_stopped and not meta.get("State", {}).get("Running", False):
+            continue
+        if not include_pat.search(name) or exclude_pat.search(name):
+            continue
+        if container_log_path(cdir.name, root).exists():
+            found[cdir.name] = name
+    return found
+
+def _inode(path: Path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+def _tail_offset(fh, lines: int) -> int:
+    """Byte offset where the last `lines` complete lines of fh start"""
+    end = fh.seek(0, os.SEEK_END)
+    pos, newlines = end, 0
+    while pos > 0:
+        step = min(65536, pos)
+        pos -= step
+        fh.seek(pos)
+        block = fh.read(step)
+        # The final newline terminates the last line, it does not start one
+        idx = len(block) - 1 if pos + step == end else len(block)
+        while True:
+            idx = block.rfind(b"\n", 0, idx)
+            if idx < 0:
+                break
+            newlines += 1
+            if newlines > lines:
+                return pos + idx + 1
+    return 0
+
+def _parse_records(lines: list) -> list:
+    """Parse json-file records in one json.loads call, falling back per line on bad input"""
+    try:
+        return json.loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        records = []
+        for raw in lines:
+            try:
+                records.append(json.loads(raw))
+            except ValueError:
+                records.append(None)
+        return records
+
+def tail_log_file(container_id: str, name: str, root: str = None, handler=None,
+                  follow: bool = True, tail: int = 100):
+    """Read a container's json-file log incrementally by polling, surviving rotation.
+
+    Resumes at the checkpointed byte offset when that inode is still on disk
+    (either the live file or `.log.1`). Otherwise replays the rotated and live
+    files, skipping up to the checkpointed timestamp. On first sight it starts
+    at the last `tail` lines (tail=None reads the whole file).
+    """
+    handler = handler or process_log_line
+    path = container_log_path(container_id, root)
+    rotated = path.with_name(path.name + ".1")
+
+    try:
+        checkpoint = get_log_checkpoint(container_id)
+        resume = CheckpointFilter(checkpoint)
+        fh, offset = None, 0
+
+        if checkpoint and checkpoint.get("file_inode") is not None:
+            for candidate in (rotated, path):
+                if _inode(candidate) == checkpoint["file_inode"]:
+                    fh, offset = open(candidate, "rb"), checkpoint["file_offset"]
+                    resume = CheckpointFilter(None)
+                    break
+        if fh is None and checkpoint:
+            fh = open(rotated if rotated.exists() else path, "rb")
+        if fh is None:
+            fh = open(path, "rb")
+            if tail is not None:
+                offset = _tail_offset(fh, tail)
+        fh.seek(offset)
+        inode = os.fstat(fh.fileno()).st_ino
+
+        partial = b""
+        pending_text = ""
+
+        def emit(lines: list, pos: int, end: int):
+            """Hand records to the handler; lines span file offsets pos to end"""
+            nonlocal pending_text
+            for raw, record in zip(lines, _parse_records(lines)):
+                pos += len(raw) + 1
+                if not isinstance(record, dict):
+                    continue
+                # Docker splits long lines into several records; only the last ends in \n
+                pending_text += record.get("log", "")
+                if not pending_text.endswith("\n"):
+                    continue
+                line, pending_text = pending_text.rstrip("\r\n"), ""
+                if not line:
+                    continue
+                with span("tail"):
+                    try:
+                        ts_ns = parse_docker_timestamp(record["time"])
+                    except (KeyError, TypeError, AttributeError, ValueError):
+                        c_skipped_lines.labels("json_file").inc()
+                        continue
+                    digest = line_hash(line)
+                    accepted = resume.accept(ts_ns, digest)
+                if accepted:
+                    handler(name, container_id, line, ts_ns=ts_ns, digest=digest,
+                            file_pos=(inode, min(pos, end)))
+
+        while True:
+            chunk = fh.read(READ_CHUNK)
+            if chunk:
+                data = partial + chunk
+                end = data.rfind(b"\n")
+                if end < 0:
+                    partial = data
+                    continue
+                complete, partial = data[:end + 1], data[end + 1:]
+                emit(complete.split(b"\n")[:-1], offset, offset + len(complete))
+                offset += len(complete)
+                continue
+
+            # At EOF: move on if the file we hold was rotated away or truncated
+            current = _inode(path)
+            if current is not None and (current != inode or os.stat(path).st_size < offset):
+                # Finish the old file first: lines written since the last read, and a
+                # final record cut off without its newline
+                rest = partial + fh.read()
+                if rest:
+                    emit(rest.rstrip(b"\n").split(b"\n"), offset, offset + len(rest))
+                fh.close()
+                fh, offset, partial = open(path, "rb"), 0, b""
+                inode = os.fstat(fh.fileno()).st_ino
+                continue
+            if not follow or not path.parent.exists():
+                break
+            time.sleep(FILE_POLL_SECONDS)
+
+        fh.close()
+
+    except FileNotFoundError:
+        console.print(f"[ERROR]No json-file log for {name}", style="ERROR")
+    except Exception as e:
+        console.print(f"[ERROR]Error reading log file for {name}: {e}", style="ERROR")
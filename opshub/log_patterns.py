@@ -0,0 +1,203 @@
+import re, threading, time
+from .config import (PATTERN_BUCKET_SECONDS, PATTERN_FLUSH_SECONDS, PATTERN_DEPTH,
+                     PATTERN_SIMILARITY, PATTERN_MAX_CHILDREN)
+from .counters import BucketCounter
+from .database import (store_log_templates, get_log_templates,
+                       increment_template_counts, get_template_counts)
+
+WILDCARD = "<*>"
+_HAS_DIGIT = re.compile(r"\d")
+
+def _token_key(token: str) -> str:
+    """Tokens carrying digits (ids, timestamps, sizes) are routed as wildcards"""
+    return WILDCARD if _HAS_DIGIT.search(token) else token
+
+class LogCluster:
+    """A mined template: tokens with WILDCARD in the variable positions"""
+    __slots__ = ("id", "tokens")
+
+    def __init__(self, cluster_id: int, tokens: list):
+        self.id = cluster_id
+        self.tokens = tokens
+
+    @property
+    def template(self) -> str:
+        return " ".join(self.tokens)
+
+class _Node:
+    __slots__ = ("children", "clusters")
+
+    def __init__(self):
+        self.children = {}
+        self.clusters = []
+
+class Drain:
+    """Streaming log template miner using a fixed-depth parse tree (Drain).
+
+    Lines are routed by token count and then by their first ``depth - 2``
+    tokens to a leaf holding candidate clusters. The most similar cluster
+    absorbs the line (differing positions become wildcards) when its
+    similarity reaches ``sim_threshold``, otherwise a new cluster is created.
+    """
+
+    def __init__(self, depth: int = 4, sim_threshold: float = 0.4, max_children: int = 100):
+        self.max_prefix = max(depth, 3) - 2
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.root = {}
+        self.clusters = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def _leaf(self, tokens: list) -> _Node:
+        node = self.root.get(len(tokens))
+        if node is None:
+            node = self.root[len(tokens)] = _Node()
+
+        for token in tokens[:self.max_prefix]:
+            key = _token_key(token)
+            child = node.children.get(key)
+            if child is None:
+                # Keep one slot free for the wildcard child
+                if key != WILDCARD and len(node.children) >= self.max_children - 1:
+                    key = WILDCARD
+                child = node.children.get(key)
+                if child is None:
+                    child = node.children[key] = _Node()
+            node = child
+
+        return node
+
+    @staticmethod
+    def _similarity(template: list, tokens: list) -> tuple:
+        if not tokens:
+            return 1.0, 0
+        same = params = 0
+        for t, c in zip(tokens, template):
+            if c == WILDCARD:
+                params += 1
+            elif c == t:
+                same += 1
+        return same / len(tokens), params
+
+    def _best_match(self, leaf: _Node, tokens: list):
+        best, best_score = None, (-1.0, -1)
+        for cluster in leaf.clusters:
+            score = self._similarity(cluster.tokens, tokens)
+            if score > best_score:
+                best, best_score = cluster, score
+        if best is not None and best_score[0] >= self.sim_threshold:
+            return best
+        return None
+
+    def add(self, line: str) -> tuple:
+        """Mine a line. Returns (template_id, template, params, changed)"""
+        tokens = line.split()
+        with self._lock:
+            leaf = self._leaf(tokens)
+            cluster = self._best_match(leaf, tokens)
+            changed = False
+
+            if cluster is None:
+                cluster = LogCluster(self._next_id, [_token_key(t) for t in tokens])
+                self._next_id += 1
+                self.clusters[cluster.id] = cluster
+                leaf.clusters.append(cluster)
+                changed = True
+            else:
+                merged = [c if c == t else WILDCARD for t, c in zip(tokens, cluster.tokens)]
+                if merged != cluster.tokens:
+                    cluster.tokens = merged
+                    changed = True
+
+            params = [t for t, c in zip(tokens, cluster.tokens) if c == WILDCARD]
+            return cluster.id, cluster.template, params, changed
+
+    def load(self, templates: dict):
+        """Rebuild the tree from a persisted {template_id: template} catalog"""
+        with self._lock:
+            for cluster_id, template in sorted(templates.items()):
+                tokens = template.split()
+                cluster = LogCluster(cluster_id, tokens)
+                self.clusters[cluster_id] = cluster
+                self._leaf(tokens).clusters.append(cluster)
+                self._next_id = max(self._next_id, cluster_id + 1)
+
+    def template(self, cluster_id: int) -> str:
+        cluster = self.clusters.get(cluster_id)
+        return cluster.template if cluster else None
+
+_miner = Drain(PATTERN_DEPTH, PATTERN_SIMILARITY, PATTERN_MAX_CHILDREN)
+_counts = BucketCounter(PATTERN_BUCKET_SECONDS)
+_dirty_templates = {}
+_dirty_lock = threading.Lock()
+
+def mine(container_name: str, level: str, line: str, ts: float = None) -> tuple:
+    """Assign a template to a log line and count it. Returns (template_id, params)"""
+    template_id, template, params, changed = _miner.add(line)
+    if changed:
+        with _dirty_lock:
+            _dirty_templates[template_id] = template
+    _counts.add((template_id, container_name, level), ts=ts)
+    return template_id, params
+
+def flush():
+    """Persist new/changed templates and pending counters"""
+    global _dirty_templates
+    with _dirty_lock:
+        templates, _dirty_templates = _dirty_templates, {}
+    try:
+        store_log_templates(templates)
+    except Exception:
+        with _dirty_lock:
+            _dirty_templates = {**templates, **_dirty_templates}
+        raise
+
+    counts = _counts.drain()
+    try:
+        increment_template_counts(counts)
+    except Exception:
+        _counts.restore(counts)
+        raise
+
+def top_patterns(container: str = None, level: str = "all", window_ms: int = 3600000,
+                 limit: int = 20) -> list:
+    """Top templates by line count over the last window_ms, from the bucket counters.
+
+    Windows are aligned to bucket boundaries, so the oldest bucket is counted whole.
+    """
+    since_bucket = _counts.bucket_for(time.time() - window_ms / 1000.0)
+    totals = get_template_counts(since_bucket, container, level)
+
+    # Fold in counts that have not been flushed yet
+    for (bucket, template_id, cname, lvl), n in _counts.pending().items():
+        if bucket < since_bucket:
+            continue
+        if container and container != "all" and cname != container:
+            continue
+        if level != "all" and lvl != level.upper():
+            continue
+        totals[template_id] = totals.get(template_id, 0) + n
+
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [
+        {"template_id": template_id, "template": _miner.template(template_id), "count": count}
+        for template_id, count in top
+    ]
+
+def flush_worker():
+    """Background worker flushing the template catalog and counters"""
+    while True:
+        time.sleep(PATTERN_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error flushing log patterns: {e}")
+
+def start():
+    """Load the persisted template catalog and start flushing"""
+    try:
+        _miner.load(get_log_templates())
+    except Exception as e:
+        print(f"Error loading log templates: {e}")
+    threading.Thread(target=flush_worker, daemon=True).start()
@@ -0,0 +1,92 @@
+import threading, time
+from collections import defaultdict
+from prometheus_client import Counter
+from .config import STATS_BUCKET_SECONDS, STATS_FLUSH_SECONDS
+from .counters import BucketCounter
+from .database import increment_log_volume, get_log_volume
+
+c_log_lines = Counter("opshub_log_lines_total", "Log lines ingested", ["container", "level"])
+
+_counts = BucketCounter(STATS_BUCKET_SECONDS)
+# Short in-memory history for rate-based alert rules, never drained
+_recent = BucketCounter(STATS_BUCKET_SECONDS)
+
+def record(container_name: str, level: str, ts: float = None):
+    """Count one ingested line"""
+    _counts.add((container_name, level), ts=ts)
+    _recent.add((container_name, level), ts=ts)
+    c_log_lines.labels(container=container_name, level=level).inc()
+
+def flush():
+    """Upsert pending per-minute counts in one batch"""
+    counts = _counts.drain()
+    try:
+        increment_log_volume(counts)
+    except Exception:
+        _counts.restore(counts)
+        raise
+
+def get_stats(container: str = None, level: str = "all", window_ms: int = 3600000,
+              step_ms: int = 60000) -> dict:
+    """Time-bucketed line counts per (container, level).
+
+    step_ms is rounded up to a whole number of minutes, the counter resolution.
+    """
+    step = max(STATS_BUCKET_SECONDS, -(-step_ms // 1000 // STATS_BUCKET_SECONDS) * STATS_BUCKET_SECONDS)
+    now = time.time()
+    since = int((now - window_ms / 1000.0) // step) * step
+    until = _counts.bucket_for(now)
+
+    totals = defaultdict(int)
+    for row in get_log_volume(since, until, step, container, level):
+        totals[(row["bucket"], row["container_name"], row["level"])] += row["count"]
+
+    # Fold in counts that have not been flushed yet
+    for (bucket, cname, lvl), n in _counts.pending().items():
+        if bucket < since:
+            continue
+        if container and container != "all" and cname != container:
+            continue
+        if level != "all" and lvl != level.upper():
+            continue
+        totals[(bucket // step * step, cname, lvl)] += n
+
+    series = defaultdict(list)
+    for (bucket, cname, lvl), n in sorted(totals.items()):
+        series[(cname, lvl)].append([bucket, n])
+
+    return {
+        "step_ms": step * 1000,
+        "series": [
+            {"container": cname, "level": lvl, "points": points}
+            for (cname, lvl), points in sorted(series.items())
+        ]
+    }
+
+def last_minute_rates() -> dict:
+    """Lines and errors per container over the last complete minute"""
+    current = _recent.bucket_for()
+    previous = current - STATS_BUCKET_SECONDS
+    _recent.prune(previous)
+
+    rates = defaultdict(lambda: {"lines_per_minute": 0, "errors_per_minute": 0})
+    for (bucket, cname, lvl), n in _recent.pending().items():
+        if bucket != previous:
+            continue
+        rates[cname]["lines_per_minute"] += n
+        if lvl in ("ERROR", "CRITICAL"):
+            rates[cname]["errors_per_minute"] += n
+    return dict(rates)
+
+def flush_worker():
+    """Background worker flushing volume counters"""
+    while True:
+        time.sleep(STATS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error flushing log stats: {e}")
+
+def start():
+    """Start flushing volume counters"""
+    threading.Thread(target=flush_worker, daemon=True).start()
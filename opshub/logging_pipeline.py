@@ -1,16 +1,33 @@
-import docker, datetime, json, os, re, threading, time, gzip, tarfile, shutil
+import datetime, errno, json, os, re, sqlite3, threading, time, gzip, tarfile, shutil, hashlib, calendar, functools
 from pathlib import Path
+from prometheus_client import Counter
 from rich.console import Console
 from rich.theme import Theme
-from .config import target_containers, LOG_BASE, RETENTION_ACTIVE_DAYS
-from .database import store_log_entry, get_logs as get_logs_db
-import os, re, docker
+from rich.markup import escape
+from .config import (target_containers, LOG_BASE, RETENTION_ACTIVE_DAYS, LOG_SOURCE,
+                     WRITE_BATCH_SIZE, WRITE_FLUSH_SECONDS, WRITE_QUEUE_SIZE,
+                     SINK_CONSOLE, SINK_CONSOLE_BATCH, SINK_CONSOLE_QUEUE,
+                     SINK_FILES, SINK_FILES_BATCH, SINK_FILES_FLUSH_SECONDS, SINK_FILES_QUEUE,
+                     SINK_SQLITE, SINK_SESSIONS, SINK_SESSIONS_BATCH, SINK_SESSIONS_FLUSH_SECONDS,
+                     SINK_SESSIONS_QUEUE)
+from .database import log_entry_days, store_log_day, get_log_checkpoint, get_logs as get_logs_db
+from . import (log_patterns, log_stats, loki_sink, structured_logs, extract_rules, model_stats,
+               user_stats)
+from .profiling import span
+from .sinks import Sink
+from .records import LogRecord
+import os, re
+
+c_skipped_lines = Counter("opshub_log_lines_skipped_total",
+                          "Tailed log lines skipped because their timestamp could not be parsed", ["source"])
 
 console = Console(theme=Theme({
     "INFO": "dim",
     "SUCCESS": "green",
     "WARN": "yellow",
-    "ERROR": "bold red"
+    "WARNING": "yellow",
+    "ERROR": "bold red",
+    "CRITICAL": "bold white on red"
 }))
 
 LEVEL_PATTERNS = {
@@ -21,20 +38,6 @@ LEVEL_PATTERNS = {
     "INFO": re.compile(r"\b(INFO|INFORMATION|DEBUG|TRACE)\b", re.I),
 }
 
-# Enhanced patterns for specific services
-OPENWEBUI_PATTERNS = {
-    "user_login": re.compile(r"user\s+(\w+)\s+(logged\s+in|authenticated)", re.I),
-    "model_usage": re.compile(r"model[:\s]+(\w+)", re.I),
-    "api_request": re.compile(r"(GET|POST|PUT|DELETE)\s+/api/", re.I),
-    "error": re.compile(r"(error|exception|failed)", re.I),
-}
-
-OLLAMA_PATTERNS = {
-    "model_load": re.compile(r"loaded\s+model[:\s]+(\w+)", re.I),
-    "model_request": re.compile(r"(generating|processing)\s+for\s+model[:\s]+(\w+)", re.I),
-    "gpu_usage": re.compile(r"GPU\s+(\d+).*?(\d+)%", re.I),
-}
-
 def classify(line: str) -> str:
     """Classify log line by level"""
     for lvl, pat in LEVEL_PATTERNS.items():
@@ -43,129 +46,327 @@ def classify(line: str) -> str:
     return "INFO"
 
 def extract_metadata(container_name: str, line: str) -> dict:
-    """Extract metadata from log lines based on container type"""
-    metadata = {}
-    
-    if "openwebui" in container_name.lower():
-        # Extract user login info
-        match = OPENWEBUI_PATTERNS["user_login"].search(line)
-        if match:
-            metadata["user"] = match.group(1)
-            metadata["action"] = "login"
-        
-        # Extract model usage
-        match = OPENWEBUI_PATTERNS["model_usage"].search(line)
-        if match:
-            metadata["model"] = match.group(1)
-        
-        # Extract API requests
-        match = OPENWEBUI_PATTERNS["api_request"].search(line)
-        if match:
-            metadata["method"] = match.group(1)
-            metadata["endpoint"] = "api"
-    
-    elif "ollama" in container_name.lower():
-        # Extract model loading
-        match = OLLAMA_PATTERNS["model_load"].search(line)
-        if match:
-            metadata["model"] = match.group(1)
-            metadata["action"] = "model_load"
-        
-        # Extract model requests
-        match = OLLAMA_PATTERNS["model_request"].search(line)
-        if match:
-            metadata["model"] = match.group(2)
-            metadata["action"] = match.group(1)
-        
-        # Extract GPU usage
-        match = OLLAMA_PATTERNS["gpu_usage"].search(line)
-        if match:
-            metadata["gpu_id"] = match.group(1)
-            metadata["gpu_usage"] = match.group(2)
-    
-    return metadata
+    """Extract metadata from log lines with the container's extraction rules"""
+    return extract_rules.extract(container_name, line)
 
-def tail_container(name: str):
-    """Tail logs for a container and process them"""
-    client = docker.from_env()
+@functools.lru_cache(maxsize=1024)
+def _epoch_seconds(seconds: str) -> int:
+    return calendar.timegm(time.strptime(seconds, "%Y-%m-%dT%H:%M:%S"))
+
+def parse_docker_timestamp(ts: str) -> int:
+    """Parse an RFC3339Nano Docker timestamp into epoch nanoseconds"""
+    ts = ts.rstrip("Z")
+    offset = 0
+    if len(ts) > 19 and ts[-6] in "+-" and ts[-3] == ":":
+        offset = (int(ts[-5:-3]) * 3600 + int(ts[-2:]) * 60) * (1 if ts[-6] == "+" else -1)
+        ts = ts[:-6]
+    seconds, _, frac = ts.partition(".")
+    return (_epoch_seconds(seconds) - offset) * 1_000_000_000 + int((frac + "000000000")[:9])
+
+def line_hash(line: str) -> str:
+    return hashlib.blake2b(line.encode(errors="ignore"), digest_size=8).hexdigest()
+
+class CheckpointFilter:
+    """Drops lines up to and including a checkpointed (ts_ns, line_hash) mark"""
+
+    def __init__(self, checkpoint: dict = None):
+        self.mark_ns = checkpoint["ts_ns"] if checkpoint else 0
+        self.mark_hash = checkpoint["line_hash"] if checkpoint else None
+        self.skipping = checkpoint is not None
+
+    def accept(self, ts_ns: int, digest: str) -> bool:
+        if not self.skipping:
+            return True
+        if ts_ns < self.mark_ns:
+            return False
+        if ts_ns == self.mark_ns:
+            if digest == self.mark_hash:
+                self.skipping = False
+            return False
+        self.skipping = False
+        return True
+
+def stream_lines(stream):
+    """Lines of a Docker log stream, whatever its chunking.
+
+    Chunks can end mid-line, and TTY containers arrive a byte per chunk, so
+    bytes are held until their newline. A final unterminated line is yielded
+    when the stream ends.
+    """
+    buffer = bytearray()
+    for chunk in stream:
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+        end = buffer.rfind(b"\n")
+        yield from buffer[:end].decode(errors="ignore").split("\n")
+        del buffer[:end + 1]
+    if buffer:
+        yield buffer.decode(errors="ignore")
+
+def tail_container(name: str, client=None, handler=None):
+    """Tail logs for a container and process them.
+
+    Resumes from the stored checkpoint (Docker timestamp + line hash) so
+    restarts neither duplicate nor drop lines; without one, starts from the
+    last 100 lines.
+    """
+    import docker
+    client = client or docker.from_env()
+    handler = handler or process_log_line
     try:
         c = client.containers.get(name)
         container_id = c.id
         
-        # Get recent logs first
-        for raw in c.logs(stream=False, tail=100):
-            line = raw.decode(errors="ignore").rstrip("\n")
-            if line:
-                process_log_line(name, container_id, line)
+        checkpoint = get_log_checkpoint(container_id)
+        if checkpoint:
+            stream = c.logs(stream=True, follow=True, timestamps=True,
+                            since=max(checkpoint["ts_ns"] // 1_000_000_000, 1))
+        else:
+            stream = c.logs(stream=True, follow=True, timestamps=True, tail=100)
         
-        # Follow new logs
-        for raw in c.logs(stream=True, follow=True, since=int(time.time())):
-            line = raw.decode(errors="ignore").rstrip("\n")
-            if line:
-                process_log_line(name, container_id, line)
+        resume = CheckpointFilter(checkpoint)
+        for raw_line in stream_lines(stream):
+            with span("tail"):
+                ts, _, line = raw_line.partition(" ")
+                line = line.rstrip("\r")
+                if not line:
+                    continue
+                try:
+                    ts_ns = parse_docker_timestamp(ts)
+                except ValueError:
+                    c_skipped_lines.labels("docker_logs").inc()
+                    continue
+                digest = line_hash(line)
+                accepted = resume.accept(ts_ns, digest)
+            if accepted:
+                handler(name, container_id, line, ts_ns=ts_ns, digest=digest)
                 
     except docker.errors.NotFound:
         console.print(f"[ERROR]Container {name} not found", style="ERROR")
     except Exception as e:
         console.print(f"[ERROR]Error tailing {name}: {e}", style="ERROR")
 
-def process_log_line(container_name: str, container_id: str, line: str):
-    """Process a single log line"""
+_NO_FIELDS = (None,) * 5
+
+def process_log_line(container_name: str, container_id: str, line: str,
+                     ts_ns: int = None, digest: str = None, file_pos: tuple = None,
+                     source: str = "docker_logs", level: str = None):
+    """Process a single log line.
+
+    ts_ns is the source (Docker) timestamp; when given, a docker_logs line also
+    advances the container's checkpoint once it is written. file_pos is the
+    (inode, offset) just past the line for the json-file source. level, when
+    given, overrides classification. JSON object lines supply their own level,
+    timestamp and message when they carry them, and fill the indexed columns.
+    Returns False if the line failed before reaching the database sink.
+    """
+    queued = False
     try:
-        lvl = classify(line)
-        metadata = extract_metadata(container_name, line)
-        timestamp = datetime.datetime.now().isoformat()
-        
-        # Display in console
-        console.print(f"[{lvl}][{container_name}] {line}", style=lvl)
-        
-        # Write to file
-        write_line(container_name, lvl, line)
+        ts = ts_ns / 1_000_000_000 if ts_ns is not None else time.time()
+        with span("classify"):
+            fields = structured_logs.parse(line)
+            message = line
+            if fields:
+                message = fields["message"] or line
+                ts = fields["ts"] or ts
+            lvl = level or (fields and fields["level"]) or classify(message)
+        with span("extract"):
+            metadata = extract_metadata(container_name, message)
+            if fields:
+                for key, value in (("user", fields["username"]), ("model", fields["model"])):
+                    if value is not None:
+                        metadata.setdefault(key, value)
+            model_stats.observe(container_name, metadata, fields, ts=ts)
+            if metadata.get("user"):
+                user_stats.record(metadata["user"], metadata.get("model"), ts=ts)
+            template_id, template_vars = log_patterns.mine(container_name, lvl, message, ts=ts)
+            log_stats.record(container_name, lvl, ts=ts)
+        timestamp = datetime.datetime.fromtimestamp(ts).isoformat()
         
-        # Store in database
-        store_log_entry(
-            container_name=container_name,
-            container_id=container_id,
-            level=lvl,
-            message=line,
-            raw_log=line,
-            source="docker_logs",
-            timestamp=timestamp
-        )
-        
-        # Handle special cases for user tracking
-        if metadata.get("user") and metadata.get("action") == "login":
-            from .database import store_user_session
-            store_user_session(
-                username=metadata["user"],
-                model=metadata.get("model"),
-                action="login",
-                metadata=metadata
-            )
+        # Publish one record; each sink consumes it on its own worker
+        with span("publish"):
+            # raw_log only when it says more than message
+            record = LogRecord(timestamp, container_name, container_id, lvl, message,
+                               line if message is not line else None, source,
+                               template_id, json.dumps(template_vars) if template_vars else None,
+                               *(_NO_FIELDS if fields is None else
+                                 (fields["http_status"], fields["latency_ms"], fields["path"],
+                                  fields["username"], fields["model"])))
+            console_sink.put(record)
+            file_sink.put(record)
+            checkpoint = None
+            # Only tailed sources resume from a checkpoint
+            if ts_ns is not None and source == "docker_logs":
+                checkpoint = (container_name, ts_ns, digest or line_hash(line), *(file_pos or (None, None)))
+            db_sink.put((record, checkpoint, threading.get_ident()))
+            queued = True
+            
+            # Handle special cases for user tracking
+            if metadata.get("user") and metadata.get("action") == "login":
+                session_sink.put({"username": metadata["user"], "model": metadata.get("model"),
+                                  "action": "login", "metadata": metadata})
+            
+            # Forward to Loki, if configured
+            loki_sink.submit(container_name, lvl, line, ts_ns if ts_ns is not None else int(ts * 1_000_000_000),
+                             metadata, source)
             
     except Exception as e:
         console.print(f"[ERROR]Error processing log line: {e}", style="ERROR")
+    return queued
 
-def write_line(container: str, lvl: str, line: str):
-    """Write log line to file"""
-    day = datetime.datetime.now().strftime("%Y-%m-%d")
-    base = Path(LOG_BASE) / container
-    base.mkdir(parents=True, exist_ok=True)
-    
-    # Write to daily log
-    with (base / f"{day}.log").open("a") as fh:
-        fh.write(f"{datetime.datetime.now().isoformat()} [{lvl}] {line}\n")
+_write_listeners = []
+
+def on_write(callback):
+    """Register callback(batch) run after each batch is committed; batch items are
+    (record, checkpoint, producer thread id) as queued by process_log_line"""
+    _write_listeners.append(callback)
+
+# Producer thread id -> batches holding its entries that failed to write
+_write_failures = {}
+
+class WriteAck:
+    """Queued behind a producer's entries; set once everything before it is written.
+
+    ok is False if a batch holding any of this producer's entries failed
+    since the ack was created, which conservatively covers its earlier
+    batches too. Other producers' failures don't count.
+    """
+    __slots__ = ("event", "ok", "producer", "failures")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+        self.producer = threading.get_ident()
+        self.failures = _write_failures.get(self.producer, 0)
+
+def reserve_queue(count: int):
+    """Context manager holding room for count entries in the database sink, all or none,
+    for puts from this thread; yields False without waiting when there is not enough"""
+    return db_sink.reserve(count)
+
+def acknowledge(timeout: float = None):
+    """Wait until all entries queued so far by this thread are committed: True once they
+    are, False if a batch holding some of them failed, None on timeout (they are still
+    queued and will be written)"""
+    if not db_sink.enabled:
+        return True
+    ack = WriteAck()
+    db_sink.put(ack)
+    if not ack.event.wait(timeout):
+        return None
+    return ack.ok
+
+# Backoff between attempts at a batch the database could not take
+RETRY_MAX_SECONDS = 30
+
+# Write errors worth retrying: SQLite result codes (extended ones share the prefix), their
+# messages when no code is attached, and OS errors
+_TRANSIENT_SQLITE = ("SQLITE_BUSY", "SQLITE_LOCKED", "SQLITE_IOERR", "SQLITE_FULL")
+_TRANSIENT_MESSAGES = ("is locked", "is busy", "disk i/o error", "disk is full")
+_TRANSIENT_ERRNOS = (errno.EIO, errno.ENOSPC, errno.EDQUOT)
+
+def transient_write_error(error: Exception) -> bool:
+    """Whether a failed write may succeed later: a locked or busy database, a disk I/O error
+    or a full disk. Missing tables, a read-only database and the like never will."""
+    if isinstance(error, sqlite3.OperationalError):
+        name = getattr(error, "sqlite_errorname", None)
+        if name:
+            return name.startswith(_TRANSIENT_SQLITE)
+        return any(message in str(error).lower() for message in _TRANSIENT_MESSAGES)
+    return isinstance(error, OSError) and error.errno in _TRANSIENT_ERRNOS
+
+def store_batch(batch: list):
+    """Database sink: write a batch of entries with their checkpoints, a day shard at a time.
+
+    A day that fails with a transient error (database locked or busy, disk
+    I/O error, disk full; see transient_write_error) is retried until it
+    commits, holding up the batches behind it, so a later batch can never move
+    a checkpoint past lines that were not written. Days already committed are
+    not written again. The queue fills meanwhile and pushes back on the
+    tailers. Any other error will not go away by waiting (a missing table, a
+    read-only database, a bad row): the rest of the batch is dropped and
+    counted.
+    """
+    acks = [item for item in batch if type(item) is WriteAck]
+    if acks:
+        batch = [item for item in batch if type(item) is not WriteAck]
+    days = log_entry_days([item[0] for item in batch], [item[1] for item in batch])
+    delay = 1
+    try:
+        while days:
+            day, entries, checkpoints = days[0]
+            try:
+                store_log_day(day, entries, checkpoints)
+            except (sqlite3.OperationalError, OSError) as e:
+                if not transient_write_error(e):
+                    raise
+                console.print(f"[ERROR]Error writing {len(entries)} log entries for {day}: {escape(str(e))} "
+                              f"(retrying in {delay}s)", style="ERROR")
+                time.sleep(delay)
+                delay = min(delay * 2, RETRY_MAX_SECONDS)
+                continue
+            days.pop(0)
+    except Exception:
+        for producer in {item[2] for item in batch}:
+            _write_failures[producer] = _write_failures.get(producer, 0) + 1
+        raise
+    else:
+        if batch:
+            for callback in _write_listeners:
+                callback(batch)
+    finally:
+        for ack in acks:
+            ack.ok = ack.failures == _write_failures.get(ack.producer, 0)
+            ack.event.set()
+
+def print_lines(batch: list):
+    """Console sink"""
+    for record in batch:
+        console.print(f"[{record.level}][{record.container_name}] {escape(record.line)}", style=record.level)
+
+def write_lines(batch: list):
+    """File sink: append to each container's daily and per-level logs, opening each file once per batch"""
+    files = {}
+    for record in batch:
+        timestamp, container, lvl, line = record.timestamp, record.container_name, record.level, record.line
+        day = timestamp[:10]
+        files.setdefault((container, f"{day}.log"), []).append(f"{timestamp} [{lvl}] {line}\n")
+        files.setdefault((container, f"{day}_{lvl}.log"), []).append(f"{timestamp} {line}\n")
     
-    # Write to level-specific log
-    with (base / f"{day}_{lvl}.log").open("a") as fh:
-        fh.write(f"{datetime.datetime.now().isoformat()} {line}\n")
+    for (container, name), lines in files.items():
+        base = Path(LOG_BASE) / container
+        base.mkdir(parents=True, exist_ok=True)
+        with (base / name).open("a") as fh:
+            fh.write("".join(lines))
+
+def store_sessions(batch: list):
+    """Session sink"""
+    from .database import store_user_sessions
+    store_user_sessions(batch)
 
-def get_logs(container: str = None, level: str = "all", limit: int = 100, since: datetime.datetime = None):
+console_sink = Sink("console", print_lines, SINK_CONSOLE_BATCH, 0, SINK_CONSOLE_QUEUE, enabled=SINK_CONSOLE)
+file_sink = Sink("files", write_lines, SINK_FILES_BATCH, SINK_FILES_FLUSH_SECONDS, SINK_FILES_QUEUE,
+                 enabled=SINK_FILES)
+# Never drops: a full queue pushes back on tailers (and makes ingest answer 429)
+db_sink = Sink("sqlite", store_batch, WRITE_BATCH_SIZE, WRITE_FLUSH_SECONDS, WRITE_QUEUE_SIZE,
+               block=True, enabled=SINK_SQLITE)
+session_sink = Sink("sessions", store_sessions, SINK_SESSIONS_BATCH, SINK_SESSIONS_FLUSH_SECONDS,
+                    SINK_SESSIONS_QUEUE, enabled=SINK_SESSIONS)
+SINKS = (console_sink, file_sink, db_sink, session_sink)
+
+def writer_worker():
+    """Run the database sink in the calling thread"""
+    db_sink.run()
+
+def get_logs(container: str = None, level: str = "all", limit: int = 100,
+             since: datetime.datetime = None) -> list[LogRecord]:
     """Get logs from database with filtering"""
     return get_logs_db(container, level, limit, since)
 
 def discover_containers():
     """Discover containers to monitor"""
+    import docker
     include_pat = re.compile(os.getenv("OPS_INCLUDE_REGEX", ".*"))
     exclude_pat = re.compile(os.getenv("OPS_EXCLUDE_REGEX", "^$"))  # match nothing by default
     include_stopped = os.getenv("OPS_INCLUDE_STOPPED", "false").lower() in ("1","true","yes")
@@ -184,22 +385,50 @@ def discover_containers():
 
 def start():
     """Start log monitoring for all discovered containers"""
-    names = discover_containers()
-    console.print(f"[bold cyan]OpsHub monitoring containers:[/bold cyan] {', '.join(names)}")
-    for name in names:
-        threading.Thread(target=tail_container, args=(name,), daemon=True).start()
+    log_patterns.start()
+    log_stats.start()
+    model_stats.start()
+    user_stats.start()
+    extract_rules.start()
+    loki_sink.start()
+    for sink in SINKS:
+        sink.start()
+    threading.Thread(target=start_sources, daemon=True).start()
     
     # Start cleanup thread
     threading.Thread(target=cleanup_worker, daemon=True).start()
 
+def start_sources():
+    """Start one reader per container, retrying until Docker can be reached"""
+    delay = 1
+    while True:
+        try:
+            if LOG_SOURCE == "files":
+                from .log_files import discover_log_files, tail_log_file
+                found = discover_log_files()
+                console.print(f"[bold cyan]OpsHub reading json-file logs for:[/bold cyan] {', '.join(found.values())}")
+                for container_id, name in found.items():
+                    threading.Thread(target=tail_log_file, args=(container_id, name), daemon=True).start()
+            else:
+                names = discover_containers()
+                console.print(f"[bold cyan]OpsHub monitoring containers:[/bold cyan] {', '.join(names)}")
+                for name in names:
+                    threading.Thread(target=tail_container, args=(name,), daemon=True).start()
+            return
+        except Exception as e:
+            console.print(f"[ERROR]Error discovering containers: {escape(str(e))} (retrying in {delay}s)", style="ERROR")
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
 def cleanup_worker():
     """Background worker for cleanup tasks"""
     while True:
         try:
             time.sleep(3600)  # Run every hour
             cleanup_old_logs()
-            from .database import cleanup_old_data
+            from .database import cleanup_old_data, expire_idle_sessions
             cleanup_old_data()
+            expire_idle_sessions()
         except Exception as e:
             console.print(f"[ERROR]Cleanup error: {e}", style="ERROR")
 
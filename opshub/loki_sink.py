@@ -0,0 +1,240 @@
+import gzip, json, os, queue, random, threading, time
+from pathlib import Path
+from prometheus_client import Counter, Gauge, Histogram
+from .config import (LOKI_URL, LOKI_TENANT, LOKI_LABEL_FIELDS, LOKI_LINE_FIELDS, LOKI_STRUCTURED_METADATA,
+                     LOKI_BATCH_SIZE, LOKI_BATCH_BYTES, LOKI_BATCH_WAIT, LOKI_QUEUE_SIZE,
+                     LOKI_TIMEOUT, LOKI_SPOOL_DIR, LOKI_SPOOL_MAX_BYTES, NODE_NAME)
+
+c_entries = Counter("opshub_loki_entries_total", "Log entries handled by the Loki forwarder", ["result"])
+c_push_errors = Counter("opshub_loki_push_errors_total", "Failed Loki pushes", ["reason"])
+h_batch_entries = Histogram("opshub_loki_batch_entries", "Entries per Loki push",
+                            buckets=(1, 10, 50, 100, 250, 500, 1000, 2000, 5000, 10000))
+h_batch_bytes = Histogram("opshub_loki_batch_bytes", "Compressed bytes per Loki push",
+                          buckets=(1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6))
+h_push_seconds = Histogram("opshub_loki_push_seconds", "Loki push request duration")
+g_spool_bytes = Gauge("opshub_loki_spool_bytes", "Bytes of Loki pushes spooled to disk")
+g_queue_depth = Gauge("opshub_loki_queue_depth", "Entries waiting to be batched for Loki")
+
+MAX_BACKOFF_SECONDS = 60
+
+class PushError(Exception):
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+class LokiForwarder:
+    """Batches entries per label set and pushes them to Loki as gzip'd JSON.
+
+    A failed push (connection error, 429, 5xx) starts an exponential backoff.
+    Until the backlog clears, batches are written to the spool directory and
+    replayed oldest first, so entries reach Loki in order. Pushes Loki
+    rejects outright (other 4xx) are dropped and counted.
+    """
+
+    def __init__(self, url: str, spool_dir: str, tenant: str = None,
+                 batch_size: int = 2000, batch_bytes: int = 1024 * 1024, batch_wait: float = 1.0,
+                 queue_size: int = 20000, timeout: float = 10.0, spool_max_bytes: int = 256 * 1024 * 1024):
+        self.push_url = url.rstrip("/") + "/loki/api/v1/push"
+        self.spool = Path(spool_dir)
+        self.tenant = tenant
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self.spool_max_bytes = spool_max_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._session = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.spool.mkdir(parents=True, exist_ok=True)
+        self._spool_bytes = sum(f.stat().st_size for f in self._spool_files())
+        g_spool_bytes.set(self._spool_bytes)
+
+    def submit(self, labels: tuple, ts_ns: int, line: str, metadata: dict = None):
+        """Queue one entry; labels is a sorted tuple of (name, value) pairs. Never blocks."""
+        try:
+            self.queue.put_nowait((labels, ts_ns, line, metadata))
+        except queue.Full:
+            c_entries.labels(result="dropped").inc()
+
+    def run(self):
+        streams, count, size, deadline = {}, 0, 0, None
+        while True:
+            now = time.monotonic()
+            if deadline is not None:
+                timeout = max(0.0, deadline - now)
+            elif self._spool_bytes:
+                timeout = max(0.05, self._retry_at - now)
+            else:
+                timeout = None
+            try:
+                labels, ts_ns, line, metadata = self.queue.get(timeout=timeout)
+                value = [str(ts_ns), line, metadata] if metadata else [str(ts_ns), line]
+                streams.setdefault(labels, []).append(value)
+                count += 1
+                size += len(line) + 32
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_wait
+                if count < self.batch_size and size < self.batch_bytes:
+                    continue
+            except queue.Empty:
+                pass
+
+            try:
+                if streams:
+                    self.ship(self.encode(streams), count)
+                    streams, count, size, deadline = {}, 0, 0, None
+                self.drain_spool()
+            except Exception as e:
+                print(f"Error forwarding to Loki: {e}")
+
+    @staticmethod
+    def encode(streams: dict) -> bytes:
+        payload = {"streams": [
+            {"stream": dict(labels), "values": sorted(values, key=lambda v: int(v[0]))}
+            for labels, values in streams.items()
+        ]}
+        return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=5)
+
+    def push(self, body: bytes, count: int):
+        import requests
+        if self._session is None:
+            self._session = requests.Session()
+        headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        if self.tenant:
+            headers["X-Scope-OrgID"] = self.tenant
+
+        started = time.perf_counter()
+        try:
+            r = self._session.post(self.push_url, data=body, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            c_push_errors.labels(reason="connection").inc()
+            raise PushError(str(e), retryable=True)
+        finally:
+            h_push_seconds.observe(time.perf_counter() - started)
+
+        if r.status_code == 429 or r.status_code >= 500:
+            c_push_errors.labels(reason=str(r.status_code)).inc()
+            raise PushError(f"Loki answered {r.status_code}", retryable=True)
+        if r.status_code >= 400:
+            c_push_errors.labels(reason="rejected").inc()
+            raise PushError(f"Loki rejected push: {r.status_code} {r.text[:200]}", retryable=False)
+
+        h_batch_entries.observe(count)
+        h_batch_bytes.observe(len(body))
+        c_entries.labels(result="sent").inc(count)
+        self._backoff, self._retry_at = 0.0, 0.0
+
+    def _start_backoff(self):
+        self._backoff = min(max(0.5, self._backoff * 2), MAX_BACKOFF_SECONDS)
+        self._retry_at = time.monotonic() + self._backoff * random.uniform(0.8, 1.2)
+
+    def ship(self, body: bytes, count: int):
+        """Push a batch, or spool it while Loki is unreachable or older batches are pending"""
+        if self._spool_bytes or time.monotonic() < self._retry_at:
+            self.to_spool(body, count)
+            return
+        try:
+            self.push(body, count)
+        except PushError as e:
+            if not e.retryable:
+                print(f"Error forwarding to Loki: {e}")
+                c_entries.labels(result="dropped").inc(count)
+                return
+            self._start_backoff()
+            self.to_spool(body, count)
+
+    def _spool_files(self) -> list:
+        # Names are <ns>-<entries>.json.gz, so sorting by name is oldest first
+        return sorted(self.spool.glob("*.json.gz"))
+
+    @staticmethod
+    def _spooled_count(path: Path) -> int:
+        return int(path.name.split("-", 1)[1].split(".", 1)[0])
+
+    def to_spool(self, body: bytes, count: int):
+        # Make room by dropping the oldest pushes first
+        for old in self._spool_files():
+            if self._spool_bytes + len(body) <= self.spool_max_bytes:
+                break
+            self._spool_bytes -= old.stat().st_size
+            c_entries.labels(result="dropped").inc(self._spooled_count(old))
+            old.unlink()
+
+        path = self.spool / f"{time.time_ns()}-{count}.json.gz"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path)
+        self._spool_bytes += len(body)
+        g_spool_bytes.set(self._spool_bytes)
+        c_entries.labels(result="spooled").inc(count)
+
+    def drain_spool(self):
+        """Replay spooled pushes oldest first once the backoff has expired"""
+        if not self._spool_bytes or time.monotonic() < self._retry_at:
+            return
+        for path in self._spool_files():
+            body = path.read_bytes()
+            try:
+                self.push(body, self._spooled_count(path))
+            except PushError as e:
+                if e.retryable:
+                    self._start_backoff()
+                    return
+                print(f"Error replaying spooled Loki push: {e}")
+                c_entries.labels(result="dropped").inc(self._spooled_count(path))
+            path.unlink()
+            self._spool_bytes -= len(body)
+            g_spool_bytes.set(self._spool_bytes)
+        self._spool_bytes = 0
+        g_spool_bytes.set(0)
+
+_forwarder = None
+
+def label_set(container: str, level: str, metadata: dict, source: str = "docker_logs") -> tuple:
+    """Loki stream labels: fixed low-cardinality ones plus configured metadata fields"""
+    labels = {"job": "opshub", "host": NODE_NAME, "container": container,
+              "level": level.lower(), "source": source}
+    for field in LOKI_LABEL_FIELDS:
+        if metadata.get(field) is not None:
+            labels[field] = str(metadata[field])
+    return tuple(sorted(labels.items()))
+
+def _logfmt(value) -> str:
+    value = str(value)
+    if not value or any(c in value for c in ' ="\\'):
+        return json.dumps(value)
+    return value
+
+def line_fields(line: str, metadata: dict) -> str:
+    """The line with the OPS_LOKI_LINE_FIELDS metadata appended as logfmt key=value pairs"""
+    pairs = [f"{field}={_logfmt(metadata[field])}" for field in LOKI_LINE_FIELDS
+             if field not in LOKI_LABEL_FIELDS and metadata.get(field) is not None]
+    return f"{line} {' '.join(pairs)}" if pairs else line
+
+def submit(container: str, level: str, line: str, ts_ns: int, metadata: dict, source: str = "docker_logs"):
+    """Forward an enriched line to Loki, if forwarding is enabled.
+
+    Metadata not used as labels goes into structured metadata when that is
+    enabled; otherwise the OPS_LOKI_LINE_FIELDS ones are appended to the line.
+    """
+    if _forwarder is None:
+        return
+    extra = None
+    if LOKI_STRUCTURED_METADATA:
+        extra = {k: str(v) for k, v in metadata.items() if k not in LOKI_LABEL_FIELDS and v is not None}
+    else:
+        line = line_fields(line, metadata)
+    _forwarder.submit(label_set(container, level, metadata, source), ts_ns, line, extra or None)
+
+def start():
+    """Start forwarding to OPS_LOKI_URL, if set"""
+    global _forwarder
+    if not LOKI_URL:
+        return
+    forwarder = LokiForwarder(LOKI_URL, LOKI_SPOOL_DIR, LOKI_TENANT or None, LOKI_BATCH_SIZE,
+                              LOKI_BATCH_BYTES, LOKI_BATCH_WAIT, LOKI_QUEUE_SIZE, LOKI_TIMEOUT,
+                              LOKI_SPOOL_MAX_BYTES)
+    g_queue_depth.set_function(forwarder.queue.qsize)
+    threading.Thread(target=forwarder.run, name="opshub-loki", daemon=True).start()
+    _forwarder = forwarder
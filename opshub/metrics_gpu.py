@@ -1,21 +1,35 @@
-import time, threading
+import threading
+from prometheus_client import Gauge
 from .database import store_performance_metric
+from .metrics_host import sample_ticks
+from . import alerts, tsdb
 
-try:
-    import pynvml
-    from prometheus_client import Gauge
-    pynvml.nvmlInit()
-    GPU_COUNT = pynvml.nvmlDeviceGetCount()
+g_gpu_util = Gauge("gpu_utilization_percent", "GPU util %", ["gpu"])
+g_gpu_mem = Gauge("gpu_mem_percent", "GPU memory %", ["gpu"])
+g_gpu_temp = Gauge("gpu_temperature_celsius", "GPU temperature °C", ["gpu"])
+g_gpu_power = Gauge("gpu_power_watts", "GPU power consumption W", ["gpu"])
+g_gpu_clock = Gauge("gpu_clock_mhz", "GPU clock speed MHz", ["gpu", "type"])
 
-    g_gpu_util = Gauge("gpu_utilization_percent", "GPU util %", ["gpu"])
-    g_gpu_mem = Gauge("gpu_mem_percent", "GPU memory %", ["gpu"])
-    g_gpu_temp = Gauge("gpu_temperature_celsius", "GPU temperature °C", ["gpu"])
-    g_gpu_power = Gauge("gpu_power_watts", "GPU power consumption W", ["gpu"])
-    g_gpu_clock = Gauge("gpu_clock_mhz", "GPU clock speed MHz", ["gpu", "type"])
-    
-except Exception as e:
-    print(f"GPU monitoring not available: {e}")
-    GPU_COUNT = 0
+# NVML is loaded on first use rather than at import; None until then
+pynvml = None
+GPU_COUNT = 0
+_nvml_lock = threading.Lock()
+
+def init_nvml() -> int:
+    """Load and initialise NVML once; returns the GPU count (0 when unavailable)"""
+    global pynvml, GPU_COUNT
+    with _nvml_lock:
+        if pynvml is None:
+            try:
+                import pynvml as nvml
+                nvml.nvmlInit()
+                GPU_COUNT = nvml.nvmlDeviceGetCount()
+                pynvml = nvml
+            except Exception as e:
+                print(f"GPU monitoring not available: {e}")
+                GPU_COUNT = 0
+                pynvml = False
+    return GPU_COUNT
 
 # Global storage for latest GPU metrics
 _latest_gpu_metrics = []
@@ -24,7 +38,7 @@ def collect():
     """Collect GPU metrics continuously"""
     global _latest_gpu_metrics
     
-    while True:
+    for now, store_rows in sample_ticks():
         try:
             gpu_data = []
             
@@ -80,14 +94,21 @@ def collect():
                 if memory_clock is not None:
                     g_gpu_clock.labels(gpu=str(idx), type="memory").set(memory_clock)
                 
-                # Store in database
-                store_performance_metric("gpu", f"gpu_{idx}_utilization", gpu_util, "percent")
-                store_performance_metric("gpu", f"gpu_{idx}_memory_percent", memory_percent, "percent")
-                store_performance_metric("gpu", f"gpu_{idx}_memory_used", memory_used_mb, "MB")
-                if temp is not None:
-                    store_performance_metric("gpu", f"gpu_{idx}_temperature", temp, "celsius")
-                if power is not None:
-                    store_performance_metric("gpu", f"gpu_{idx}_power", power, "watts")
+                # Store samples, and a row every PERFORMANCE_ROW_SECONDS
+                tsdb.record(f"gpu.{idx}.utilization", gpu_util, now)
+                tsdb.record(f"gpu.{idx}.memory_percent", memory_percent, now, 2)
+                tsdb.record(f"gpu.{idx}.memory_used_mb", memory_used_mb, now, 1)
+                tsdb.record(f"gpu.{idx}.temperature", temp, now)
+                tsdb.record(f"gpu.{idx}.power_watts", power, now, 1)
+                tsdb.record(f"gpu.{idx}.graphics_clock_mhz", graphics_clock, now)
+                if store_rows:
+                    store_performance_metric("gpu", f"gpu_{idx}_utilization", gpu_util, "percent")
+                    store_performance_metric("gpu", f"gpu_{idx}_memory_percent", memory_percent, "percent")
+                    store_performance_metric("gpu", f"gpu_{idx}_memory_used", memory_used_mb, "MB")
+                    if temp is not None:
+                        store_performance_metric("gpu", f"gpu_{idx}_temperature", temp, "celsius")
+                    if power is not None:
+                        store_performance_metric("gpu", f"gpu_{idx}_power", power, "watts")
                 
                 # Collect data for API
                 gpu_info = {
@@ -104,13 +125,12 @@ def collect():
                     "memory_clock": memory_clock
                 }
                 gpu_data.append(gpu_info)
+                alerts.observe("gpu", f"gpu_{idx}", gpu_info)
             
             _latest_gpu_metrics = gpu_data
             
         except Exception as e:
             print(f"Error collecting GPU metrics: {e}")
-        
-        time.sleep(5)
 
 def get_gpu_metrics():
     """Get latest GPU metrics"""
@@ -118,7 +138,7 @@ def get_gpu_metrics():
 
 def get_gpu_info():
     """Get static GPU information"""
-    if GPU_COUNT == 0:
+    if init_nvml() == 0:
         return []
     
     gpu_info = []
@@ -166,68 +186,9 @@ def get_gpu_info():
     
     return gpu_info
 
-def check_gpu_alerts():
-    """Check for GPU-related alerts"""
-    alerts = []
-    
-    for gpu in _latest_gpu_metrics:
-        gpu_idx = gpu["index"]
-        
-        # High utilization alert
-        if gpu["utilization"] > 95:
-            alerts.append({
-                "type": "gpu_high_utilization",
-                "severity": "warning",
-                "message": f"GPU {gpu_idx} utilization is {gpu['utilization']}%",
-                "gpu": gpu_idx,
-                "value": gpu["utilization"]
-            })
-        
-        # High memory usage alert
-        if gpu["memory_percent"] > 90:
-            alerts.append({
-                "type": "gpu_high_memory",
-                "severity": "warning", 
-                "message": f"GPU {gpu_idx} memory usage is {gpu['memory_percent']:.1f}%",
-                "gpu": gpu_idx,
-                "value": gpu["memory_percent"]
-            })
-        
-        # High temperature alert
-        if gpu["temperature"] and gpu["temperature"] > 80:
-            alerts.append({
-                "type": "gpu_high_temperature",
-                "severity": "critical" if gpu["temperature"] > 90 else "warning",
-                "message": f"GPU {gpu_idx} temperature is {gpu['temperature']}°C",
-                "gpu": gpu_idx,
-                "value": gpu["temperature"]
-            })
-    
-    return alerts
-
 def start():
     """Start GPU metrics collection"""
-    if GPU_COUNT:
+    if init_nvml():
         threading.Thread(target=collect, daemon=True).start()
-        threading.Thread(target=alert_monitor, daemon=True).start()
     else:
         print("No GPUs detected for monitoring")
-
-def alert_monitor():
-    """Monitor for GPU alerts"""
-    while True:
-        try:
-            alerts = check_gpu_alerts()
-            for alert in alerts:
-                from .database import create_alert
-                create_alert(
-                    alert_type=alert["type"],
-                    severity=alert["severity"], 
-                    message=alert["message"],
-                    container_name=f"gpu_{alert['gpu']}",
-                    metric_value=alert["value"]
-                )
-        except Exception as e:
-            print(f"Error in GPU alert monitor: {e}")
-        
-        time.sleep(60)  # Check every minute
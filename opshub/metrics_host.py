@@ -1,6 +1,9 @@
 import psutil, time, threading
 from prometheus_client import Gauge
+from .config import METRICS_SAMPLE_SECONDS, PERFORMANCE_ROW_SECONDS
 from .database import store_performance_metric
+from .processes import get_processes
+from . import alerts, tsdb
 
 g_cpu = Gauge("host_cpu_percent", "Host CPU utilisation %")
 g_mem = Gauge("host_mem_percent", "Host memory utilisation %")
@@ -12,26 +15,44 @@ g_network_tx = Gauge("host_network_tx_bytes", "Host network TX bytes", ["interfa
 # Global storage for latest metrics
 _latest_metrics = {}
 
+def sample_ticks():
+    """Yield (timestamp, store_rows) every METRICS_SAMPLE_SECONDS; store_rows once per PERFORMANCE_ROW_SECONDS"""
+    last_row = 0.0
+    next_tick = time.monotonic()
+    while True:
+        next_tick = max(next_tick + METRICS_SAMPLE_SECONDS, time.monotonic())
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+        now = time.time()
+        store_rows = PERFORMANCE_ROW_SECONDS > 0 and now - last_row >= PERFORMANCE_ROW_SECONDS
+        if store_rows:
+            last_row = now
+        yield now, store_rows
+
 def collect():
     """Collect system metrics continuously"""
-    while True:
+    psutil.cpu_percent(interval=None)  # starts the CPU counter; each later call covers the time since the last
+    for now, store_rows in sample_ticks():
         try:
             # CPU metrics
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = psutil.cpu_percent(interval=None)
             g_cpu.set(cpu_percent)
-            store_performance_metric("system", "cpu_percent", cpu_percent, "percent")
             
             # Memory metrics
             memory = psutil.virtual_memory()
             g_mem.set(memory.percent)
-            store_performance_metric("system", "memory_percent", memory.percent, "percent")
-            store_performance_metric("system", "memory_available", memory.available / (1024**3), "GB")
             
             # Disk metrics
             disk = psutil.disk_usage('/')
             disk_percent = (disk.used / disk.total) * 100
             g_disk.set(disk_percent)
-            store_performance_metric("system", "disk_percent", disk_percent, "percent")
+            
+            # (series, digits, metric_type, metric_name, value, unit) for tsdb and performance_metrics
+            samples = [
+                ("host.cpu_percent", 1, "system", "cpu_percent", cpu_percent, "percent"),
+                ("host.memory_percent", 1, "system", "memory_percent", memory.percent, "percent"),
+                ("host.memory_available_gb", 3, "system", "memory_available", memory.available / (1024**3), "GB"),
+                ("host.disk_percent", 2, "system", "disk_percent", disk_percent, "percent"),
+            ]
             
             # Load average
             if hasattr(psutil, 'getloadavg'):
@@ -39,17 +60,26 @@ def collect():
                 g_load.labels(interval="1m").set(load_1)
                 g_load.labels(interval="5m").set(load_5)
                 g_load.labels(interval="15m").set(load_15)
-                store_performance_metric("system", "load_avg_1m", load_1, "load")
-                store_performance_metric("system", "load_avg_5m", load_5, "load")
-                store_performance_metric("system", "load_avg_15m", load_15, "load")
+                samples += [
+                    ("host.load_1m", 2, "system", "load_avg_1m", load_1, "load"),
+                    ("host.load_5m", 2, "system", "load_avg_5m", load_5, "load"),
+                    ("host.load_15m", 2, "system", "load_avg_15m", load_15, "load"),
+                ]
             
             # Network metrics
             network = psutil.net_io_counters(pernic=True)
             for interface, stats in network.items():
                 g_network_rx.labels(interface=interface).set(stats.bytes_recv)
                 g_network_tx.labels(interface=interface).set(stats.bytes_sent)
-                store_performance_metric("network", f"{interface}_rx_bytes", stats.bytes_recv, "bytes")
-                store_performance_metric("network", f"{interface}_tx_bytes", stats.bytes_sent, "bytes")
+                samples += [
+                    (f"net.{interface}.rx_bytes", None, "network", f"{interface}_rx_bytes", stats.bytes_recv, "bytes"),
+                    (f"net.{interface}.tx_bytes", None, "network", f"{interface}_tx_bytes", stats.bytes_sent, "bytes"),
+                ]
+            
+            for series, digits, metric_type, metric_name, value, unit in samples:
+                tsdb.record(series, value, now, digits)
+                if store_rows:
+                    store_performance_metric(metric_type, metric_name, value, unit)
             
             # Update global metrics cache
             _latest_metrics.update({
@@ -70,34 +100,20 @@ def collect():
                     } for iface, stats in network.items()
                 }
             })
+            alerts.observe("host", "host", _latest_metrics)
             
         except Exception as e:
             print(f"Error collecting host metrics: {e}")
-        
-        time.sleep(5)
 
 def get_system_metrics():
     """Get latest system metrics"""
     return _latest_metrics.copy()
 
 def get_process_metrics():
-    """Get process-level metrics"""
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'memory_info']):
-        try:
-            pinfo = proc.info
-            if pinfo['cpu_percent'] > 1.0 or pinfo['memory_percent'] > 1.0:  # Only high-usage processes
-                processes.append({
-                    "pid": pinfo['pid'],
-                    "name": pinfo['name'],
-                    "cpu_percent": pinfo['cpu_percent'],
-                    "memory_percent": pinfo['memory_percent'],
-                    "memory_mb": pinfo['memory_info'].rss / (1024**2) if pinfo['memory_info'] else 0
-                })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-    
-    return sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)[:20]
+    """Get the busiest processes on the host and in containers, from the process sampler"""
+    rows = [{**row, "container": name}
+            for name, summary in get_processes(limit=20)["containers"].items() for row in summary["processes"]]
+    return sorted(rows, key=lambda x: x['cpu_percent'], reverse=True)[:20]
 
 def get_system_info():
     """Get static system information"""
@@ -0,0 +1,202 @@
+import re, threading, time
+from collections import defaultdict
+from prometheus_client.core import Metric, REGISTRY
+from .config import (MODEL_STATS_BUCKET_SECONDS, MODEL_STATS_FLUSH_SECONDS, MODEL_STATS_ACCURACY,
+                     MODEL_STATS_SUMMARY_SECONDS)
+from .database import merge_model_sketches, get_model_sketches
+from .sketches import DDSketch
+
+# Sketched per (bucket, model): request latency, output tokens per request, generation speed
+METRICS = ("latency_ms", "tokens", "tokens_per_s")
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Go durations as Ollama's request log prints them, e.g. "1m2.5s", "850.3ms", "45.2µs"
+_GO_DURATION = re.compile(r"([\d.]+)(ns|us|µs|ms|s|m|h)")
+_UNIT_MS = {"ns": 1e-6, "us": 1e-3, "µs": 1e-3, "ms": 1.0, "s": 1000.0, "m": 60000.0, "h": 3600000.0}
+
+_pending = {}
+# Recent sketches behind the Prometheus summaries' quantiles, never drained
+_recent = {}
+# Cumulative (count, sum) per (model, metric) for the summaries' _count and _sum
+_totals = defaultdict(lambda: [0, 0.0])
+# Model each container last named, for timing lines that do not repeat it
+_last_model = {}
+_lock = threading.Lock()
+
+def parse_duration_ms(value):
+    """Milliseconds from a Go duration string or a bare number of milliseconds"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    if not isinstance(value, str):
+        return None
+    parts = _GO_DURATION.findall(value)
+    if not parts or "".join(n + unit for n, unit in parts) != value.strip():
+        return None
+    try:
+        return sum(float(n) * _UNIT_MS[unit] for n, unit in parts)
+    except ValueError:
+        return None
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def record(model: str, metric: str, value: float, ts: float = None):
+    """Add one observation to the sketches for model"""
+    bucket = int((ts or time.time()) // MODEL_STATS_BUCKET_SECONDS) * MODEL_STATS_BUCKET_SECONDS
+    key = (bucket, model, metric)
+    with _lock:
+        for sketches in (_pending, _recent):
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = DDSketch(MODEL_STATS_ACCURACY)
+            sketch.add(value)
+        totals = _totals[(model, metric)]
+        totals[0] += 1
+        totals[1] += value
+
+def observe(container: str, metadata: dict, fields: dict = None, ts: float = None):
+    """Record the request figures a log line carries.
+
+    JSON lines count only when they name their model. Timing lines matched by
+    the extraction rules (duration, eval_ms, eval_tokens, tokens_per_s) are
+    attributed to the model the container last named, as Ollama's are.
+    """
+    model = metadata.get("model")
+    if model:
+        _last_model[container] = model
+    latency = tokens = rate = None
+    if fields is not None and model:
+        latency, tokens, rate = fields["latency_ms"], fields["tokens"], fields["tokens_per_s"]
+    if "duration" in metadata or "eval_ms" in metadata:
+        model = model or _last_model.get(container)
+        latency = parse_duration_ms(metadata.get("duration"))
+        tokens = _number(metadata.get("eval_tokens"))
+        rate = _number(metadata.get("tokens_per_s"))
+        eval_ms = _number(metadata.get("eval_ms"))
+        if rate is None and tokens and eval_ms:
+            rate = tokens / eval_ms * 1000.0
+    if not model:
+        return
+    for metric, value in (("latency_ms", latency), ("tokens", tokens), ("tokens_per_s", rate)):
+        if value is not None and value >= 0:
+            record(model, metric, value, ts)
+
+def _merge_blobs(old: bytes, new: bytes) -> bytes:
+    return DDSketch.from_bytes(old).merge(DDSketch.from_bytes(new)).to_bytes()
+
+def flush():
+    """Merge pending sketches into their stored buckets in one batch"""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    try:
+        merge_model_sketches({key: (sketch.count, sketch.to_bytes()) for key, sketch in pending.items()},
+                             _merge_blobs)
+    except Exception:
+        with _lock:
+            for key, sketch in pending.items():
+                if key in _pending:
+                    sketch.merge(_pending[key])
+                _pending[key] = sketch
+        raise
+
+def _prune_recent():
+    cutoff = time.time() - MODEL_STATS_SUMMARY_SECONDS - MODEL_STATS_BUCKET_SECONDS
+    with _lock:
+        for key in [k for k in _recent if k[0] < cutoff]:
+            del _recent[key]
+
+def get_latency(model: str = None, window_ms: int = 3600000, step_ms: int = None,
+                quantiles=QUANTILES) -> dict:
+    """Merged latency/token percentiles per model over a window, optionally as a series of step_ms buckets.
+
+    step_ms is rounded up to a whole number of sketch buckets.
+    """
+    now = time.time()
+    since = int((now - window_ms / 1000.0) // MODEL_STATS_BUCKET_SECONDS) * MODEL_STATS_BUCKET_SECONDS
+    step = None
+    if step_ms:
+        step = max(MODEL_STATS_BUCKET_SECONDS,
+                   -(-step_ms // 1000 // MODEL_STATS_BUCKET_SECONDS) * MODEL_STATS_BUCKET_SECONDS)
+
+    merged = {}
+    def fold(bucket, name, metric, sketch):
+        key = (name, metric, bucket // step * step if step else None)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+
+    for row in get_model_sketches(since, int(now), model):
+        fold(row["bucket"], row["model"], row["metric"], DDSketch.from_bytes(row["sketch"]))
+    # Fold in sketches that have not been flushed yet
+    with _lock:
+        pending = [(key, DDSketch(MODEL_STATS_ACCURACY).merge(sketch)) for key, sketch in _pending.items()]
+    for (bucket, name, metric), sketch in pending:
+        if bucket >= since and (not model or name == model):
+            fold(bucket, name, metric, sketch)
+
+    models = defaultdict(dict)
+    for (name, metric, bucket), sketch in sorted(merged.items(), key=lambda item: item[0][2] or 0):
+        summary = sketch.summary(quantiles)
+        if step:
+            models[name].setdefault(metric, []).append({"bucket": bucket, **summary})
+        else:
+            models[name][metric] = summary
+
+    result = {"window_ms": window_ms, "relative_accuracy": MODEL_STATS_ACCURACY,
+              "models": [{"model": name, **metrics} for name, metrics in sorted(models.items())]}
+    if step:
+        result["step_ms"] = step * 1000
+    return result
+
+class SummaryCollector:
+    """Per-model Prometheus summaries: cumulative _count/_sum, quantiles over the recent window"""
+
+    NAMES = {"latency_ms": ("opshub_model_latency_ms", "Model request latency in milliseconds"),
+             "tokens": ("opshub_model_output_tokens", "Output tokens per model request"),
+             "tokens_per_s": ("opshub_model_tokens_per_second", "Model generation speed in tokens per second")}
+
+    def collect(self):
+        cutoff = time.time() - MODEL_STATS_SUMMARY_SECONDS
+        with _lock:
+            totals = {key: tuple(value) for key, value in _totals.items()}
+            recent = {}
+            for (bucket, name, metric), sketch in _recent.items():
+                if bucket + MODEL_STATS_BUCKET_SECONDS > cutoff:
+                    recent.setdefault((name, metric), DDSketch(MODEL_STATS_ACCURACY)).merge(sketch)
+
+        for metric, (family, documentation) in self.NAMES.items():
+            summary = Metric(family, documentation, "summary")
+            for (name, key_metric), (count, total) in sorted(totals.items()):
+                if key_metric != metric:
+                    continue
+                sketch = recent.get((name, metric))
+                for q in QUANTILES:
+                    value = sketch.quantile(q) if sketch else None
+                    summary.add_sample(family, {"model": name, "quantile": str(q)},
+                                       value if value is not None else float("nan"))
+                summary.add_sample(f"{family}_count", {"model": name}, count)
+                summary.add_sample(f"{family}_sum", {"model": name}, total)
+            yield summary
+
+REGISTRY.register(SummaryCollector())
+
+def flush_worker():
+    """Background worker flushing model sketches"""
+    while True:
+        time.sleep(MODEL_STATS_FLUSH_SECONDS)
+        _prune_recent()
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error flushing model stats: {e}")
+
+def start():
+    """Start flushing model sketches"""
+    threading.Thread(target=flush_worker, daemon=True).start()
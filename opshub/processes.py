@@ -0,0 +1,169 @@
+import heapq, os, re, threading, time
+import psutil
+from .config import PROCESS_SAMPLE_SECONDS, PROCESS_SAMPLE_BUDGET, PROCESS_TOP_N
+
+# Container ids in /proc/<pid>/cgroup: .../docker/<id> (cgroup v1), .../docker-<id>.scope (v2 with systemd),
+# cri-containerd-<id>, crio-<id>, libpod-<id>, or a bare id under kubepods
+_CONTAINER_ID = re.compile(r"([0-9a-f]{64})")
+HOST = "host"
+CMDLINE_CHARS = 256
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+class _Tracked:
+    """A process followed across ticks: start time (which tells a reused PID apart), container,
+    CPU time at the last tick, and a psutil handle and command line once it makes a top list"""
+    __slots__ = ("start", "container_id", "cpu_total", "process", "cmdline")
+
+    def __init__(self, start: int, container_id: str):
+        self.start = start
+        self.container_id = container_id
+        self.cpu_total = None
+        self.process = None
+        self.cmdline = None
+
+def read_stat(pid: int):
+    """(name, CPU seconds, RSS bytes, start time in clock ticks after boot) from /proc/<pid>/stat"""
+    with open(f"{psutil.PROCFS_PATH}/{pid}/stat", "rb") as fh:
+        data = fh.read()
+    close = data.rindex(b")")  # the name may itself hold spaces and parentheses
+    fields = data[close + 2:].split()
+    return (data[data.index(b"(") + 1:close].decode(errors="replace"),
+            (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS, int(fields[21]) * _PAGE_SIZE, int(fields[19]))
+
+def container_id_of(pid: int) -> str:
+    """Docker container id a PID runs in, from its cgroup; None for host processes"""
+    try:
+        with open(f"{psutil.PROCFS_PATH}/{pid}/cgroup") as fh:
+            found = _CONTAINER_ID.findall(fh.read())
+    except OSError:
+        return None
+    return found[-1] if found else None
+
+# pid -> _Tracked; container id -> name; the latest per-container summary, replaced whole each tick
+_tracked = {}
+_names = {}
+_snapshot = {"timestamp": None, "interval_s": None, "sample_ms": None, "processes": 0, "containers": {}}
+_docker_client = None
+_names_listed = 0.0
+
+def _resolve_names(container_ids: set):
+    """Look up names for container ids not seen before, with one Docker API call at most every 10s"""
+    global _docker_client, _names_listed
+    if not container_ids - _names.keys() or time.monotonic() - _names_listed < 10:
+        return
+    _names_listed = time.monotonic()
+    try:
+        if _docker_client is None:
+            import docker
+            _docker_client = docker.from_env()
+        for container in _docker_client.containers.list(all=True):
+            _names[container.id] = container.name
+    except Exception as e:
+        print(f"Error listing containers for process attribution: {e}")
+
+def _row(cpu: float, rss: int, pid: int, name: str) -> dict:
+    return {"pid": pid, "name": name, "cpu_percent": round(cpu, 1), "memory_mb": round(rss / (1024**2), 1)}
+
+def sample(elapsed: float) -> dict:
+    """One tick: CPU % over the last elapsed seconds and RSS of every process, top N per container.
+
+    Each process costs one read of its stat file per tick; its cgroup file is
+    read once, when it is first seen. A PID whose start time changed was
+    reused by a new process and is looked up again.
+    """
+    started = time.perf_counter()
+    with open(f"{psutil.PROCFS_PATH}/uptime") as fh:
+        uptime = float(fh.read().split()[0])
+    pids = psutil.pids()
+    live = set(pids)
+    for pid in [pid for pid in _tracked if pid not in live]:
+        del _tracked[pid]
+
+    groups = {}
+    for pid in pids:
+        try:
+            name, total, rss, start = read_stat(pid)
+        except (OSError, ValueError, IndexError):
+            _tracked.pop(pid, None)  # exited since the listing
+            continue
+        tracked = _tracked.get(pid)
+        if tracked is None or tracked.start != start:
+            tracked = _tracked[pid] = _Tracked(start, container_id_of(pid))
+        if tracked.cpu_total is None:
+            # First sight: average since the process started, rather than 0
+            cpu = total / max(uptime - start / _CLOCK_TICKS, elapsed) * 100
+        else:
+            cpu = (total - tracked.cpu_total) / elapsed * 100
+        tracked.cpu_total = total
+        groups.setdefault(tracked.container_id, []).append((cpu, rss, pid, name))
+
+    _resolve_names({cid for cid in groups if cid})
+    containers = {}
+    for container_id, rows in groups.items():
+        key = _names.get(container_id, container_id[:12]) if container_id else HOST
+        by_cpu = heapq.nlargest(PROCESS_TOP_N, rows)
+        by_memory = heapq.nlargest(PROCESS_TOP_N, rows, key=lambda row: row[1])
+        containers[key] = {
+            "container_id": container_id,
+            "process_count": len(rows),
+            "cpu_percent": round(sum(row[0] for row in rows), 1),
+            "memory_mb": round(sum(row[1] for row in rows) / (1024**2), 1),
+            "top_cpu": [_row(*row) for row in by_cpu],
+            "top_memory": [_row(*row) for row in by_memory],
+        }
+    _add_cmdlines(containers)
+    return {"timestamp": time.time(), "interval_s": round(elapsed, 2),
+            "sample_ms": round((time.perf_counter() - started) * 1000, 1),
+            "processes": len(pids), "containers": containers}
+
+def _add_cmdlines(containers: dict):
+    """Command lines for processes that made a top list, read once per process"""
+    for summary in containers.values():
+        for row in summary["top_cpu"] + summary["top_memory"]:
+            tracked = _tracked.get(row["pid"])
+            if tracked is None:
+                continue
+            if tracked.cmdline is None:
+                try:
+                    tracked.process = tracked.process or psutil.Process(row["pid"])
+                    tracked.cmdline = " ".join(tracked.process.cmdline())[:CMDLINE_CHARS]
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    tracked.cmdline = ""
+            row["cmdline"] = tracked.cmdline
+
+def get_processes(container: str = None, limit: int = 10, sort: str = "cpu") -> dict:
+    """Top processes per container from the latest tick, sorted by cpu or memory.
+
+    container narrows it to one, by name or by id (12 characters or more).
+    """
+    snapshot = _snapshot
+    top = "top_memory" if sort == "memory" else "top_cpu"
+    containers = {
+        name: {**{k: v for k, v in summary.items() if not k.startswith("top_")},
+               "processes": summary[top][:limit]}
+        for name, summary in snapshot["containers"].items()
+        if container is None or name == container
+        or (len(container) >= 12 and (summary["container_id"] or "").startswith(container))
+    }
+    return {**{k: v for k, v in snapshot.items() if k != "containers"}, "containers": containers}
+
+def collect():
+    """Sample processes continuously; ticks are spaced so sampling stays under PROCESS_SAMPLE_BUDGET of a core"""
+    global _snapshot
+    last, interval = None, PROCESS_SAMPLE_SECONDS
+    while True:
+        try:
+            now = time.monotonic()
+            started = time.thread_time()
+            _snapshot = sample(now - last if last is not None else PROCESS_SAMPLE_SECONDS)
+            last = now
+            interval = max(PROCESS_SAMPLE_SECONDS, (time.thread_time() - started) / PROCESS_SAMPLE_BUDGET)
+        except Exception as e:
+            print(f"Error sampling processes: {e}")
+        time.sleep(interval)
+
+def start():
+    """Start process sampling"""
+    threading.Thread(target=collect, daemon=True).start()
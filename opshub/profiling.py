@@ -0,0 +1,172 @@
+import sys, threading, time, tracemalloc
+from collections import Counter
+from prometheus_client import Histogram
+
+h_stage = Histogram("opshub_stage_seconds", "Pipeline stage duration while spans are enabled", ["stage"],
+                    buckets=(1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1, 0.5, 1))
+
+# --- Sampling CPU profiler -------------------------------------------------
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", code.co_filename)
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """Sample every thread's Python stack for `seconds`; returns collapsed stack -> count"""
+    me = threading.get_ident()
+    names = {}
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        if len(names) != threading.active_count():
+            names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg collapsed format, ready for flamegraph.pl / speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+def top_functions(stacks: Counter, limit: int = 30) -> dict:
+    """Self and cumulative sample counts per function"""
+    own, total = Counter(), Counter()
+    samples = sum(stacks.values())
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return {
+        "samples": samples,
+        "self": [{"function": f, "samples": n, "percent": round(100 * n / samples, 1)}
+                 for f, n in own.most_common(limit)],
+        "cumulative": [{"function": f, "samples": n, "percent": round(100 * n / samples, 1)}
+                       for f, n in total.most_common(limit)],
+    }
+
+# --- Allocation tracing ----------------------------------------------------
+
+_last_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def memory_report(top: int = 20, frames: int = 1) -> dict:
+    """Top allocation sites, and the diff against the previous call's snapshot.
+
+    The first call starts tracemalloc (with `frames` of traceback) and
+    returns only its status; later calls compare against the previous one.
+    """
+    global _last_snapshot
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _last_snapshot = None
+            return {"tracing": True, "started": True}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            "tracing": True,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+        if _last_snapshot is not None:
+            report["diff"] = [
+                {"location": str(stat.traceback), "size_diff_bytes": stat.size_diff,
+                 "count_diff": stat.count_diff, "size_bytes": stat.size}
+                for stat in snapshot.compare_to(_last_snapshot, "lineno")[:top]
+            ]
+        _last_snapshot = snapshot
+        return report
+
+def stop_memory_tracing():
+    global _last_snapshot
+    with _snapshot_lock:
+        tracemalloc.stop()
+        _last_snapshot = None
+
+# --- Per-stage timing spans ------------------------------------------------
+
+_spans_enabled = False
+_span_stats = {}
+_span_lock = threading.Lock()
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_span(self.stage, time.perf_counter() - self.started)
+        return False
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(stage: str):
+    """Time a pipeline stage; a shared no-op unless spans are enabled"""
+    return _Span(stage) if _spans_enabled else _NO_SPAN
+
+def record_span(stage: str, seconds: float, count: int = 1):
+    """Record a stage duration measured elsewhere (e.g. one batch covering count lines)"""
+    if not _spans_enabled:
+        return
+    h_stage.labels(stage=stage).observe(seconds)
+    with _span_lock:
+        stats = _span_stats.get(stage)
+        if stats is None:
+            stats = _span_stats[stage] = {"calls": 0, "items": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+        stats["calls"] += 1
+        stats["items"] += count
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+def set_spans(enabled: bool, reset: bool = False):
+    global _spans_enabled
+    _spans_enabled = enabled
+    if reset:
+        with _span_lock:
+            _span_stats.clear()
+
+def span_report() -> dict:
+    with _span_lock:
+        stages = {
+            stage: {**stats,
+                    "mean_us": round(stats["total_seconds"] / stats["calls"] * 1e6, 2),
+                    "max_us": round(stats["max_seconds"] * 1e6, 2)}
+            for stage, stats in _span_stats.items()
+        }
+    return {"enabled": _spans_enabled, "stages": stages}
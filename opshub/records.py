@@ -0,0 +1,83 @@
+import json, sys
+from datetime import datetime
+from operator import itemgetter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_intern = sys.intern
+_new = tuple.__new__
+
+# Insert column order of the logs table; id last, so it can stay None until the row is read back
+FIELDS = ("timestamp", "container_name", "container_id", "level", "message", "raw_log", "source",
+          "template_id", "template_vars", "http_status", "latency_ms", "path", "username", "model", "id")
+COLUMNS = ", ".join(FIELDS)
+# Left out of API output when None
+_OPTIONAL = frozenset(("raw_log", "template_id", "template_vars", "http_status", "latency_ms", "path",
+                       "username", "model"))
+
+class LogRecord(tuple):
+    """One log line from the tailer through the sinks and storage to API output.
+
+    A plain tuple in logs-table column order, so batches go straight to
+    executemany and rows come straight back from the cursor. The container
+    name and id, level and source are interned: the many records that share
+    them hold one copy of each.
+    """
+    __slots__ = ()
+
+    def __new__(cls, timestamp: str, container_name: str, container_id: str, level: str, message: str,
+                raw_log: str = None, source: str = None, template_id: int = None, template_vars: str = None,
+                http_status: int = None, latency_ms: float = None, path: str = None, username: str = None,
+                model: str = None, id: int = None):
+        return _new(cls, (timestamp, _intern(container_name), _intern(container_id), _intern(level), message,
+                          raw_log, source and _intern(source), template_id, template_vars, http_status,
+                          latency_ms, path, username, model, id))
+
+    @classmethod
+    def from_row(cls, cursor, row: tuple) -> "LogRecord":
+        """sqlite3 row_factory for SELECT {COLUMNS} FROM logs"""
+        return _new(cls, (row[0], _intern(row[1]), _intern(row[2]), _intern(row[3]), row[4], row[5],
+                          row[6] and _intern(row[6]), *row[7:]))
+
+    @property
+    def line(self) -> str:
+        """The line as it was logged"""
+        return self[5] if self[5] is not None else self[4]
+
+    def as_dict(self, epoch: bool = False) -> dict:
+        """API form: every field that is set; raw_log only when it differs from message.
+
+        With epoch, adds ts: the timestamp as UTC epoch seconds. Stored
+        timestamps are naive local time, so only this host can convert them.
+        """
+        row = {name: value for name, value in zip(FIELDS, self) if value is not None or name not in _OPTIONAL}
+        if epoch:
+            row["ts"] = datetime.fromisoformat(self[0]).timestamp()
+        return row
+
+    def to_json(self, epoch: bool = False) -> str:
+        row = self.as_dict(epoch)
+        return orjson.dumps(row).decode() if orjson else json.dumps(row)
+
+    def __repr__(self):
+        return f"LogRecord({', '.join(f'{name}={value!r}' for name, value in zip(FIELDS, self))})"
+
+for _index, _name in enumerate(FIELDS):
+    setattr(LogRecord, _name, property(itemgetter(_index)))
+
+def to_jsonable(record, epoch: bool = False):
+    """A record as json.dumps takes it; dicts pass through"""
+    return record.as_dict(epoch) if type(record) is LogRecord else record
+
+def dumps(record, epoch: bool = False) -> str:
+    """JSON text for a LogRecord or a plain dict"""
+    if type(record) is LogRecord:
+        return record.to_json(epoch)
+    return json.dumps(record)
+
+def json_array(records) -> str:
+    """JSON array text for records, encoded one at a time"""
+    return "[" + ",".join(map(dumps, records)) + "]"
@@ -1,84 +1,166 @@
-from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi import FastAPI, Query, HTTPException, Header, Depends, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse, Response
 from prometheus_client import generate_latest
 import uvicorn
-import json
 import asyncio
 from datetime import datetime, timedelta
 from typing import List, Optional
-import docker
-import psutil
-import sqlite3
 import os
+import hmac
+import threading
 from contextlib import asynccontextmanager
 
 from .logging_pipeline import start as start_logs, get_logs
 from .metrics_host import start as start_metrics_host, get_system_metrics
 from .metrics_gpu import start as start_metrics_gpu, get_gpu_metrics
-from .database import init_db, store_user_session, get_user_sessions, store_log_entry
+from .alerts import start as start_alerts
+from .tsdb import start as start_tsdb
+from .processes import start as start_processes, get_processes
+from .database import (init_db, store_user_session, get_user_sessions, store_log_entry, get_alerts,
+                       search_logs as search_logs_db, get_latency_by_path, QueryBudget)
+from .log_patterns import top_patterns
+from .live import broadcaster
+from .log_stats import get_stats as get_log_stats
+from .model_stats import get_latency as get_model_latency_stats
+from .user_stats import get_unique_users, record as record_user
+from .config import DEBUG_TOKEN, TSDB_RETENTION_DAYS, PROCESS_TOP_N, EXPORT_TIMEOUT
+from . import profiling, federation, export, ingest, records, db_executor, tsdb
+
+# Workers start after the server is accepting requests; /health reports progress
+_startup = {"state": "starting", "failed": []}
+
+def start_workers():
+    """Start log tailing, collectors and the alert engine, one at a time"""
+    for name, start in (("logs", start_logs), ("host_metrics", start_metrics_host),
+                        ("gpu_metrics", start_metrics_gpu), ("tsdb", start_tsdb), ("processes", start_processes),
+                        ("alerts", start_alerts)):
+        try:
+            start()
+        except Exception as e:
+            print(f"Error starting {name}: {e}")
+            _startup["failed"].append(name)
+    _startup["state"] = "running"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_db()
-    start_logs()
-    start_metrics_host() 
-    start_metrics_gpu()
+    threading.Thread(target=start_workers, name="opshub-startup", daemon=True).start()
     yield
     # Shutdown
     pass
 
 app = FastAPI(title="OpsHub - Docker Logger & Monitor", lifespan=lifespan)
-docker_client = docker.from_env()
+
+_docker_client = None
+_docker_lock = threading.Lock()
+
+def get_docker_client():
+    """Docker client created on first use, so the server starts without the socket"""
+    global _docker_client
+    with _docker_lock:
+        if _docker_client is None:
+            import docker
+            _docker_client = docker.from_env()
+        return _docker_client
+
+async def run_query(fn, *args, error: str, **kwargs):
+    """Await a blocking database call on the DB pool; busy is 503, timed out 504, a failure 500"""
+    try:
+        return await db_executor.run(fn, *args, **kwargs)
+    except db_executor.DatabaseBusy:
+        raise HTTPException(status_code=503, detail="Database busy", headers={"Retry-After": "1"})
+    except db_executor.QueryTimeout:
+        raise HTTPException(status_code=504, detail=f"{error}: query timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{error}: {e}")
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+async def health():
+    return {"status": "ok", "timestamp": datetime.now().isoformat(),
+            "workers": _startup["state"], "failed": _startup["failed"]}
 
 @app.get("/metrics")
-def metrics():
+async def metrics():
     return PlainTextResponse(generate_latest().decode())
 
+@app.get("/logs/patterns")
+async def get_log_patterns(
+    container: Optional[str] = None,
+    level: str = Query("all", regex="^(all|info|warning|error|success|critical)$"),
+    window_ms: int = Query(3600000, ge=1),
+    limit: int = Query(20, ge=1, le=1000)
+):
+    """Get the most frequent log templates over a time window"""
+    patterns = await run_query(top_patterns, container, level, window_ms, limit,
+                               error="Error getting log patterns")
+    return {"patterns": patterns, "window_ms": window_ms}
+
+@app.get("/logs/stats")
+async def get_log_volume_stats(
+    container: Optional[str] = None,
+    level: str = Query("all", regex="^(all|info|warning|error|success|critical)$"),
+    window_ms: int = Query(3600000, ge=1),
+    step_ms: int = Query(60000, ge=60000)
+):
+    """Get time-bucketed log line counts per container and level"""
+    return await run_query(get_log_stats, container, level, window_ms, step_ms, error="Error getting log stats")
+
+@app.get("/logs/latency")
+async def get_log_latency(
+    container: Optional[str] = None,
+    window_ms: int = Query(3600000, ge=1),
+    min_count: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=1000)
+):
+    """Get latency percentiles per path from structured (JSON) log lines"""
+    since = (datetime.now() - timedelta(milliseconds=window_ms)).isoformat()
+    paths = await run_query(get_latency_by_path, since, container, min_count, limit,
+                            error="Error getting log latency")
+    return {"paths": paths, "window_ms": window_ms}
+
 @app.get("/logs/{container}")
 async def get_container_logs(
     container: str,
     level: str = Query("all", regex="^(all|info|warning|error|success|critical)$"),
     tail: int = Query(100, ge=1, le=10000),
-    follow: bool = Query(False)
+    follow: bool = Query(False),
+    format: str = Query("json", regex="^(json|ndjson)$")
 ):
     """Get logs for a specific container or 'all' containers"""
-    try:
-        if follow:
-            return StreamingResponse(
-                stream_logs(container, level, tail),
-                media_type="application/x-ndjson"
-            )
-        else:
-            logs = get_logs(container, level, tail)
-            return {"logs": logs}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    # The initial read happens here, so a busy or timed-out database is an error status, not a cut stream
+    logs = await run_query(get_logs, container, level, tail, error="Error getting logs")
+    if follow:
+        return StreamingResponse(
+            stream_logs(container, level, logs),
+            media_type="application/x-ndjson"
+        )
+    if format == "ndjson":
+        return StreamingResponse(federation.ndjson(logs), media_type="application/x-ndjson")
+    return Response(f'{{"logs": {records.json_array(logs)}}}', media_type="application/json")
 
-async def stream_logs(container: str, level: str, tail: int):
+async def stream_logs(container: str, level: str, initial_logs: list):
     """Stream logs in real-time"""
-    # Get initial logs
-    initial_logs = get_logs(container, level, tail)
     for log in initial_logs:
-        yield f"{json.dumps(log)}\n"
+        yield f"{log.to_json()}\n"
     
-    # Stream new logs
+    # Stream new logs; a poll that times out or finds the pool busy is skipped
     while True:
         await asyncio.sleep(1)
-        new_logs = get_logs(container, level, 10, since=datetime.now() - timedelta(seconds=1))
+        try:
+            new_logs = await db_executor.run(get_logs, container, level, 10,
+                                             since=datetime.now() - timedelta(seconds=1))
+        except (db_executor.DatabaseBusy, db_executor.QueryTimeout):
+            continue
         for log in new_logs:
-            yield f"{json.dumps(log)}\n"
+            yield f"{log.to_json()}\n"
 
 @app.get("/containers/status")
 def get_containers_status():
     """Get status of all containers"""
     containers = []
     try:
-        for container in docker_client.containers.list(all=True):
+        for container in get_docker_client().containers.list(all=True):
             stats = None
             if container.status == 'running':
                 try:
@@ -111,22 +193,68 @@ def get_containers_status():
     return containers
 
 @app.get("/users/sessions")
-def get_openwebui_sessions():
-    """Get OpenWebUI user sessions and activity"""
-    try:
-        sessions = get_user_sessions()
-        return sessions
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error getting user sessions: {e}")
+async def get_openwebui_sessions(
+    active_only: bool = Query(False),
+    hours: Optional[int] = Query(None, ge=1)
+):
+    """Get OpenWebUI user sessions and activity: events of the last hours (default 24), or with
+    active_only the sessions active now, only those started in the last hours when given"""
+    return await run_query(get_user_sessions, active_only=active_only, hours=hours,
+                           error="Error getting user sessions")
+
+@app.get("/models/latency")
+async def get_model_latency(
+    model: Optional[str] = None,
+    window_ms: int = Query(3600000, ge=1),
+    step_ms: Optional[int] = Query(None, ge=60000),
+    quantiles: str = Query("0.5,0.95,0.99", regex=r"^(0?\.\d+|1(\.0+)?|0)(,(0?\.\d+|1(\.0+)?|0))*$")
+):
+    """Get request latency, output tokens and tokens/s percentiles per model, merged from sketches"""
+    points = tuple(float(q) for q in quantiles.split(","))
+    return await run_query(get_model_latency_stats, model, window_ms, step_ms, points,
+                           error="Error getting model latency")
+
+@app.get("/users/stats")
+async def get_user_stats(
+    model: Optional[str] = None,
+    window_ms: int = Query(30 * 86400000, ge=1),
+    step_ms: int = Query(3600000, ge=3600000)
+):
+    """Get approximate distinct users per model and overall, in total and per time step"""
+    return await run_query(get_unique_users, model, window_ms, step_ms, error="Error getting user stats")
 
 @app.post("/users/session")
-def track_user_session(username: str, model: str, action: str):
+async def track_user_session(username: str, model: str, action: str):
     """Track user session activity"""
+    await run_query(store_user_session, username, model, action, error="Error tracking session")
+    record_user(username, model)
+    return {"status": "recorded"}
+
+async def _ingest(request: Request, response: Response, handler, *args):
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > ingest.INGEST_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Batch too large")
+    body = await request.body()
     try:
-        store_user_session(username, model, action)
-        return {"status": "recorded"}
+        result = await asyncio.to_thread(handler, body, request.headers.get("content-encoding"), *args)
+    except ingest.IngestError as e:
+        headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+        raise HTTPException(status_code=e.status, detail=e.detail, headers=headers)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error tracking session: {e}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting batch: {e}")
+    if result["accepted"] and not result["written"]:
+        response.status_code = 202  # queued, not yet confirmed written
+    return result
+
+@app.post("/ingest/logs")
+async def ingest_logs(request: Request, response: Response, wait: bool = True):
+    """Ingest an NDJSON batch (optionally gzip'd) of {container, message, timestamp?, level?} records"""
+    return await _ingest(request, response, ingest.ingest_logs, wait)
+
+@app.post("/ingest/sessions")
+async def ingest_sessions(request: Request, response: Response):
+    """Ingest an NDJSON batch (optionally gzip'd) of {username, action, model?, session_id?, ...} events"""
+    return await _ingest(request, response, ingest.ingest_sessions)
 
 @app.get("/metrics/performance")
 def get_performance_metrics():
@@ -146,22 +274,259 @@ def get_performance_metrics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting performance metrics: {e}")
 
+@app.get("/processes")
+def get_top_processes(
+    container: Optional[str] = Query(None, description="Container name or id; 'host' for processes outside containers"),
+    limit: int = Query(10, ge=1, le=PROCESS_TOP_N),
+    sort: str = Query("cpu", regex="^(cpu|memory)$")
+):
+    """Top processes per container by CPU or memory, from the background process sampler"""
+    return get_processes(container, limit, sort)
+
+@app.get("/metrics/performance/history")
+async def get_performance_history(
+    series: str = Query("host.*,gpu.*", description="Comma-separated series names or patterns, e.g. net.eth0.*"),
+    window_ms: int = Query(3600000, ge=1000, le=TSDB_RETENTION_DAYS * 86400000),
+    step_ms: Optional[int] = Query(None, ge=1000)
+):
+    """Host and GPU sample history: [timestamp, avg, min, max] per step for each series"""
+    patterns = [pattern.strip() for pattern in series.split(",") if pattern.strip()]
+    return await run_query(tsdb.history, patterns, window_ms, step_ms,
+                           error="Error getting performance history")
+
+@app.get("/alerts")
+async def list_alerts(
+    severity: Optional[str] = Query(None, regex="^(warning|critical)$"),
+    resolved: Optional[bool] = None,
+    hours: int = Query(24, ge=1)
+):
+    """Get alert history"""
+    return await run_query(get_alerts, severity, resolved, hours, error="Error getting alerts")
+
+@app.get("/stream/monitor")
+async def stream_monitor(interval: float = Query(1.0, ge=0.1, le=3600)):
+    """Server-sent live monitor feed: one full snapshot, then deltas every interval seconds
+    (keys that went away are listed under "__deleted__")"""
+    return StreamingResponse(
+        broadcaster.sse(interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+def require_debug_token(x_debug_token: Optional[str] = Header(None), token: Optional[str] = None):
+    """Guard for /debug: hidden unless OPS_DEBUG_TOKEN is set, then the token must match"""
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = x_debug_token or token or ""
+    if not hmac.compare_digest(supplied.encode(), DEBUG_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+@app.get("/debug/profile", dependencies=[Depends(require_debug_token)])
+def debug_profile(
+    seconds: float = Query(5, gt=0, le=120),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: str = Query("collapsed", regex="^(collapsed|json)$"),
+    limit: int = Query(30, ge=1, le=1000)
+):
+    """Sample every thread's stack for a while: collapsed stacks (flame graph input) or a top list"""
+    try:
+        stacks = profiling.sample_stacks(seconds, interval_ms / 1000)
+        if format == "json":
+            return profiling.top_functions(stacks, limit)
+        return PlainTextResponse(profiling.collapsed(stacks))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error profiling: {e}")
+
+@app.get("/debug/memory", dependencies=[Depends(require_debug_token)])
+def debug_memory(
+    top: int = Query(20, ge=1, le=500),
+    frames: int = Query(1, ge=1, le=50),
+    stop: bool = False
+):
+    """Top allocation sites and the diff since the previous call (the first call starts tracing)"""
+    try:
+        if stop:
+            profiling.stop_memory_tracing()
+            return {"tracing": False}
+        return profiling.memory_report(top, frames)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tracing memory: {e}")
+
+@app.get("/debug/spans", dependencies=[Depends(require_debug_token)])
+def debug_spans():
+    """Per-stage pipeline timings collected while spans are enabled"""
+    return profiling.span_report()
+
+@app.post("/debug/spans", dependencies=[Depends(require_debug_token)])
+def debug_set_spans(enabled: bool, reset: bool = False):
+    """Switch per-stage pipeline timing on or off at runtime"""
+    profiling.set_spans(enabled, reset)
+    return profiling.span_report()
+
 @app.get("/search/logs")
-def search_logs(
+async def search_logs(
     query: str,
     container: Optional[str] = None,
     level: Optional[str] = None,
     start_time: Optional[str] = None,
     end_time: Optional[str] = None,
-    limit: int = Query(1000, ge=1, le=10000)
+    limit: int = Query(1000, ge=1, le=10000),
+    format: str = Query("json", regex="^(json|ndjson)$")
 ):
     """Search logs with filters"""
+    results = await run_query(search_logs_db, query, container, level, start_time, end_time, limit,
+                              error="Error searching logs")
+    if format == "ndjson":
+        return StreamingResponse(federation.ndjson(results), media_type="application/x-ndjson")
+    return Response(f'{{"results": {records.json_array(results)}, "count": {len(results)}}}',
+                    media_type="application/json")
+
+async def _export_chunks(chunks, first: bytes, budget):
+    """Stream an export, pulling each further chunk on the DB pool under the export's budget.
+
+    A busy pool makes the export wait its turn rather than fail; a client that
+    goes away cancels the budget, interrupting the read in progress.
+    """
+    try:
+        chunk = first
+        while chunk is not None:
+            yield chunk
+            while True:
+                try:
+                    chunk = await db_executor.run(next, chunks, None, timeout=EXPORT_TIMEOUT, budget=budget)
+                    break
+                except db_executor.DatabaseBusy:
+                    await asyncio.sleep(1)
+    finally:
+        budget.cancel()
+        try:
+            chunks.close()
+        except ValueError:
+            pass  # a pull is still running; the cancelled budget ends it and its connection
+
+async def _export_response(kind: str, fmt: str, compression: str, start: Optional[str], end: Optional[str],
+                           after_id: int, filters: dict, batch_size: int):
+    try:
+        chunks = export.export_stream(kind, fmt, compression, start, end, after_id, filters, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    budget = QueryBudget(EXPORT_TIMEOUT)
+    # The first pull answers errors with a status rather than a cut-off download
+    try:
+        first = await run_query(next, chunks, None, timeout=EXPORT_TIMEOUT, budget=budget,
+                                error=f"Error exporting {kind}")
+    except BaseException:
+        budget.cancel()
+        raise
+    media_type = "application/vnd.apache.parquet" if fmt == "parquet" else {
+        "gzip": "application/gzip", "zstd": "application/zstd", "none": "application/x-ndjson"}[compression]
+    filename = f"opshub-{kind}{export.file_suffix(fmt, compression)}"
+    return StreamingResponse(_export_chunks(chunks, first, budget), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/export/logs")
+async def export_logs(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after_id: int = Query(0, ge=0),
+    container: Optional[str] = None,
+    level: Optional[str] = Query(None, regex="^(info|warning|error|success|critical)$"),
+    format: str = Query("ndjson", regex="^(ndjson|parquet)$"),
+    compression: str = Query("gzip", regex="^(gzip|zstd|none)$"),
+    batch_size: int = Query(5000, ge=100, le=100000)
+):
+    """Stream logs in [start, end) (UTC unless an offset is given) from one snapshot; resume with
+    after_id = last id received"""
+    filters = {"container_name": container, "level": level.upper() if level else None}
+    return await _export_response("logs", format, compression, start, end, after_id, filters, batch_size)
+
+@app.get("/export/metrics")
+async def export_metrics(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    after_id: int = Query(0, ge=0),
+    metric_type: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    container: Optional[str] = None,
+    format: str = Query("ndjson", regex="^(ndjson|parquet)$"),
+    compression: str = Query("gzip", regex="^(gzip|zstd|none)$"),
+    batch_size: int = Query(5000, ge=100, le=100000)
+):
+    """Stream performance metrics in [start, end) (UTC unless an offset is given) from one snapshot;
+    resume with after_id = last id received"""
+    filters = {"metric_type": metric_type, "metric_name": metric_name, "container_name": container}
+    return await _export_response("metrics", format, compression, start, end, after_id, filters, batch_size)
+
+@app.get("/federation/peers")
+def list_federation_peers():
+    """This node and the peers federated queries fan out to"""
+    return federation.peers()
+
+async def _local_rows(fn, *args):
+    """This node's part of a federated log query, on the DB pool with a query budget like any
+    read; a failure is returned in place of the rows, to be reported as this host's error"""
     try:
-        # Implementation for log search
-        results = search_logs_db(query, container, level, start_time, end_time, limit)
-        return {"results": results, "count": len(results)}
+        return await db_executor.run(fn, *args)
+    except db_executor.DatabaseBusy:
+        return RuntimeError("Database busy")
+    except db_executor.QueryTimeout:
+        return RuntimeError("query timed out")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error searching logs: {e}")
+        return e
+
+async def _federated_logs(path: str, params: dict, local, limit: int):
+    """Ask the peers first, read this node's rows meanwhile, and stream the merge"""
+    streams = federation.open_log_streams(path, params)
+    try:
+        rows = await _local_rows(*local)
+    except BaseException:
+        federation.close_log_streams(streams)
+        raise
+    records = federation.merge_logs(streams, rows, limit)
+    return StreamingResponse(federation.ndjson(records), media_type="application/x-ndjson")
+
+@app.get("/federation/logs/{container}")
+async def get_federated_logs(
+    container: str,
+    level: str = Query("all", regex="^(all|info|warning|error|success|critical)$"),
+    tail: int = Query(100, ge=1, le=10000)
+):
+    """Newest logs across all hosts as host-labelled NDJSON, merged by timestamp"""
+    return await _federated_logs(f"/logs/{container}", {"level": level, "tail": tail},
+                                 (get_logs, container, level, tail), tail)
+
+@app.get("/federation/search/logs")
+async def search_federated_logs(
+    query: str,
+    container: Optional[str] = None,
+    level: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Search logs on all hosts; host-labelled NDJSON merged by timestamp"""
+    params = {"query": query, "container": container, "level": level,
+              "start_time": start_time, "end_time": end_time, "limit": limit}
+    return await _federated_logs("/search/logs", {k: v for k, v in params.items() if v is not None},
+                                 (search_logs_db, query, container, level, start_time, end_time, limit), limit)
+
+@app.get("/federation/containers/status")
+def get_federated_containers_status():
+    """Container status from all hosts"""
+    results = federation.gather("/containers/status", local=get_containers_status)
+    return {
+        "hosts": [{k: v for k, v in r.items() if k != "data"} for r in results],
+        "containers": [{**c, "host": r["host"]} for r in results if r["ok"] for c in r["data"]],
+    }
+
+@app.get("/federation/metrics/performance")
+def get_federated_performance_metrics():
+    """Performance metrics from all hosts"""
+    results = federation.gather("/metrics/performance", local=get_performance_metrics)
+    return {
+        "hosts": [{k: v for k, v in r.items() if k != "data"} for r in results],
+        "metrics": [{**r["data"], "host": r["host"]} for r in results if r["ok"]],
+    }
 
 def calculate_cpu_percent(stats):
     """Calculate CPU percentage from Docker stats"""
@@ -210,10 +575,5 @@ def calculate_uptime(started_at):
     except:
         return "N/A"
 
-def search_logs_db(query, container, level, start_time, end_time, limit):
-    """Search logs in database"""
-    # Placeholder - implement actual database search
-    return []
-
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8089)
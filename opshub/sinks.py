@@ -0,0 +1,118 @@
+import queue, threading, time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge
+from .profiling import record_span
+
+c_sink_records = Counter("opshub_sink_records_total", "Records handled by each output sink", ["sink", "result"])
+g_sink_queue = Gauge("opshub_sink_queue_depth", "Records waiting in each output sink's queue", ["sink"])
+g_sink_lag = Gauge("opshub_sink_lag_seconds", "Age of the oldest record an output sink has not finished", ["sink"])
+
+class Sink:
+    """An output stage fed by the pipeline, with its own queue, batching and worker thread.
+
+    handler(items) is called with up to batch_size items, gathered for at most
+    flush_seconds once the first arrives. A full queue drops new items
+    (counted), unless block is set, in which case producers wait: use that for
+    sinks that must not lose records. Room in the queue can be reserved ahead
+    of a burst of puts (see reserve).
+    """
+
+    def __init__(self, name: str, handler, batch_size: int = 500, flush_seconds: float = 0.5,
+                 queue_size: int = 10000, block: bool = False, enabled: bool = True):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.block = block
+        self.enabled = enabled
+        # Bounded by _slots rather than maxsize, so room can be reserved ahead of puts
+        self.queue_size = queue_size
+        self.queue = queue.Queue()
+        self._slots = threading.Semaphore(queue_size)
+        self._local = threading.local()
+        self._busy_since = None
+        self._thread = None
+        g_sink_queue.labels(name).set_function(self.queue.qsize)
+        g_sink_lag.labels(name).set_function(self.lag)
+
+    def put(self, item) -> bool:
+        """Queue an item; False if the sink is disabled or dropped it"""
+        if not self.enabled:
+            return False
+        reserved = getattr(self._local, "reserved", 0)
+        if reserved:
+            self._local.reserved = reserved - 1
+        elif not self._slots.acquire(blocking=self.block):
+            c_sink_records.labels(self.name, "dropped").inc()
+            return False
+        self.queue.put((time.monotonic(), item))
+        return True
+
+    @contextmanager
+    def reserve(self, count: int):
+        """Hold room for count items, all or none, for this thread's puts inside the block.
+
+        Yields False, holding nothing, when the queue cannot take them all
+        now; it never waits. Room left unused is given back on exit.
+        """
+        if not self.enabled:
+            yield True
+            return
+        taken = 0
+        while taken < count and self._slots.acquire(blocking=False):
+            taken += 1
+        if taken < count:
+            if taken:
+                self._slots.release(taken)
+            yield False
+            return
+        self._local.reserved = count
+        try:
+            yield True
+        finally:
+            if self._local.reserved:
+                self._slots.release(self._local.reserved)
+            self._local.reserved = 0
+
+    def lag(self) -> float:
+        busy_since = self._busy_since
+        if busy_since is None:
+            with self.queue.mutex:
+                busy_since = self.queue.queue[0][0] if self.queue.queue else None
+        return time.monotonic() - busy_since if busy_since is not None else 0.0
+
+    def _next_batch(self) -> list:
+        first = self.queue.get()
+        self._slots.release()
+        self._busy_since = first[0]
+        batch = [first[1]]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self._slots.release()
+            batch.append(item[1])
+        return batch
+
+    def run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                self.handler(batch)
+                c_sink_records.labels(self.name, "written").inc(len(batch))
+            except Exception as e:
+                c_sink_records.labels(self.name, "failed").inc(len(batch))
+                print(f"Error in {self.name} sink: {e}")
+            finally:
+                self._busy_since = None
+            record_span(f"sink.{self.name}", time.perf_counter() - started, len(batch))
+
+    def start(self):
+        """Start the worker thread once; a disabled sink starts nothing"""
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self.run, name=f"opshub-sink-{self.name}", daemon=True)
+            self._thread.start()
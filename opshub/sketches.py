@@ -0,0 +1,206 @@
+import hashlib, math, struct, sys
+from array import array
+
+def _put_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _get_varint(data: bytes, pos: int):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+class DDSketch:
+    """Mergeable quantile sketch (DDSketch) for non-negative values.
+
+    Any quantile it returns is within relative_accuracy of the true value; its
+    size grows with the log of the value range, not with the number of values.
+    """
+    __slots__ = ("relative_accuracy", "_multiplier", "_gamma", "bins", "zero", "count", "sum", "min", "max")
+
+    VERSION = 1
+    MIN_VALUE = 1e-9
+    _HEADER = struct.Struct("<BdQddd")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / math.log(self._gamma)
+        self.bins = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, n: int = 1):
+        if value > self.MIN_VALUE:
+            index = math.ceil(math.log(value) * self._multiplier)
+            self.bins[index] = self.bins.get(index, 0) + n
+        else:
+            value = max(value, 0.0)
+            self.zero += n
+        self.count += n
+        self.sum += value * n
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "DDSketch"):
+        """Fold other into this sketch; both must have the same accuracy"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        bins = self.bins
+        for index, n in other.bins.items():
+            bins[index] = bins.get(index, 0) + n
+        self.zero += other.zero
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float):
+        """Estimated q-quantile (0 <= q <= 1), or None for an empty sketch"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_bytes(self) -> bytes:
+        """Compact encoding: fixed header, then delta-coded bin indexes and counts as varints"""
+        out = bytearray(self._HEADER.pack(self.VERSION, self.relative_accuracy, self.zero,
+                                          self.sum, self.min, self.max))
+        _put_varint(out, len(self.bins))
+        previous = 0
+        for index in sorted(self.bins):
+            delta = index - previous
+            _put_varint(out, delta * 2 if delta >= 0 else -delta * 2 - 1)
+            _put_varint(out, self.bins[index])
+            previous = index
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        version, accuracy, zero, total, low, high = cls._HEADER.unpack_from(data)
+        if version != cls.VERSION:
+            raise ValueError(f"unsupported sketch version {version}")
+        sketch = cls(accuracy)
+        pos = cls._HEADER.size
+        size, pos = _get_varint(data, pos)
+        index = 0
+        for _ in range(size):
+            delta, pos = _get_varint(data, pos)
+            index += delta // 2 if not delta & 1 else -(delta + 1) // 2
+            n, pos = _get_varint(data, pos)
+            sketch.bins[index] = n
+        sketch.zero = zero
+        sketch.count = zero + sum(sketch.bins.values())
+        sketch.sum, sketch.min, sketch.max = total, low, high
+        return sketch
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)) -> dict:
+        result = {"count": self.count,
+                  "mean": self.sum / self.count if self.count else None,
+                  "min": self.min if self.count else None,
+                  "max": self.max if self.count else None}
+        for q in quantiles:
+            result[f"p{q * 100:g}"] = self.quantile(q)
+        return result
+
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(66)]
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch (HyperLogLog) with 2**precision registers.
+
+    Estimates have a standard error of 1.04 / sqrt(2**precision), 0.81% at the
+    default 14. Registers are kept sparse, so small sketches stay small in
+    memory and on disk, and merging or counting costs only the registers in use.
+    """
+    __slots__ = ("precision", "registers")
+
+    VERSION = 1
+
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = {}
+
+    @property
+    def standard_error(self) -> float:
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add(self, item: str):
+        h = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers.get(index, 0):
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """Fold other into this sketch (a union); both must have the same precision"""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        registers = self.registers
+        if not registers:
+            registers.update(other.registers)
+            return self
+        get = registers.get
+        for index, rank in other.registers.items():
+            if rank > get(index, 0):
+                registers[index] = rank
+        return self
+
+    def count(self) -> int:
+        m = 1 << self.precision
+        zeros = m - len(self.registers)
+        harmonic = zeros + sum(map(_INVERSE_POWERS.__getitem__, self.registers.values()))
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / harmonic
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        """Version, precision and register count, then the used register indexes (uint16) and their ranks"""
+        indexes = array("H", sorted(self.registers))
+        if sys.byteorder != "little":
+            indexes.byteswap()
+        header = struct.pack("<BBH", self.VERSION, self.precision, len(indexes) & 0xFFFF)
+        return header + indexes.tobytes() + bytes(self.registers[index] for index in sorted(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        version, precision, size = struct.unpack_from("<BBH", data)
+        if version != cls.VERSION:
+            raise ValueError(f"unsupported sketch version {version}")
+        sketch = cls(precision)
+        # A full sketch at precision 16 has 65536 registers, stored as a count of 0
+        size = size or (len(data) - 4) // 3
+        indexes = array("H")
+        indexes.frombytes(data[4:4 + 2 * size])
+        if sys.byteorder != "little":
+            indexes.byteswap()
+        sketch.registers = dict(zip(indexes, data[4 + 2 * size:]))
+        return sketch
@@ -0,0 +1,160 @@
+import json, re
+from datetime import datetime
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError,)
+except ImportError:
+    orjson = None
+    _loads = json.loads
+    _DECODE_ERRORS = (ValueError,)
+
+# Field names tried in order; the first present wins
+LEVEL_KEYS = ("level", "levelname", "severity", "lvl", "log.level")
+TIME_KEYS = ("timestamp", "time", "ts", "@timestamp", "asctime")
+MESSAGE_KEYS = ("message", "msg", "event")
+STATUS_KEYS = ("status", "status_code", "http_status", "statusCode")
+LATENCY_MS_KEYS = ("latency_ms", "duration_ms", "elapsed_ms", "response_time_ms")
+LATENCY_S_KEYS = ("latency", "duration", "elapsed", "response_time")
+PATH_KEYS = ("path", "route", "url", "uri", "endpoint")
+USER_KEYS = ("user", "username", "user_id", "userId")
+MODEL_KEYS = ("model",)
+TOKEN_KEYS = ("eval_count", "completion_tokens", "output_tokens")
+TOKENS_PER_S_KEYS = ("tokens_per_second", "tokens_per_s")
+# Keys every bunyan (v, hostname) or pino (hostname) record carries; their numeric levels sit a step
+# above Python logging's
+BUNYAN_KEYS = ("v", "hostname")
+
+LEVELS = {
+    "trace": "INFO", "debug": "INFO", "info": "INFO", "notice": "INFO",
+    "success": "SUCCESS",
+    "warn": "WARNING", "warning": "WARNING",
+    "error": "ERROR", "err": "ERROR",
+    "critical": "CRITICAL", "crit": "CRITICAL", "fatal": "CRITICAL", "panic": "CRITICAL",
+    "alert": "CRITICAL", "emergency": "CRITICAL",
+}
+
+# Durations written as strings: plain seconds, a number with a unit, or Go's "1m2.5s"
+_DURATION = re.compile(r"^\s*([\d.]+)\s*(ns|us|µs|μs|ms|s|m|h)?\s*$")
+_GO_DURATION = re.compile(r"^(?:[\d.]+(?:ns|us|µs|μs|ms|s|m|h))+$")
+_GO_DURATION_PART = re.compile(r"([\d.]+)(ns|us|µs|μs|ms|s|m|h)")
+_DURATION_MS = {"ns": 1e-6, "us": 1e-3, "µs": 1e-3, "μs": 1e-3, "ms": 1.0, "s": 1000.0, None: 1000.0,
+                "m": 60000.0, "h": 3600000.0}
+# Path segments that are ids, so /api/v1/chats/<uuid> groups as one path
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|[0-9a-fA-F]{16,})$")
+
+def _first(record: dict, keys: tuple):
+    for key in keys:
+        value = record.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+def _level(value, record: dict):
+    if isinstance(value, int) and not isinstance(value, bool):
+        if any(key in record for key in BUNYAN_KEYS):
+            # bunyan / pino: 30 info, 40 warn, 50 error, 60 fatal
+            return "CRITICAL" if value >= 60 else "ERROR" if value >= 50 else "WARNING" if value >= 40 else "INFO"
+        # Python logging: 20 info, 30 warning, 40 error, 50 critical
+        return "CRITICAL" if value >= 50 else "ERROR" if value >= 40 else "WARNING" if value >= 30 else "INFO"
+    return LEVELS.get(str(value).lower()) if value is not None else None
+
+def _timestamp(value):
+    """Epoch seconds from an ISO 8601 string or an epoch number in s/ms/us/ns"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        for scale in (1e18, 1e15, 1e12):
+            if value > scale:
+                return value / (scale / 1e9)
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace(",", ".")).timestamp()
+        except ValueError:
+            return None
+    return None
+
+def _latency_ms(record: dict):
+    value = _first(record, LATENCY_MS_KEYS)
+    if value is not None:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    value = _first(record, LATENCY_S_KEYS)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value * 1000.0
+    if isinstance(value, str):
+        try:
+            match = _DURATION.match(value)
+            if match:
+                return float(match.group(1)) * _DURATION_MS[match.group(2)]
+            if _GO_DURATION.match(value.strip()):
+                return sum(float(number) * _DURATION_MS[unit] for number, unit in _GO_DURATION_PART.findall(value))
+        except ValueError:
+            return None  # digits and dots that are not a number, e.g. "1.2.3s"
+    return None
+
+def _tokens(record: dict):
+    """Output tokens and generation speed; Ollama's eval_duration is in nanoseconds"""
+    tokens = _first(record, TOKEN_KEYS)
+    tokens = tokens if isinstance(tokens, (int, float)) and not isinstance(tokens, bool) else None
+    rate = _first(record, TOKENS_PER_S_KEYS)
+    rate = rate if isinstance(rate, (int, float)) and not isinstance(rate, bool) else None
+    if rate is None and tokens:
+        duration = record.get("eval_duration")
+        if isinstance(duration, (int, float)) and duration > 0:
+            rate = tokens / duration * 1e9
+    return tokens, rate
+
+def _status(record: dict):
+    value = _first(record, STATUS_KEYS)
+    try:
+        status = int(value)
+    except (TypeError, ValueError):
+        return None
+    return status if 100 <= status <= 599 else None
+
+def normalize_path(value) -> str:
+    """Route-like path: no scheme, host or query string, id segments as :id"""
+    if not isinstance(value, str) or not value:
+        return None
+    path = value.split("?", 1)[0].split("#", 1)[0]
+    if "://" in path:
+        path = "/" + path.split("://", 1)[1].partition("/")[2]
+    return "/".join(":id" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))[:255]
+
+def _text(value):
+    return str(value)[:255] if value is not None else None
+
+def parse(line: str):
+    """Fields of a JSON object log line, or None for anything else.
+
+    Returns level, ts (epoch seconds) and message when the record has them,
+    plus the indexed columns http_status, latency_ms, path, username, model,
+    and tokens and tokens_per_s for model responses.
+    """
+    # Cheap check first: most lines are plain text
+    if not line or line[0] != "{" or line[-1] != "}":
+        return None
+    try:
+        record = _loads(line)
+    except _DECODE_ERRORS:
+        return None
+    if not isinstance(record, dict):
+        return None
+
+    message = _first(record, MESSAGE_KEYS)
+    tokens, tokens_per_s = _tokens(record)
+    return {
+        "level": _level(_first(record, LEVEL_KEYS), record),
+        "ts": _timestamp(_first(record, TIME_KEYS)),
+        "message": message if isinstance(message, str) else None,
+        "http_status": _status(record),
+        "latency_ms": _latency_ms(record),
+        "path": normalize_path(_first(record, PATH_KEYS)),
+        "username": _text(_first(record, USER_KEYS)),
+        "model": _text(_first(record, MODEL_KEYS)),
+        "tokens": tokens,
+        "tokens_per_s": tokens_per_s,
+    }
@@ -0,0 +1,377 @@
+import bisect, fnmatch, itertools, math, struct, threading, time
+from array import array
+from collections import OrderedDict
+from .config import TSDB_BLOCK_SECONDS, TSDB_FLUSH_SECONDS
+from .database import store_series_blocks, get_series_blocks, get_series_names
+
+# Blocks are Gorilla-encoded (Pelkonen et al., VLDB 2015): each timestamp as the change in
+# its delta from the previous one, each value XORed with the previous value. Samples a
+# fixed interval apart cost one bit of timestamp, and unchanged values one bit of value.
+VERSION = 1
+_HEADER = struct.Struct("<BBIq")  # version, decimal digits (255 = exact), sample count, first timestamp
+_EXACT = 255
+_pack_double = struct.Struct("<d").pack
+_unpack_bits = struct.Struct("<Q").unpack
+
+def _to_bits(value: float) -> int:
+    return _unpack_bits(_pack_double(value))[0]
+
+class _BitWriter:
+    __slots__ = ("buf", "acc", "n")
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.acc = 0
+        self.n = 0
+
+    def write(self, value: int, bits: int):
+        acc = (self.acc << bits) | value
+        n = self.n + bits
+        buf = self.buf
+        while n >= 8:
+            n -= 8
+            buf.append((acc >> n) & 0xFF)
+        self.acc = acc & ((1 << n) - 1)
+        self.n = n
+
+    def getvalue(self) -> bytes:
+        tail = bytes(((self.acc << (8 - self.n)) & 0xFF,)) if self.n else b""
+        return bytes(self.buf) + tail
+
+# Delta-of-delta buckets: (prefix, prefix bits, value bits); the value is stored with a bias
+_DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 9), (0b1110, 4, 12))
+
+class Block:
+    """Samples of one series within one TSDB_BLOCK_SECONDS window, encoded as they arrive.
+
+    Timestamps are whole seconds. With digits set, values are rounded to that
+    many decimals and stored as integers, which XOR to far fewer bits than
+    decimal fractions do. min, max and sum are kept so whole blocks can be
+    folded into coarse history without decoding.
+    """
+    __slots__ = ("series", "digits", "first_ts", "last_ts", "count", "min", "max", "sum",
+                 "_bits", "_delta", "_value", "_leading", "_trailing")
+
+    def __init__(self, series: str, ts: int, value: float, digits: int = None):
+        self.series = series
+        self.digits = _EXACT if digits is None else digits
+        stored = self._scale(value)
+        self.first_ts = self.last_ts = ts
+        self.count = 1
+        self.min = self.max = self.sum = self._unscale(stored)
+        self._bits = _BitWriter()
+        self._bits.write(_to_bits(stored), 64)
+        self._delta = 0
+        self._value = _to_bits(stored)
+        self._leading = self._trailing = None
+
+    def _scale(self, value: float) -> float:
+        return float(value) if self.digits == _EXACT else float(round(value * 10 ** self.digits))
+
+    def _unscale(self, stored: float) -> float:
+        return stored if self.digits == _EXACT else stored / 10 ** self.digits
+
+    @property
+    def window(self) -> int:
+        return self.first_ts - self.first_ts % TSDB_BLOCK_SECONDS
+
+    def append(self, ts: int, value: float):
+        """Add a sample; one at or before the last timestamp is dropped"""
+        if ts <= self.last_ts:
+            return
+        bits = self._bits
+        delta = ts - self.last_ts
+        dod = delta - self._delta
+        if dod == 0:
+            bits.write(0, 1)
+        else:
+            for prefix, prefix_bits, value_bits in _DOD_BUCKETS:
+                bias = (1 << (value_bits - 1)) - 1
+                if -bias <= dod <= bias + 1:
+                    bits.write(prefix, prefix_bits)
+                    bits.write(dod + bias, value_bits)
+                    break
+            else:
+                bits.write(0b1111, 4)
+                bits.write(dod & 0xFFFFFFFF, 32)
+        self._delta = delta
+        self.last_ts = ts
+
+        stored = self._scale(value)
+        current = _to_bits(stored)
+        xor = current ^ self._value
+        if xor == 0:
+            bits.write(0, 1)
+        else:
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if self._leading is not None and leading >= self._leading and trailing >= self._trailing:
+                bits.write(0b10, 2)
+                bits.write(xor >> self._trailing, 64 - self._leading - self._trailing)
+            else:
+                meaningful = 64 - leading - trailing
+                bits.write(0b11, 2)
+                bits.write(leading, 5)
+                bits.write(meaningful & 63, 6)  # 64 meaningful bits is written as 0
+                bits.write(xor >> trailing, meaningful)
+                self._leading, self._trailing = leading, trailing
+        self._value = current
+
+        value = self._unscale(stored)
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(VERSION, self.digits, self.count, self.first_ts) + self._bits.getvalue()
+
+    def row(self) -> tuple:
+        """(series, first_ts, last_ts, count, min, max, sum, data) as series_blocks stores it"""
+        return (self.series, self.first_ts, self.last_ts, self.count, self.min, self.max, self.sum,
+                self.to_bytes())
+
+def decode(data: bytes):
+    """Timestamps and values of an encoded block, as two lists"""
+    version, digits, count, ts = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported block version {version}")
+    # Bits are read inline off the byte string: this loop is most of the cost of reading history
+    data = bytes(data) + bytes(9)
+    from_bytes = int.from_bytes
+    pos = _HEADER.size * 8
+    value = from_bytes(data[pos >> 3:(pos >> 3) + 8], "big")
+    pos += 64
+    timestamps, values = [ts], [value]
+    delta = leading = trailing = 0
+    for _ in range(count - 1):
+        # Two bits cover the usual sample: unchanged delta, then value unchanged or in the last window
+        head = (from_bytes(data[pos >> 3:(pos >> 3) + 2], "big") >> (14 - (pos & 7))) & 3
+        if head & 2:
+            prefix = (from_bytes(data[pos >> 3:(pos >> 3) + 2], "big") >> (12 - (pos & 7))) & 15
+            if prefix < 0b1100:
+                n, bias, pos = 7, 63, pos + 2
+            elif prefix < 0b1110:
+                n, bias, pos = 9, 255, pos + 3
+            elif prefix == 0b1110:
+                n, bias, pos = 12, 2047, pos + 4
+            else:
+                n, bias, pos = 32, 0, pos + 4
+            start, end = pos >> 3, (pos + n + 7) >> 3
+            dod = ((from_bytes(data[start:end], "big") >> ((end << 3) - pos - n)) & ((1 << n) - 1)) - bias
+            pos += n
+            if n == 32 and dod >= 1 << 31:
+                dod -= 1 << 32
+            delta += dod
+            head = (from_bytes(data[pos >> 3:(pos >> 3) + 2], "big") >> (14 - (pos & 7))) & 3
+        else:
+            pos += 1
+            head = (from_bytes(data[pos >> 3:(pos >> 3) + 2], "big") >> (14 - (pos & 7))) & 3
+        ts += delta
+        if head & 2:
+            pos += 2
+            if head & 1:
+                window = (from_bytes(data[pos >> 3:(pos >> 3) + 3], "big") >> (13 - (pos & 7))) & 0x7FF
+                pos += 11
+                leading = window >> 6
+                trailing = 64 - leading - ((window & 63) or 64)
+            n = 64 - leading - trailing
+            start, end = pos >> 3, (pos + n + 7) >> 3
+            value ^= ((from_bytes(data[start:end], "big") >> ((end << 3) - pos - n)) & ((1 << n) - 1)) << trailing
+            pos += n
+        else:
+            pos += 1
+        timestamps.append(ts)
+        values.append(value)
+    values = list(struct.unpack(f"<{count}d", struct.pack(f"<{count}Q", *values)))
+    if digits != _EXACT:
+        scale = 10 ** digits
+        values = [v / scale for v in values]
+    return timestamps, values
+
+# Most points history returns per series
+MAX_POINTS = 10000
+
+# Per-minute rollups of blocks read by history, most recently used last; about 2.5 KB each
+ROLLUP_SECONDS = 60
+ROLLUP_CACHE_BLOCKS = 4096
+
+# series -> Block being written; full blocks wait in _sealed until the next flush
+_open = {}
+_sealed = []
+_rollups = OrderedDict()
+_lock = threading.Lock()
+
+def record(series: str, value: float, ts: float = None, digits: int = None):
+    """Add a sample to a series, at ts (default now) rounded down to the second.
+
+    digits rounds values to that many decimals when stored; None keeps them exact.
+    NaN and infinities are dropped: they can't be rounded and would poison the
+    block's min, max and sum.
+    """
+    if value is None or not math.isfinite(value):
+        return
+    ts = int(ts if ts is not None else time.time())
+    with _lock:
+        block = _open.get(series)
+        if block is not None and ts - ts % TSDB_BLOCK_SECONDS != block.window:
+            if ts < block.window:
+                return  # older than the block being written
+            _sealed.append(block)
+            block = None
+        if block is None:
+            _open[series] = Block(series, ts, value, digits)
+        else:
+            block.append(ts, value)
+
+def flush():
+    """Store sealed blocks, and the open ones as they stand, in one batch.
+
+    Blocks are keyed by series and first timestamp, so an open block is
+    rewritten in place each flush; after a restart a series starts a new
+    block and the partial one stays as it was last stored.
+    """
+    global _sealed
+    now = time.time()
+    with _lock:
+        for series, block in list(_open.items()):
+            if block.window + TSDB_BLOCK_SECONDS <= now:
+                _sealed.append(_open.pop(series))
+        sealed, _sealed = _sealed, []
+        rows = [block.row() for block in sealed] + [block.row() for block in _open.values()]
+    try:
+        store_series_blocks(rows)
+    except Exception:
+        with _lock:
+            _sealed = sealed + _sealed
+        raise
+
+def series_names(patterns: list = None) -> list:
+    """Stored and in-memory series names, optionally filtered by fnmatch patterns (e.g. "gpu.*")"""
+    with _lock:
+        names = set(_open) | {block.series for block in _sealed}
+    names.update(get_series_names())
+    if patterns:
+        names = {name for name in names if any(fnmatch.fnmatchcase(name, p) for p in patterns)}
+    return sorted(names)
+
+def _blocks(series: str, start: int, end: int) -> list:
+    """Rows of a series' blocks overlapping [start, end]; blocks in memory replace their stored copies"""
+    rows = {row[1]: row for row in get_series_blocks(series, start, end)}
+    with _lock:
+        pending = [block for block in _sealed if block.series == series]
+        if series in _open:
+            pending.append(_open[series])
+        for block in pending:
+            if block.first_ts <= end and block.last_ts >= start:
+                rows[block.first_ts] = block.row()
+    return [rows[first_ts] for first_ts in sorted(rows)]
+
+def query(series: str, start: float, end: float):
+    """Every sample of a series in [start, end], as timestamp and value lists"""
+    start, end = int(start), int(end)
+    timestamps, values = [], []
+    for row in _blocks(series, start, end):
+        ts, vs = decode(row[7])
+        i, j = bisect.bisect_left(ts, start), bisect.bisect_right(ts, end)
+        timestamps += ts[i:j]
+        values += vs[i:j]
+    return timestamps, values
+
+def _buckets(timestamps: list, values: list, start: int, end: int, step: int):
+    """(bucket, count, min, max, sum) per step for the samples in [start, end]"""
+    i, stop = bisect.bisect_left(timestamps, start), bisect.bisect_right(timestamps, end)
+    while i < stop:
+        bucket = timestamps[i] // step * step
+        j = bisect.bisect_left(timestamps, bucket + step, i, stop)
+        chunk = values[i:j]
+        yield bucket, j - i, min(chunk), max(chunk), sum(chunk)
+        i = j
+
+def _rollup(row: tuple) -> array:
+    """A block row's per-minute (minute, count, min, max, sum), flattened into one array.
+
+    Cached by block along with its sample count, so only a block still
+    being written is decoded again, and only once it has grown.
+    """
+    key, count = (row[0], row[1]), row[3]
+    with _lock:
+        cached = _rollups.get(key)
+        if cached is not None and cached[0] == count:
+            _rollups.move_to_end(key)
+            return cached[1]
+    timestamps, values = decode(row[7])
+    rollup = array("d", itertools.chain.from_iterable(
+        _buckets(timestamps, values, row[1], row[2], ROLLUP_SECONDS)))
+    with _lock:
+        _rollups[key] = (count, rollup)
+        _rollups.move_to_end(key)
+        while len(_rollups) > ROLLUP_CACHE_BLOCKS:
+            _rollups.popitem(last=False)
+    return rollup
+
+def history(patterns: list = None, window_ms: int = 3600000, step_ms: int = None, max_points: int = 500) -> dict:
+    """[timestamp, avg, min, max] per step for each matching series over the last window_ms.
+
+    Without step_ms the step gives at most max_points points, and a step_ms
+    that would give more than MAX_POINTS is raised to give MAX_POINTS. The
+    window starts on a step boundary. Steps of whole blocks fold each block's
+    stored min/max/sum and steps of whole minutes fold cached per-minute
+    rollups, so only shorter steps decode every sample. Without step_ms,
+    steps are rounded up to whole minutes, and past an eighth of a block to
+    whole blocks.
+    """
+    end = time.time()
+    step = step_ms / 1000.0 if step_ms else window_ms / 1000.0 / max_points
+    step = int(math.ceil(max(step, window_ms / 1000.0 / MAX_POINTS, 1.0)))
+    if step >= TSDB_BLOCK_SECONDS or (not step_ms and step * 8 > TSDB_BLOCK_SECONDS):
+        step = -(-step // TSDB_BLOCK_SECONDS) * TSDB_BLOCK_SECONDS
+    elif not step_ms and step > ROLLUP_SECONDS:
+        step = -(-step // ROLLUP_SECONDS) * ROLLUP_SECONDS
+    end = int(end)
+    start = (end - window_ms // 1000) // step * step
+
+    result = {}
+    for series in series_names(patterns):
+        buckets = {}
+        def fold(bucket, count, low, high, total):
+            entry = buckets.get(bucket)
+            if entry is None:
+                buckets[bucket] = [count, low, high, total]
+            else:
+                entry[0] += count
+                entry[1] = min(entry[1], low)
+                entry[2] = max(entry[2], high)
+                entry[3] += total
+
+        for row in _blocks(series, start, end):
+            first_ts, last_ts = row[1], row[2]
+            if step % TSDB_BLOCK_SECONDS == 0 and first_ts >= start and last_ts <= end:
+                fold(first_ts // step * step, *row[3:7])
+            elif step % ROLLUP_SECONDS == 0:
+                rollup = _rollup(row)
+                for k in range(0, len(rollup), 5):
+                    minute = int(rollup[k])
+                    if start <= minute <= end:
+                        fold(minute // step * step, int(rollup[k + 1]), rollup[k + 2], rollup[k + 3], rollup[k + 4])
+            else:
+                for bucket, count, low, high, total in _buckets(*decode(row[7]), start, end, step):
+                    fold(bucket // step * step, count, low, high, total)
+        result[series] = [[bucket, round(total / count, 4), low, high]
+                          for bucket, (count, low, high, total) in sorted(buckets.items())]
+    return {"window_ms": window_ms, "step_ms": step * 1000, "series": result}
+
+def flush_worker():
+    """Background worker storing time-series blocks"""
+    while True:
+        time.sleep(TSDB_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error flushing time series: {e}")
+
+def start():
+    """Start storing time-series blocks"""
+    threading.Thread(target=flush_worker, daemon=True).start()
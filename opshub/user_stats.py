@@ -0,0 +1,113 @@
+import threading, time
+from .config import USER_STATS_BUCKET_SECONDS, USER_STATS_PRECISION, USER_STATS_FLUSH_SECONDS
+from .database import merge_user_sketches, get_user_sketches
+from .sketches import HyperLogLog
+
+# (bucket, model) -> HyperLogLog; model "" for users seen without one
+_pending = {}
+_lock = threading.Lock()
+
+def record(username: str, model: str = None, ts: float = None):
+    """Count username as a user of model in the hour containing ts"""
+    bucket = int((ts or time.time()) // USER_STATS_BUCKET_SECONDS) * USER_STATS_BUCKET_SECONDS
+    key = (bucket, model or "")
+    with _lock:
+        sketch = _pending.get(key)
+        if sketch is None:
+            sketch = _pending[key] = HyperLogLog(USER_STATS_PRECISION)
+        sketch.add(username)
+
+def record_sessions(events: list):
+    """Count the users of a batch of session events (as stored by store_user_sessions)"""
+    for event in events:
+        record(event["username"], event.get("model"))
+
+def _merge_blobs(old: bytes, new: bytes) -> bytes:
+    return HyperLogLog.from_bytes(old).merge(HyperLogLog.from_bytes(new)).to_bytes()
+
+def flush():
+    """Merge pending sketches into their stored hours in one batch"""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    try:
+        merge_user_sketches({key: sketch.to_bytes() for key, sketch in pending.items()}, _merge_blobs)
+    except Exception:
+        with _lock:
+            for key, sketch in pending.items():
+                if key in _pending:
+                    sketch.merge(_pending[key])
+                _pending[key] = sketch
+        raise
+
+def _union(sketches) -> HyperLogLog:
+    merged = HyperLogLog(USER_STATS_PRECISION)
+    for sketch in sketches:
+        merged.merge(sketch)
+    return merged
+
+def get_unique_users(model: str = None, window_ms: int = 30 * 86400000, step_ms: int = 3600000) -> dict:
+    """Approximate distinct users per model and overall, in total and per step_ms, over a window.
+
+    step_ms is rounded up to whole hours. Counts have a standard error of
+    1.04 / sqrt(2**OPS_USER_STATS_PRECISION) relative to the true value.
+    """
+    now = time.time()
+    since = int((now - window_ms / 1000.0) // USER_STATS_BUCKET_SECONDS) * USER_STATS_BUCKET_SECONDS
+    step = max(USER_STATS_BUCKET_SECONDS,
+               -(-step_ms // 1000 // USER_STATS_BUCKET_SECONDS) * USER_STATS_BUCKET_SECONDS)
+
+    # (model, step bucket) -> sketch
+    steps = {}
+    def fold(bucket, name, sketch):
+        key = (name, bucket // step * step)
+        if key in steps:
+            steps[key].merge(sketch)
+        else:
+            steps[key] = sketch
+
+    for row in get_user_sketches(since, int(now), model):
+        fold(row["bucket"], row["model"], HyperLogLog.from_bytes(row["sketch"]))
+    # Fold in sketches that have not been flushed yet
+    with _lock:
+        pending = [(key, _union([sketch])) for key, sketch in _pending.items()]
+    for (bucket, name), sketch in pending:
+        if bucket >= since and (not model or name == model):
+            fold(bucket, name, sketch)
+
+    by_model, by_step = {}, {}
+    for (name, bucket), sketch in steps.items():
+        by_model.setdefault(name, []).append((bucket, sketch))
+        by_step.setdefault(bucket, []).append(sketch)
+
+    models = []
+    for name, points in sorted(by_model.items()):
+        if not name:
+            continue
+        points.sort(key=lambda point: point[0])
+        models.append({"model": name,
+                       "unique_users": _union(sketch for _, sketch in points).count(),
+                       "points": [[bucket, sketch.count()] for bucket, sketch in points]})
+
+    overall = {bucket: _union(sketches) for bucket, sketches in sorted(by_step.items())}
+    return {
+        "window_ms": window_ms,
+        "step_ms": step * 1000,
+        "standard_error": round(HyperLogLog(USER_STATS_PRECISION).standard_error, 5),
+        "unique_users": _union(overall.values()).count(),
+        "points": [[bucket, sketch.count()] for bucket, sketch in overall.items()],
+        "models": models,
+    }
+
+def flush_worker():
+    """Background worker flushing distinct-user sketches"""
+    while True:
+        time.sleep(USER_STATS_FLUSH_SECONDS)
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error flushing user stats: {e}")
+
+def start():
+    """Start flushing distinct-user sketches"""
+    threading.Thread(target=flush_worker, daemon=True).start()
@@ -0,0 +1,10 @@
+import pytest
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Database and log files in a throwaway directory"""
+    from opshub import database, logging_pipeline
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "opshub.db"))
+    monkeypatch.setattr(logging_pipeline, "LOG_BASE", str(tmp_path / "logs"))
+    database.init_db()
+    return tmp_path
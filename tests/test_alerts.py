@@ -0,0 +1,76 @@
+import threading, time
+import pytest
+from opshub import alerts, database
+from opshub.alerts import AlertEngine
+
+RULES = [
+    {"name": "host_high_cpu", "source": "host", "metric": "cpu_percent",
+     "op": ">", "threshold": 90, "clear": 80, "for_seconds": 60, "severity": "warning",
+     "message": "Host CPU usage is {value:.1f}%"},
+    {"name": "container_down", "source": "container", "metric": "running",
+     "op": "<", "threshold": 1, "clear": 1, "for_seconds": 0, "severity": "critical",
+     "message": "Container {target} is not running"},
+]
+
+def _drain(engine: AlertEngine):
+    """Write the queued transitions, as the writer thread would"""
+    batch = []
+    while not engine.writer.queue.empty():
+        batch.append(engine.writer.queue.get()[1])
+    engine._write(batch)
+
+def _alerts() -> list:
+    return sorted(database.get_alerts(hours=24), key=lambda alert: alert["id"])
+
+def test_fires_after_for_seconds_and_resolves_past_clear(data_dir):
+    engine = AlertEngine(RULES)
+    for ts, cpu in [(0, 95), (30, 96), (59, 97), (60, 98), (90, 85), (120, 79)]:
+        engine.observe("host", "host", {"cpu_percent": cpu}, ts)
+        if ts == 60:
+            assert engine.firing_targets("host") == {"host"}
+    _drain(engine)
+    [alert] = _alerts()
+    assert (alert["alert_type"], alert["metric_value"], alert["message"]) == ("host_high_cpu", 79, "Host CPU usage is 98.0%")
+    assert alert["resolved"] and alert["resolved_at"]
+    assert engine.firing_targets("host") == set()
+
+def test_observers_do_not_wait_on_alert_writes(data_dir, monkeypatch):
+    release, created = threading.Event(), []
+    def slow_create_alert(**kwargs):
+        release.wait(5)
+        created.append(kwargs["alert_type"])
+        return len(created)
+    monkeypatch.setattr(alerts, "create_alert", slow_create_alert)
+    engine = AlertEngine(RULES)
+    engine.writer.start()
+    engine.observe("container", "web", {"running": 0})
+    started = time.monotonic()
+    for ts in range(100):
+        engine.observe("host", "host", {"cpu_percent": 50}, ts)
+    assert time.monotonic() - started < 1
+    release.set()
+    deadline = time.monotonic() + 5
+    while not created and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert created == ["container_down"]
+
+def test_resolves_alerts_of_a_target_that_is_gone(data_dir):
+    engine = AlertEngine(RULES)
+    engine.observe("container", "web", {"running": 0})
+    engine.observe("container", "db", {"running": 0})
+    _drain(engine)
+    engine.resolve("container", "web")
+    _drain(engine)
+    assert engine.firing_targets("container") == {"db"}
+    assert [(alert["container_name"], bool(alert["resolved"])) for alert in _alerts()] == [
+        ("web", True), ("db", False)]
+
+def test_adopted_alerts_are_not_fired_again(data_dir):
+    alert_id = database.create_alert("container_down", "critical", "down", container_name="web")
+    engine = AlertEngine(RULES)
+    engine.adopt(database.get_unresolved_alerts())
+    engine.observe("container", "web", {"running": 0})
+    engine.observe("container", "web", {"running": 1})
+    _drain(engine)
+    [alert] = _alerts()
+    assert alert["id"] == alert_id and alert["resolved"]
@@ -0,0 +1,142 @@
+import gzip, io, json, threading, time
+import pytest
+from opshub import export
+from opshub.bench import make_fixture, seed_logs
+
+ROWS = 20000
+# Uncompressed NDJSON MB/s the gzip export must sustain; well below what a laptop does
+MIN_MB_PER_SECOND = 5
+
+@pytest.fixture
+def seeded(data_dir):
+    seed_logs(make_fixture(4, ROWS // 4))
+    return data_dir
+
+def _ndjson_rows(data: bytes, compression: str) -> list:
+    if compression == "gzip":
+        data = gzip.decompress(data)
+    elif compression == "zstd":
+        data = export.zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=True).read()
+    return [json.loads(line) for line in data.splitlines()]
+
+def test_export_throughput(seeded, record_property):
+    started = time.perf_counter()
+    data = b"".join(export.export_stream("logs", "ndjson", "none", batch_size=5000))
+    raw_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    compressed = b"".join(export.export_stream("logs", "ndjson", "gzip", batch_size=5000))
+    gzip_seconds = time.perf_counter() - started
+
+    rows = _ndjson_rows(compressed, "gzip")
+    assert len(rows) == ROWS
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    mb_per_second = len(data) / gzip_seconds / 1e6
+    record_property("ndjson_mb_per_second", round(len(data) / raw_seconds / 1e6, 1))
+    record_property("gzip_mb_per_second", round(mb_per_second, 1))
+    print(f"export: {len(data) / 1e6:.1f} MB NDJSON, {len(data) / raw_seconds / 1e6:.1f} MB/s raw, "
+          f"{mb_per_second:.1f} MB/s gzip")
+    assert mb_per_second >= MIN_MB_PER_SECOND
+
+def test_parquet_export_has_every_row(seeded):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    data = b"".join(export.export_stream("logs", "parquet", "zstd", batch_size=5000))
+    table = pyarrow.parquet.read_table(io.BytesIO(data))
+    assert table.num_rows == ROWS
+    assert table.schema.field("latency_ms").type == pyarrow.float64()
+
+def test_metrics_parquet_schema_builds(data_dir):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    from opshub.database import store_performance_metric
+    store_performance_metric("host", "cpu_percent", 12.5, "%")
+    data = b"".join(export.export_stream("metrics", "parquet", "zstd"))
+    table = pyarrow.parquet.read_table(io.BytesIO(data))
+    assert table.column("value").to_pylist() == [12.5]
+    assert table.schema.field("value").type == pyarrow.float64()
+
+def test_both_exports_take_their_range_in_utc(data_dir, monkeypatch):
+    from opshub import database
+    from opshub.records import LogRecord
+    monkeypatch.setenv("TZ", "Asia/Tokyo")  # UTC+9, so local and UTC strings differ
+    time.tzset()
+    try:
+        # 10:00Z and 11:00Z, as each table stores them: logs in local time, metrics in UTC
+        database.store_log_entries([LogRecord(f"2024-01-15T{hour}:00:00", "app", "c1", "INFO", f"at {hour}", None,
+                                              "docker_logs") for hour in ("19", "20")])
+        conn = database.get_connection()
+        conn.executemany("INSERT INTO performance_metrics (timestamp, metric_type, metric_name, value) "
+                         "VALUES (?, 'host', 'cpu_percent', ?)",
+                         [("2024-01-15 10:00:00", 10.0), ("2024-01-15 11:00:00", 11.0)])
+        conn.commit()
+        conn.close()
+        for start, end in [("2024-01-15T10:30:00", "2024-01-15T12:00:00"),
+                           ("2024-01-15T10:30:00Z", "2024-01-15T12:00:00+00:00"),
+                           ("2024-01-15T19:30:00+09:00", "2024-01-15T21:00:00+09:00")]:
+            logs = [row for batch in export.export_rows("logs", start, end) for row in batch]
+            metrics = [row for batch in export.export_rows("metrics", start, end) for row in batch]
+            assert [row["message"] for row in logs] == ["at 20"]
+            assert [row["value"] for row in metrics] == [11.0]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd", "none"])
+def test_resume_after_an_interrupted_download(seeded, tmp_path, compression):
+    if compression == "zstd" and export.zstandard is None:
+        pytest.skip("zstandard not installed")
+    full = b"".join(export.export_stream("logs", "ndjson", compression, batch_size=3000))
+    path = tmp_path / f"export{export.file_suffix('ndjson', compression)}"
+    # Cut the download part way into a chunk
+    path.write_bytes(full[:len(full) * 2 // 3])
+
+    keep, last_id = export.resume_point(str(path), compression)
+    assert 0 < keep < len(full) and last_id > 0
+    with open(path, "r+b") as fh:
+        fh.truncate(keep)
+        fh.seek(keep)
+        for chunk in export.export_stream("logs", "ndjson", compression, after_id=last_id, batch_size=3000):
+            fh.write(chunk)
+
+    ids = [row["id"] for row in _ndjson_rows(path.read_bytes(), compression)]
+    assert ids == [row["id"] for row in _ndjson_rows(full, compression)]
+    assert len(ids) == len(set(ids)) == ROWS
+
+def test_export_endpoint_pulls_batches_on_the_db_pool(seeded, monkeypatch):
+    from fastapi.testclient import TestClient
+    from opshub import db_executor, server
+    stream, threads = export.export_stream, []
+    def traced_stream(*args):
+        for chunk in stream(*args):
+            threads.append(threading.current_thread().name)
+            yield chunk
+    monkeypatch.setattr(export, "export_stream", traced_stream)
+    # The pool is briefly full halfway through: the export waits its turn instead of failing
+    run, calls = db_executor.run, []
+    async def busy_once(*args, **kwargs):
+        calls.append(kwargs["budget"])
+        if len(calls) == 2:
+            raise db_executor.DatabaseBusy()
+        return await run(*args, **kwargs)
+    monkeypatch.setattr(db_executor, "run", busy_once)
+    monkeypatch.setattr(server.asyncio, "sleep", lambda seconds: run(lambda: None))
+
+    response = TestClient(server.app).get("/export/logs", params={"batch_size": 5000})
+    assert response.status_code == 200
+    assert len(_ndjson_rows(response.content, "gzip")) == ROWS
+    assert len(threads) == ROWS // 5000 and all(name.startswith("opshub-db") for name in threads)
+    # One budget for the whole export, cancelled once it is done
+    assert len({id(budget) for budget in calls}) == 1 and calls[0].cancelled
+
+def test_export_endpoint_answers_errors_before_streaming(data_dir, monkeypatch):
+    import sqlite3
+    from fastapi.testclient import TestClient
+    from opshub import server
+    client = TestClient(server.app)
+    assert client.get("/export/logs", params={"start": "not a date"}).status_code == 400
+    def broken_stream(*args):
+        raise sqlite3.OperationalError("disk I/O error")
+        yield b""
+    monkeypatch.setattr(export, "export_stream", broken_stream)
+    response = client.get("/export/metrics")
+    assert response.status_code == 500 and "Error exporting metrics" in response.json()["detail"]
@@ -0,0 +1,76 @@
+import json, os, subprocess, sys, threading, time
+from pathlib import Path
+import pytest
+from opshub.bench import _FEDERATION_NODE, _free_port, _wait_for_health
+
+requests = pytest.importorskip("requests")
+
+ROOT = Path(__file__).resolve().parent.parent
+LINES = 300
+# Started in this order, so epoch order is New York, Tokyo, UTC while
+# local-time strings sort Tokyo first
+NODES = [("utc", "UTC"), ("tokyo", "Asia/Tokyo"), ("newyork", "America/New_York")]
+
+@pytest.fixture(scope="module")
+def federation():
+    ports = [_free_port() for _ in NODES]
+    procs = []
+    try:
+        for n, ((name, tz), port) in enumerate(zip(NODES, ports)):
+            peers = ",".join(f"{peer}=http://127.0.0.1:{peer_port}"
+                             for (peer, _), peer_port in zip(NODES[1:], ports[1:])) if n == 0 else ""
+            env = {**os.environ, "TZ": tz, "OPS_NODE_NAME": name, "OPS_PEERS": peers}
+            procs.append(subprocess.Popen([sys.executable, "-c", _FEDERATION_NODE, str(port), "1", str(LINES),
+                                           str(n)], env=env, cwd=ROOT,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            # Spaced out so each node's lines are newer than the last node's
+            if _wait_for_health(port, procs[-1], time.perf_counter(), timeout=60, until_running=False)[0] is None:
+                pytest.fail(f"Federation node {name} did not start")
+        yield f"http://127.0.0.1:{ports[0]}"
+    finally:
+        for proc in procs:
+            proc.kill()
+            proc.wait()
+
+def _records(response) -> list:
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+def test_federated_logs_merge_in_utc_order_across_timezones(federation):
+    records = _records(requests.get(f"{federation}/federation/logs/all",
+                                    params={"tail": LINES * len(NODES)}, stream=True))
+    assert not [r for r in records if "error" in r]
+    assert len(records) == LINES * len(NODES)
+    stamps = [r["ts"] for r in records]
+    assert stamps == sorted(stamps, reverse=True)
+    # Newest node first, regardless of how its local time reads
+    hosts = [r["host"] for r in records]
+    assert hosts[0] == "newyork" and hosts[-1] == "utc"
+    assert {r["host"] for r in records} == {name for name, _ in NODES}
+
+def test_federated_search_merges_in_utc_order(federation):
+    records = _records(requests.get(f"{federation}/federation/search/logs",
+                                    params={"query": "model", "limit": 1000}, stream=True))
+    stamps = [r["ts"] for r in records]
+    assert records and stamps == sorted(stamps, reverse=True)
+    assert {r["host"] for r in records} == {name for name, _ in NODES}
+
+def test_local_part_runs_on_the_db_pool_with_a_timeout(monkeypatch):
+    from fastapi.testclient import TestClient
+    from opshub import db_executor, server
+    threads = []
+
+    def slow_search(*args):
+        threads.append(threading.current_thread().name)
+        time.sleep(1)
+        return []
+
+    monkeypatch.setattr(server, "search_logs_db", slow_search)
+    monkeypatch.setattr(db_executor, "DB_QUERY_TIMEOUT", 0.1)
+    monkeypatch.setenv("OPS_PEERS", "")
+    started = time.perf_counter()
+    response = TestClient(server.app).get("/federation/search/logs", params={"query": "x"})
+    assert time.perf_counter() - started < 1
+    assert [json.loads(line) for line in response.iter_lines() if line] == [
+        {"host": server.federation.NODE_NAME, "error": "query timed out"}]
+    assert threads[0].startswith("opshub-db")
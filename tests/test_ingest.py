@@ -0,0 +1,79 @@
+import json, threading, time
+import pytest
+from opshub import ingest, logging_pipeline
+from opshub.sinks import Sink
+
+def _body(count: int) -> bytes:
+    return "\n".join(json.dumps({"container": "batch-job", "message": f"line {n}"})
+                     for n in range(count)).encode()
+
+@pytest.fixture
+def db_sink(monkeypatch):
+    """A small database sink with no worker, so queued entries stay put"""
+    sink = Sink("sqlite-test", lambda batch: None, queue_size=10, block=True)
+    monkeypatch.setattr(logging_pipeline, "db_sink", sink)
+    return sink
+
+def test_batch_larger_than_the_free_queue_is_refused_whole(db_sink):
+    for n in range(5):
+        db_sink.put(("tailed", None))
+    with pytest.raises(ingest.IngestError) as refused:
+        ingest.ingest_logs(_body(6), wait=False)
+    assert refused.value.status == 429
+    assert db_sink.queue.qsize() == 5
+
+def test_tailers_cannot_take_room_reserved_for_a_batch(db_sink, monkeypatch):
+    process = logging_pipeline.process_log_line
+    tailer = threading.Thread(target=lambda: [db_sink.put(("tailed", None)) for _ in range(6)], daemon=True)
+
+    def process_after_tailer_filled_the_queue(*args, **kwargs):
+        # Between the batch's admission and its puts, a tailer takes every free
+        # slot and blocks; the batch must still get its reserved room
+        if not tailer.is_alive():
+            tailer.start()
+            while db_sink.queue.qsize() < 5:
+                time.sleep(0.001)
+        return process(*args, **kwargs)
+
+    monkeypatch.setattr(logging_pipeline, "process_log_line", process_after_tailer_filled_the_queue)
+    result = {}
+    batch = threading.Thread(target=lambda: result.update(ingest.ingest_logs(_body(4), wait=False)), daemon=True)
+    batch.start()
+    batch.join(5)
+    assert not batch.is_alive(), "ingest blocked on a full queue"
+    assert result["accepted"] == 4
+    # The slot reserved for the unused acknowledgement went back to the tailer
+    tailer.join(5)
+    assert db_sink.queue.qsize() == 10
+
+def test_lines_that_fail_processing_are_rejected(db_sink, monkeypatch):
+    process = logging_pipeline.process_log_line
+    monkeypatch.setattr(logging_pipeline, "process_log_line",
+                        lambda container, cid, message, **kwargs:
+                        message != "line 1" and process(container, cid, message, **kwargs))
+    result = ingest.ingest_logs(_body(3), wait=False)
+    assert result["accepted"] == 2
+    assert result["rejected"] == [{"line": 2, "error": "could not be processed"}]
+
+def test_unconfirmed_batch_is_accepted_not_failed(db_sink, monkeypatch):
+    # The writer is backing off: the batch stays queued past the timeout and will still be written
+    monkeypatch.setattr(ingest, "INGEST_ACK_TIMEOUT", 0.05)
+    result = ingest.ingest_logs(_body(3))
+    assert (result["accepted"], result["written"]) == (3, False)
+    assert db_sink.queue.qsize() == 4
+
+def test_batch_that_failed_to_write_is_an_error(db_sink, monkeypatch):
+    monkeypatch.setattr(logging_pipeline, "acknowledge", lambda timeout: False)
+    with pytest.raises(ingest.IngestError) as failed:
+        ingest.ingest_logs(_body(3))
+    assert failed.value.status == 500 and failed.value.retry_after is None
+
+def test_unconfirmed_batch_answers_202(db_sink, monkeypatch):
+    from fastapi.testclient import TestClient
+    from opshub import server
+    client = TestClient(server.app)
+    monkeypatch.setattr(ingest, "INGEST_ACK_TIMEOUT", 0.05)
+    response = client.post("/ingest/logs", content=_body(2))
+    assert response.status_code == 202 and response.json()["written"] is False
+    monkeypatch.setattr(logging_pipeline, "acknowledge", lambda timeout: True)
+    assert client.post("/ingest/logs", content=_body(2)).status_code == 200
@@ -0,0 +1,40 @@
+import copy
+import pytest
+from opshub.live import DELETED, apply_delta, diff
+
+def _snapshot(**changes) -> dict:
+    snapshot = {"timestamp": "2024-01-15T10:25:30", "cpu_percent": 12.5, "load_avg": [0.5, 0.4, 0.3],
+                "gpus": [{"index": 0, "utilization": 40}, {"index": 1, "utilization": 10}],
+                "containers": {"running": 8, "total": 9}}
+    snapshot.update(changes)
+    return {key: value for key, value in snapshot.items() if value is not None}
+
+STATES = [
+    _snapshot(),
+    _snapshot(cpu_percent=13.0, timestamp="2024-01-15T10:25:31"),
+    _snapshot(containers={"error": "Docker is unreachable"}),
+    _snapshot(containers={"running": 7, "total": 9}),
+    _snapshot(gpus=[{"index": 0, "utilization": 55}]),
+    _snapshot(gpus=None, load_avg=None),
+    _snapshot(containers={"running": 7, "total": 9, "paused": 1}, cpu_percent=None),
+    _snapshot(),
+]
+
+def test_deltas_rebuild_every_snapshot():
+    state = copy.deepcopy(STATES[0])
+    for old, new in zip(STATES, STATES[1:]):
+        apply_delta(state, copy.deepcopy(diff(old, new)))
+        assert state == new
+
+def test_removed_keys_are_tombstoned():
+    assert diff(STATES[0], STATES[2])["containers"] == {"error": "Docker is unreachable",
+                                                        DELETED: ["running", "total"]}
+    assert diff(STATES[2], STATES[3])["containers"] == {"running": 7, "total": 9, DELETED: ["error"]}
+    assert sorted(diff(STATES[4], STATES[5])[DELETED]) == ["gpus", "load_avg"]
+
+@pytest.mark.parametrize("old, new", [({"a": 1}, {"a": 1}), ({"a": {"b": [1]}}, {"a": {"b": [1]}})])
+def test_unchanged_snapshot_has_an_empty_delta(old, new):
+    assert diff(old, new) == {}
+
+def test_a_key_that_appears_with_none_is_sent():
+    assert diff({}, {"load_avg": None}) == {"load_avg": None}
@@ -0,0 +1,71 @@
+import json, os
+from opshub import log_files
+from opshub.bench import format_docker_timestamp
+from opshub.log_files import container_log_path, tail_log_file
+
+CONTAINER_ID = "f" * 64
+T0 = 1_705_314_330_000_000_000
+
+def _records(lines, start: int = 0, newline: bool = True) -> bytes:
+    text = "\n".join(json.dumps({"log": line + "\n", "stream": "stdout",
+                                 "time": format_docker_timestamp(T0 + start + i)})
+                     for i, line in enumerate(lines))
+    return (text + ("\n" if newline else "")).encode()
+
+def _tail(root) -> list:
+    seen = []
+    tail_log_file(CONTAINER_ID, "app", root=str(root), follow=False, tail=None,
+                  handler=lambda name, cid, line, **kw: seen.append(line))
+    return seen
+
+def _log_path(root):
+    path = container_log_path(CONTAINER_ID, str(root))
+    path.parent.mkdir(parents=True)
+    return path
+
+def test_rotation_keeps_late_lines_and_a_cut_off_record(data_dir, monkeypatch):
+    path = _log_path(data_dir)
+    path.write_bytes(_records(["a1", "a2"]))
+    real_inode = log_files._inode
+
+    def rotate_at_eof(candidate):
+        # Between the tailer's last empty read and its inode check, the writer adds
+        # lines (the last without its newline) and the file is rotated
+        if not path.with_name(path.name + ".1").exists():
+            with open(path, "ab") as fh:
+                fh.write(_records(["b1"], 10) + _records(["b2"], 11, newline=False))
+            os.rename(path, path.with_name(path.name + ".1"))
+            path.write_bytes(_records(["c1", "c2"], 20))
+        return real_inode(candidate)
+
+    monkeypatch.setattr(log_files, "_inode", rotate_at_eof)
+    assert _tail(data_dir) == ["a1", "a2", "b1", "b2", "c1", "c2"]
+
+def test_truncation_restarts_at_the_top(data_dir, monkeypatch):
+    path = _log_path(data_dir)
+    path.write_bytes(_records(["old1", "old2", "old3"]))
+    real_inode = log_files._inode
+    truncated = []
+
+    def truncate_at_eof(candidate):
+        if not truncated:
+            truncated.append(True)
+            path.write_bytes(_records(["new"], 10))  # copytruncate: same inode, shorter file
+        return real_inode(candidate)
+
+    monkeypatch.setattr(log_files, "_inode", truncate_at_eof)
+    assert _tail(data_dir) == ["old1", "old2", "old3", "new"]
+
+def test_bad_time_field_skips_only_that_record(data_dir):
+    path = _log_path(data_dir)
+    bad = [json.dumps({"log": "no time\n"}), json.dumps({"log": "bad time\n", "time": "yesterday"}),
+           json.dumps({"log": "odd time\n", "time": 12})]
+    path.write_bytes(_records(["before"]) + ("\n".join(bad) + "\n").encode() + _records(["after"], 5))
+    assert _tail(data_dir) == ["before", "after"]
+
+def test_long_lines_split_by_docker_are_joined(data_dir):
+    path = _log_path(data_dir)
+    parts = [{"log": "first half ", "time": format_docker_timestamp(T0)},
+             {"log": "second half\n", "time": format_docker_timestamp(T0)}]
+    path.write_bytes(("\n".join(map(json.dumps, parts)) + "\n").encode())
+    assert _tail(data_dir) == ["first half second half"]
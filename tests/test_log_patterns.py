@@ -0,0 +1,70 @@
+from opshub import log_patterns
+from opshub.log_patterns import WILDCARD, Drain
+
+def test_variable_tokens_become_wildcards():
+    miner = Drain()
+    first = miner.add("Connected to db-primary in 12ms as alice")
+    second = miner.add("Connected to db-replica in 7ms as bob")
+    assert first[0] == second[0]
+    assert second[1] == f"Connected to {WILDCARD} in {WILDCARD} as {WILDCARD}"
+    assert second[2] == ["db-replica", "7ms", "bob"]
+    assert second[3] and first[3]
+    assert not miner.add("Connected to db-primary in 3ms as carol")[3]
+
+def test_digits_are_routed_as_wildcards():
+    miner = Drain()
+    template_id, template, params, _ = miner.add("request 8812 took 40ms")
+    assert template == f"request {WILDCARD} took {WILDCARD}"
+    assert params == ["8812", "40ms"]
+    assert miner.add("request 17 took 9ms")[0] == template_id
+
+def test_different_messages_and_lengths_stay_apart():
+    miner = Drain()
+    ids = {miner.add(line)[0] for line in [
+        "GET /api/models 200",
+        "Model llama3 loaded on GPU 0",
+        "Model llama3 unloaded",
+        "user alice logged in from 10.0.0.1",
+        "user alice logged out",
+    ]}
+    assert len(ids) == 5
+    assert len(miner.clusters) == 5
+
+def test_similarity_threshold():
+    strict, loose = Drain(sim_threshold=0.9), Drain(sim_threshold=0.4)
+    for miner in (strict, loose):
+        miner.add("worker alpha finished job export")
+        miner.add("worker alpha finished task cleanup")
+    assert len(strict.clusters) == 2
+    assert len(loose.clusters) == 1
+
+def test_max_children_routes_overflow_to_the_wildcard_child():
+    miner = Drain(depth=3, max_children=3)
+    ids = [miner.add(f"{name} started")[0] for name in ["alpha", "beta", "gamma", "delta", "epsilon"]]
+    assert len(miner.root[2].children) == 3
+    assert ids[2] == ids[3] == ids[4]
+    assert miner.template(ids[4]) == f"{WILDCARD} started"
+
+def test_load_restores_the_catalog():
+    miner = Drain()
+    template_id, template, _, _ = miner.add("Evicted model mistral after 300s idle")
+    miner.add("Evicted model qwen2 after 120s idle")
+    restored = Drain()
+    restored.load({cluster.id: cluster.template for cluster in miner.clusters.values()})
+    assert restored.add("Evicted model phi3 after 60s idle")[:2] == (template_id, miner.template(template_id))
+    assert restored.add("something new")[0] == template_id + 1
+
+def test_flush_persists_templates_and_counts(data_dir, monkeypatch):
+    monkeypatch.setattr(log_patterns, "_miner", Drain())
+    monkeypatch.setattr(log_patterns, "_dirty_templates", {})
+    monkeypatch.setattr(log_patterns, "_counts", log_patterns.BucketCounter(60))
+    for user in ["alice", "bob", "carol"]:
+        log_patterns.mine("ollama", "INFO", f"session opened for {user}")
+    log_patterns.mine("ollama", "ERROR", "CUDA out of memory")
+    log_patterns.flush()
+    top = log_patterns.top_patterns("ollama", "all", 3600000)
+    assert [(row["template"], row["count"]) for row in top] == [
+        (f"session opened for {WILDCARD}", 3), ("CUDA out of memory", 1)]
+    assert set(log_patterns.get_log_templates().values()) == {
+        f"session opened for {WILDCARD}", "CUDA out of memory"}
+    assert log_patterns.top_patterns("ollama", "error", 3600000)[0]["count"] == 1
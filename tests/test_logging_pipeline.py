@@ -0,0 +1,199 @@
+import errno, sqlite3, threading
+import pytest
+from opshub import database, logging_pipeline
+from opshub.bench import format_docker_timestamp
+from opshub.records import LogRecord
+from opshub.logging_pipeline import CheckpointFilter, parse_docker_timestamp, line_hash, tail_container
+
+T0 = 1_705_314_330_123_456_789  # 2024-01-15T10:25:30.123456789Z
+
+@pytest.mark.parametrize("text, expected", [
+    ("2024-01-15T10:25:30.123456789Z", T0),
+    ("2024-01-15T10:25:30.123Z", T0 - 456_789),
+    ("2024-01-15T10:25:30Z", T0 - 123_456_789),
+    ("2024-01-15T12:25:30.123456789+02:00", T0),
+    ("2024-01-15T05:55:30.123456789-04:30", T0),
+])
+def test_parse_docker_timestamp(text, expected):
+    assert parse_docker_timestamp(text) == expected
+
+def test_parse_docker_timestamp_roundtrips_bench_format():
+    assert parse_docker_timestamp(format_docker_timestamp(T0)) == T0
+
+@pytest.mark.parametrize("text", ["", "2024-01-15T10:2", "not-a-time", "2024-01-15T10:25:30.12x"])
+def test_parse_docker_timestamp_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        parse_docker_timestamp(text)
+
+def test_checkpoint_filter_resumes_after_mark():
+    lines = [(T0 - 1, "a"), (T0, "b"), (T0, "c"), (T0, "d"), (T0 + 1, "e")]
+    resume = CheckpointFilter({"ts_ns": T0, "line_hash": line_hash("c")})
+    assert [line for ts, line in lines if resume.accept(ts, line_hash(line))] == ["d", "e"]
+
+def test_checkpoint_filter_passes_everything_without_checkpoint():
+    resume = CheckpointFilter(None)
+    assert all(resume.accept(ts, line_hash(str(ts))) for ts in (T0, T0 - 5, 0))
+
+def test_checkpoint_filter_stops_skipping_past_an_unseen_mark():
+    # The checkpointed line is gone (e.g. rotated away): anything newer is kept
+    resume = CheckpointFilter({"ts_ns": T0, "line_hash": line_hash("lost")})
+    assert not resume.accept(T0, line_hash("other"))
+    assert resume.accept(T0 + 1, line_hash("next"))
+
+class _Container:
+    id = "c" * 64
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def logs(self, **kwargs):
+        return iter(self.chunks)
+
+class _Client:
+    def __init__(self, chunks):
+        self.containers = self
+        self.container = _Container(chunks)
+
+    def get(self, name):
+        return self.container
+
+def _tail(chunks) -> list:
+    seen = []
+    tail_container("app", _Client(chunks), lambda name, cid, line, **kw: seen.append((kw["ts_ns"], line)))
+    return seen
+
+def _stream(lines) -> bytes:
+    return b"".join(f"{format_docker_timestamp(T0 + i)} {line}\n".encode() for i, line in enumerate(lines))
+
+def test_tail_container_joins_lines_split_across_chunks(data_dir):
+    data = _stream(["first line", "second line", "third line"])
+    chunks = [data[:40], data[40:75], data[75:]]
+    assert _tail(chunks) == [(T0, "first line"), (T0 + 1, "second line"), (T0 + 2, "third line")]
+
+def test_tail_container_reads_tty_streams_a_byte_at_a_time(data_dir):
+    data = _stream(["héllo", "world"]).replace(b"\n", b"\r\n")
+    assert _tail([data[i:i + 1] for i in range(len(data))]) == [(T0, "héllo"), (T0 + 1, "world")]
+
+def test_tail_container_skips_lines_with_bad_timestamps(data_dir):
+    skipped = logging_pipeline.c_skipped_lines.labels("docker_logs")
+    before = skipped._value.get()
+    data = _stream(["kept"]) + b"garbage line without a timestamp\n" + _stream(["also kept"])
+    assert [line for _, line in _tail([data])] == ["kept", "also kept"]
+    assert skipped._value.get() == before + 1
+
+def _record(day: str, container_id: str = "c1", message: str = "line") -> LogRecord:
+    return LogRecord(f"{day}T12:00:00", "app", container_id, "INFO", message, None, "docker_logs")
+
+def _mark(ts_ns: int) -> tuple:
+    return ("app", ts_ns, line_hash(str(ts_ns)), None, None)
+
+def _entry(record: LogRecord, mark: tuple = None, producer: int = None) -> tuple:
+    """A database sink item as process_log_line queues it, from this thread by default"""
+    return record, mark, producer or threading.get_ident()
+
+def test_store_batch_retries_a_failed_day_without_rewriting_earlier_days(data_dir, monkeypatch):
+    store = database.store_log_day
+    attempts = []
+    def flaky_store(day, entries, checkpoints):
+        attempts.append(day)
+        if day == "2024-01-16" and attempts.count(day) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        store(day, entries, checkpoints)
+    monkeypatch.setattr(logging_pipeline, "store_log_day", flaky_store)
+    monkeypatch.setattr(logging_pipeline.time, "sleep", lambda seconds: None)
+    ack = logging_pipeline.WriteAck()
+    logging_pipeline.store_batch([_entry(_record("2024-01-15"), _mark(1)), _entry(_record("2024-01-16"), _mark(2)), ack])
+    assert attempts == ["2024-01-15"] + ["2024-01-16"] * 3
+    assert ack.event.is_set() and ack.ok
+    assert len(database.get_logs("all", limit=10)) == 2
+    assert database.get_log_checkpoint("c1")["ts_ns"] == 2
+
+def test_store_batch_drops_a_batch_that_cannot_be_stored(monkeypatch):
+    def store(day, entries, checkpoints):
+        raise sqlite3.IntegrityError("NOT NULL constraint failed")
+    monkeypatch.setattr(logging_pipeline, "store_log_day", store)
+    ack = logging_pipeline.WriteAck()
+    with pytest.raises(sqlite3.IntegrityError):
+        logging_pipeline.store_batch([_entry(_record("2024-01-15")), ack])
+    assert ack.event.is_set() and not ack.ok
+
+def test_another_producers_failed_batch_does_not_fail_this_ack(monkeypatch):
+    def store(day, entries, checkpoints):
+        raise sqlite3.IntegrityError("NOT NULL constraint failed")
+    monkeypatch.setattr(logging_pipeline, "_write_failures", {})
+    monkeypatch.setattr(logging_pipeline, "store_log_day", store)
+    mine, theirs = logging_pipeline.WriteAck(), logging_pipeline.WriteAck()
+    theirs.producer = -1
+    with pytest.raises(sqlite3.IntegrityError):
+        logging_pipeline.store_batch([_entry(_record("2024-01-15"), producer=-1), mine, theirs])
+    assert mine.event.is_set() and mine.ok
+    assert theirs.event.is_set() and not theirs.ok
+
+def _sqlite_error(tmp_path, kind: str) -> sqlite3.OperationalError:
+    path = tmp_path / "errors.db"
+    sqlite3.connect(path).execute("CREATE TABLE IF NOT EXISTS t (x)").connection.commit()
+    if kind == "locked":
+        holder = sqlite3.connect(path)
+        holder.execute("BEGIN EXCLUSIVE")
+        conn, sql = sqlite3.connect(path, timeout=0), "INSERT INTO t VALUES (1)"
+    elif kind == "readonly":
+        conn, sql = sqlite3.connect(f"file:{path}?mode=ro", uri=True), "INSERT INTO t VALUES (1)"
+    else:
+        conn, sql = sqlite3.connect(path), "INSERT INTO missing VALUES (1)"
+    with pytest.raises(sqlite3.OperationalError) as raised:
+        conn.execute(sql)
+    return raised.value
+
+@pytest.mark.parametrize("kind, transient", [("locked", True), ("readonly", False), ("missing", False)])
+def test_transient_write_errors(tmp_path, kind, transient):
+    assert logging_pipeline.transient_write_error(_sqlite_error(tmp_path, kind)) is transient
+
+@pytest.mark.parametrize("error, transient", [
+    (sqlite3.OperationalError("database is locked"), True),
+    (sqlite3.OperationalError("database or disk is full"), True),
+    (sqlite3.OperationalError("too many SQL variables"), False),
+    (OSError(errno.ENOSPC, "No space left on device"), True),
+    (OSError(errno.EIO, "Input/output error"), True),
+    (OSError(errno.EACCES, "Permission denied"), False),
+])
+def test_transient_write_errors_without_a_result_code(error, transient):
+    assert logging_pipeline.transient_write_error(error) is transient
+
+def test_store_batch_does_not_retry_a_permanent_error(monkeypatch):
+    attempts = []
+    def store(day, entries, checkpoints):
+        attempts.append(day)
+        raise sqlite3.OperationalError("no such table: logs")
+    monkeypatch.setattr(logging_pipeline, "store_log_day", store)
+    monkeypatch.setattr(logging_pipeline.time, "sleep", lambda seconds: pytest.fail("retried"))
+    ack = logging_pipeline.WriteAck()
+    with pytest.raises(sqlite3.OperationalError):
+        logging_pipeline.store_batch([_entry(_record("2024-01-15")), ack])
+    assert attempts == ["2024-01-15"]
+    assert ack.event.is_set() and not ack.ok
+
+def test_checkpoint_commits_with_its_day_shard(data_dir, monkeypatch):
+    # Day 1 commits; day 2 fails: the checkpoint must stop at day 1's last line
+    store = database.store_log_day
+    def fail_second_day(day, entries, checkpoints):
+        if day == "2024-01-16":
+            raise sqlite3.IntegrityError("simulated")
+        store(day, entries, checkpoints)
+    monkeypatch.setattr(database, "store_log_day", fail_second_day)
+    entries = [_record("2024-01-15", message="a"), _record("2024-01-15", message="b"),
+               _record("2024-01-16", message="c")]
+    with pytest.raises(sqlite3.IntegrityError):
+        database.store_log_entries(entries, [_mark(1), _mark(2), _mark(3)])
+    assert database.get_log_checkpoint("c1")["ts_ns"] == 2
+    assert [r.message for r in database.get_logs("all", limit=10)] == ["b", "a"]
+
+def test_checkpoint_survives_losing_the_main_database_copy(data_dir):
+    database.store_log_entries([_record("2024-01-15"), _record("2024-01-16", "c2")], [_mark(5), _mark(7)])
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("DELETE FROM log_checkpoints")
+    conn.commit()
+    conn.close()
+    # As after a crash between the shard commit and the main database update
+    assert database.get_log_checkpoint("c1")["ts_ns"] == 5
+    assert database.get_log_checkpoint("c2")["ts_ns"] == 7
+    assert database.get_log_checkpoint("c3") is None
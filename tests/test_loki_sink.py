@@ -0,0 +1,98 @@
+import gzip, json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from opshub import loki_sink
+
+@pytest.fixture
+def loki(tmp_path):
+    """Stub Loki push endpoint recording each request; answers 503 while state["outage"]"""
+    state = {"outage": False, "requests": [], "refused": 0, "lock": threading.Lock()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            if state["outage"]:
+                state["refused"] += 1
+                self.send_response(503)
+                self.end_headers()
+                return
+            with state["lock"]:
+                state["requests"].append({"path": self.path, "headers": dict(self.headers), "body": body})
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    forwarder = loki_sink.LokiForwarder(f"http://127.0.0.1:{server.server_port}", str(tmp_path / "spool"),
+                                        tenant="team-a", batch_size=100, batch_wait=0.05)
+    threading.Thread(target=forwarder.run, daemon=True).start()
+    yield forwarder, state
+    server.shutdown()
+
+def _streams(state) -> list:
+    with state["lock"]:
+        return [stream for request in state["requests"]
+                for stream in json.loads(gzip.decompress(request["body"]))["streams"]]
+
+def _wait_for(state, entries: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while sum(len(s["values"]) for s in _streams(state)) < entries and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+def test_push_payload(loki, monkeypatch):
+    forwarder, state = loki
+    monkeypatch.setattr(loki_sink, "_forwarder", forwarder)
+    monkeypatch.setattr(loki_sink, "LOKI_STRUCTURED_METADATA", False)
+    metadata = {"model": "llama3", "gpu_id": "0", "user": "alice"}
+    loki_sink.submit("ollama", "ERROR", "second", 2_000, metadata)
+    loki_sink.submit("ollama", "ERROR", "first", 1_000, metadata)
+    loki_sink.submit("openwebui", "INFO", "login", 1_500, {"user": "bob smith"})
+    _wait_for(state, 3)
+
+    request = state["requests"][0]
+    assert request["path"] == "/loki/api/v1/push"
+    assert request["headers"]["Content-Encoding"] == "gzip"
+    assert request["headers"]["Content-Type"] == "application/json"
+    assert request["headers"]["X-Scope-OrgID"] == "team-a"
+
+    streams = {s["stream"]["container"]: s for s in _streams(state)}
+    assert streams["ollama"]["stream"] == {"job": "opshub", "host": loki_sink.NODE_NAME, "container": "ollama",
+                                           "level": "error", "source": "docker_logs", "model": "llama3",
+                                           "gpu_id": "0"}
+    # Values in timestamp order, user carried in the line rather than as a label
+    assert streams["ollama"]["values"] == [["1000", "first user=alice"], ["2000", "second user=alice"]]
+    assert "user" not in streams["openwebui"]["stream"]
+    assert streams["openwebui"]["values"] == [["1500", 'login user="bob smith"']]
+
+def test_structured_metadata_keeps_the_line(loki, monkeypatch):
+    forwarder, state = loki
+    monkeypatch.setattr(loki_sink, "_forwarder", forwarder)
+    monkeypatch.setattr(loki_sink, "LOKI_STRUCTURED_METADATA", True)
+    loki_sink.submit("openwebui", "INFO", "login", 1_000, {"user": "alice", "model": "llama3"})
+    _wait_for(state, 1)
+    (stream,) = _streams(state)
+    assert stream["stream"]["model"] == "llama3" and "user" not in stream["stream"]
+    assert stream["values"] == [["1000", "login", {"user": "alice"}]]
+
+def test_outage_is_spooled_and_replayed_in_order(loki):
+    forwarder, state = loki
+    labels = loki_sink.label_set("ollama", "INFO", {})
+    state["outage"] = True
+    for ts in range(1, 251):
+        forwarder.submit(labels, ts, f"line {ts}")
+    deadline = time.monotonic() + 10
+    while not state["refused"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.2)
+    assert forwarder._spool_bytes > 0
+    state["outage"] = False
+    for ts in range(251, 301):
+        forwarder.submit(labels, ts, f"line {ts}")
+    _wait_for(state, 300, timeout=30)
+
+    values = [int(v[0]) for s in _streams(state) for v in s["values"]]
+    assert values == list(range(1, 301))
+    assert not list(forwarder.spool.glob("*.json.gz"))
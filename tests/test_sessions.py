@@ -0,0 +1,54 @@
+import sqlite3
+from opshub import database
+from opshub.database import get_user_sessions, store_user_session, store_user_sessions
+
+def _sessions(**kwargs) -> list:
+    return sorted((s["username"], s["session_id"], s["request_count"]) for s in get_user_sessions(active_only=True, **kwargs))
+
+def _events(rows):
+    """Insert session events with explicit ages, as older releases stored them"""
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.executemany("INSERT INTO user_sessions (username, action, session_id, model, timestamp) "
+                     "VALUES (?, ?, ?, ?, datetime('now', ?))", rows)
+    conn.commit()
+    conn.close()
+
+def test_events_fold_into_active_sessions(data_dir):
+    store_user_session("alice", "llama3", "login", session_id="s1")
+    store_user_sessions([{"username": "alice", "action": "request", "session_id": "s1"},
+                         {"username": "alice", "action": "request", "session_id": "s1", "model": "qwen2"},
+                         {"username": "bob", "action": "login"},
+                         {"username": "bob", "action": "logout"}])
+    assert _sessions() == [("alice", "s1", 3)]
+    assert get_user_sessions(active_only=True)[0]["model"] == "qwen2"
+
+def test_active_view_applies_hours_to_start_time(data_dir):
+    store_user_session("alice", action="login", session_id="new")
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("INSERT INTO active_sessions (username, session_id, started_at, last_activity) "
+                 "VALUES ('bob', 'old', datetime('now', '-3 days'), datetime('now'))")
+    conn.commit()
+    conn.close()
+    assert _sessions() == [("alice", "new", 1), ("bob", "old", 1)]
+    assert _sessions(hours=24) == [("alice", "new", 1)]
+
+def test_history_view_uses_hours(data_dir):
+    _events([("alice", "login", "s1", None, "-2 hours"), ("alice", "request", "s1", None, "-30 hours")])
+    assert len(get_user_sessions()) == 1
+    assert len(get_user_sessions(hours=48)) == 2
+
+def test_active_sessions_are_seeded_on_upgrade(data_dir):
+    _events([("alice", "login", "s1", "llama3", "-20 minutes"), ("alice", "request", "s1", None, "-5 minutes"),
+             ("bob", "login", "", None, "-10 minutes"), ("bob", "logout", "", None, "-9 minutes"),
+             ("carol", "request", "s9", None, "-2 hours")])
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.execute("DROP TABLE active_sessions")  # as before active_sessions existed
+    conn.commit()
+    conn.close()
+    database.init_db()
+    [alice] = get_user_sessions(active_only=True)
+    assert (alice["username"], alice["model"], alice["request_count"]) == ("alice", "llama3", 2)
+    assert alice["started_at"] < alice["last_activity"]
+    # Seeded once: a later start does not replay the events again
+    database.init_db()
+    assert _sessions() == [("alice", "s1", 2)]
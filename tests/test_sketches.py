@@ -0,0 +1,84 @@
+import random
+import pytest
+from opshub.sketches import DDSketch, HyperLogLog
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1]
+
+def _distributions():
+    rng = random.Random(7)
+    return {
+        "lognormal latency": [rng.lognormvariate(5, 1.5) for _ in range(50000)],
+        "uniform": [rng.uniform(0, 1000) for _ in range(50000)],
+        "wide range": [10 ** rng.uniform(-6, 9) for _ in range(50000)],
+        "few distinct": [rng.choice([1, 2, 250, 30000]) for _ in range(10000)],
+    }
+
+def _true_quantile(ordered: list, q: float) -> float:
+    return ordered[int(q * (len(ordered) - 1))]
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+@pytest.mark.parametrize("name", list(_distributions()))
+def test_ddsketch_quantiles_within_relative_accuracy(name, accuracy):
+    values = _distributions()[name]
+    sketch = DDSketch(accuracy)
+    for value in values:
+        sketch.add(value)
+    ordered = sorted(values)
+    for q in QUANTILES:
+        expected = _true_quantile(ordered, q)
+        assert sketch.quantile(q) == pytest.approx(expected, rel=accuracy, abs=DDSketch.MIN_VALUE), q
+    assert (sketch.count, sketch.min, sketch.max) == (len(values), ordered[0], ordered[-1])
+    assert sketch.sum == pytest.approx(sum(values))
+
+def test_ddsketch_zeros_and_empty():
+    assert DDSketch().quantile(0.5) is None
+    sketch = DDSketch()
+    for value in [0, 0, 0, -1, 5, 10]:
+        sketch.add(value)
+    assert sketch.zero == 4
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1) == 10
+
+def test_ddsketch_merge_and_bytes_match_one_sketch():
+    values = _distributions()["lognormal latency"]
+    whole, parts = DDSketch(), [DDSketch() for _ in range(4)]
+    for i, value in enumerate(values):
+        whole.add(value)
+        parts[i % 4].add(value)
+    merged = DDSketch.from_bytes(parts[0].to_bytes())
+    for part in parts[1:]:
+        merged.merge(DDSketch.from_bytes(part.to_bytes()))
+    assert merged.bins == whole.bins
+    assert [merged.quantile(q) for q in QUANTILES] == [whole.quantile(q) for q in QUANTILES]
+    assert len(whole.to_bytes()) < 2048
+    with pytest.raises(ValueError):
+        whole.merge(DDSketch(0.05))
+
+@pytest.mark.parametrize("precision", [10, 14])
+@pytest.mark.parametrize("distinct", [10, 1000, 20000, 200000])
+def test_hll_count_within_standard_error(precision, distinct):
+    sketch = HyperLogLog(precision)
+    for i in range(distinct):
+        sketch.add(f"user{i}")
+        sketch.add(f"user{i // 2}")  # repeats must not count
+    assert abs(sketch.count() - distinct) <= max(4 * sketch.standard_error * distinct, 1)
+
+def test_hll_merge_is_a_union_and_survives_bytes():
+    a, b, both = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(30000):
+        a.add(f"user{i}")
+        both.add(f"user{i}")
+    for i in range(20000, 60000):
+        b.add(f"user{i}")
+        both.add(f"user{i}")
+    merged = HyperLogLog.from_bytes(a.to_bytes()).merge(HyperLogLog.from_bytes(b.to_bytes()))
+    assert merged.registers == both.registers
+    assert abs(merged.count() - 60000) <= 4 * merged.standard_error * 60000
+    with pytest.raises(ValueError):
+        merged.merge(HyperLogLog(10))
+
+def test_hll_full_sketch_roundtrip():
+    sketch = HyperLogLog(16)
+    sketch.registers = {index: index % 50 + 1 for index in range(1 << 16)}
+    assert HyperLogLog.from_bytes(sketch.to_bytes()).registers == sketch.registers
+    assert HyperLogLog.from_bytes(HyperLogLog().to_bytes()).count() == 0
@@ -0,0 +1,69 @@
+import json
+import pytest
+from opshub.structured_logs import normalize_path, parse
+
+T0 = 1_705_314_330  # 2024-01-15T10:25:30Z
+
+def _parse(**record) -> dict:
+    return parse(json.dumps(record))
+
+@pytest.mark.parametrize("line", ["", "plain text", "{not json}", "[1, 2]", '{"a": 1', '"{}"'])
+def test_non_object_lines_are_not_parsed(line):
+    assert parse(line) is None
+
+@pytest.mark.parametrize("level, expected", [(10, "INFO"), (20, "INFO"), (30, "WARNING"), (40, "ERROR"), (50, "CRITICAL")])
+def test_python_numeric_levels(level, expected):
+    assert _parse(levelno=1, level=level, message="x")["level"] == expected
+
+@pytest.mark.parametrize("level, expected", [(10, "INFO"), (20, "INFO"), (30, "INFO"), (40, "WARNING"),
+                                             (50, "ERROR"), (60, "CRITICAL")])
+def test_bunyan_and_pino_numeric_levels(level, expected):
+    bunyan = _parse(name="api", hostname="web-1", pid=7, level=level, msg="x", time="2024-01-15T10:25:30Z", v=0)
+    pino = _parse(level=level, time=T0 * 1000, pid=7, hostname="web-1", msg="x")
+    assert bunyan["level"] == pino["level"] == expected
+
+@pytest.mark.parametrize("record, expected", [
+    ({"level": "warn"}, "WARNING"), ({"levelname": "ERROR"}, "ERROR"), ({"severity": "Fatal"}, "CRITICAL"),
+    ({"log.level": "debug"}, "INFO"), ({"level": "verbose"}, None), ({"level": True}, None), ({}, None),
+])
+def test_named_levels(record, expected):
+    assert _parse(**record)["level"] == expected
+
+@pytest.mark.parametrize("value", [T0, T0 * 1000, T0 * 1_000_000, T0 * 1_000_000_000, float(T0) + 0.0,
+                                   "2024-01-15T10:25:30Z", "2024-01-15T12:25:30+02:00",
+                                   "2024-01-15T10:25:30,000+00:00"])
+def test_epoch_units_and_iso_timestamps(value):
+    assert _parse(ts=value)["ts"] == pytest.approx(T0)
+
+def test_unparseable_timestamp_is_none():
+    assert _parse(time="yesterday")["ts"] is None
+
+@pytest.mark.parametrize("record, expected", [
+    ({"latency_ms": 12.5}, 12.5), ({"duration_ms": "40"}, 40.0), ({"latency": 0.25}, 250.0),
+    ({"duration": "12.5ms"}, 12.5), ({"duration": "800µs"}, 0.8), ({"duration": "1.5s"}, 1500.0),
+    ({"duration": "2"}, 2000.0), ({"elapsed": "1m2.5s"}, 62500.0), ({"elapsed": "1h0m0s"}, 3600000.0),
+    ({"elapsed": "3m"}, 180000.0), ({"elapsed": "1.2.3s"}, None), ({"elapsed": "soon"}, None),
+    ({"latency_ms": "fast"}, None),
+])
+def test_latency(record, expected):
+    assert _parse(**record)["latency_ms"] == (pytest.approx(expected) if expected is not None else None)
+
+@pytest.mark.parametrize("value, expected", [
+    ("/api/chat", "/api/chat"),
+    ("/api/v1/chats/3f2a9c1e-8b7d-4c6e-9a1b-2d3e4f5a6b7c?page=2", "/api/v1/chats/:id"),
+    ("https://example.com/api/users/42/sessions#top", "/api/users/:id/sessions"),
+    ("/blobs/sha256deadbeefdeadbeef", "/blobs/sha256deadbeefdeadbeef"),
+    ("/blobs/deadbeefdeadbeef00", "/blobs/:id"),
+    ("", None), (None, None), (42, None),
+])
+def test_normalize_path(value, expected):
+    assert normalize_path(value) == expected
+
+def test_indexed_columns():
+    fields = _parse(msg="chat done", status=200, path="/api/chat", user="alice", model="llama3",
+                    eval_count=120, eval_duration=2_000_000_000)
+    assert fields.pop("tokens_per_s") == pytest.approx(60.0)
+    assert fields == {"level": None, "ts": None, "message": "chat done", "http_status": 200, "latency_ms": None,
+                      "path": "/api/chat", "username": "alice", "model": "llama3", "tokens": 120}
+    assert _parse(status=99)["http_status"] is None
+    assert _parse(statusCode="404")["http_status"] == 404
@@ -0,0 +1,62 @@
+import math, random
+import pytest
+from opshub import tsdb
+from opshub.tsdb import Block, decode
+
+T0 = 1_705_314_000
+
+def _encode(timestamps, values, digits=None):
+    block = Block("test", timestamps[0], values[0], digits)
+    for ts, value in zip(timestamps[1:], values[1:]):
+        block.append(ts, value)
+    return block
+
+def _samples(count: int, seed: int = 1):
+    """Mostly regular timestamps with jitter and gaps, and values that repeat, drift and jump"""
+    rng = random.Random(seed)
+    timestamps, values, ts, value = [], [], T0, 42.5
+    for i in range(count):
+        timestamps.append(ts)
+        values.append(value)
+        ts += rng.choice([10, 10, 10, 9, 11, 75, 600, 5000, 70000])
+        value = rng.choice([value, value, value + rng.uniform(-1, 1), -value, rng.uniform(-1e12, 1e12),
+                            0.0, 1e-300, math.pi])
+    return timestamps, values
+
+def test_exact_roundtrip():
+    timestamps, values = _samples(2000)
+    block = _encode(timestamps, values)
+    assert decode(block.to_bytes()) == (timestamps, values)
+    assert (block.count, block.min, block.max) == (len(values), min(values), max(values))
+    assert block.sum == pytest.approx(sum(values))
+
+def test_digits_roundtrip_rounds_values():
+    timestamps, values = _samples(2000, seed=2)
+    values = [v % 1000 for v in values]
+    block = _encode(timestamps, values, digits=2)
+    decoded_ts, decoded = decode(block.to_bytes())
+    assert decoded_ts == timestamps
+    assert decoded == [round(v * 100) / 100 for v in values]
+    assert block.max == max(decoded)
+
+def test_samples_at_or_before_the_last_are_dropped():
+    block = _encode([T0, T0 + 10, T0 + 10, T0 + 5, T0 + 20], [1.0, 2.0, 3.0, 4.0, 5.0])
+    assert decode(block.to_bytes()) == ([T0, T0 + 10, T0 + 20], [1.0, 2.0, 5.0])
+
+def test_block_version_is_checked():
+    data = bytearray(_encode([T0], [1.0]).to_bytes())
+    data[0] = tsdb.VERSION + 1
+    with pytest.raises(ValueError):
+        decode(bytes(data))
+
+def test_record_skips_non_finite_values(data_dir, monkeypatch):
+    monkeypatch.setattr(tsdb, "_open", {})
+    monkeypatch.setattr(tsdb, "_sealed", [])
+    start = T0 - T0 % tsdb.TSDB_BLOCK_SECONDS
+    samples = [(1.5, 2), (math.nan, 2), (2.25, 2), (math.inf, None), (-math.inf, None), (3.0, None)]
+    for i, (value, digits) in enumerate(samples):
+        tsdb.record("host.test", value, start + i, digits)
+    tsdb.record("host.nan", math.nan, start)
+    tsdb.flush()
+    assert tsdb.query("host.test", start, start + 10) == ([start, start + 2, start + 5], [1.5, 2.25, 3.0])
+    assert tsdb.series_names(["host.*"]) == ["host.test"]